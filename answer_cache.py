@@ -0,0 +1,183 @@
+# answer_cache.py
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# -----------------------------
+# Semantic answer cache
+# -----------------------------
+class SemanticAnswerCache:
+    """
+    Cache of generated answers keyed by query embedding.
+
+    A lookup hits when a stored query has cosine similarity >= `threshold` with
+    the new query AND the same detected intent (style, duration, named cities
+    and requested entity types), so "4 day romantic trip in Vietnam" can reuse
+    "romantic 4-day Vietnam trip" but never a 7-day, food-focused or
+    other-city answer.
+
+    Embeddings live in one preallocated float32 matrix so a lookup is a single
+    matrix-vector product. Capacity is fixed at `max_entries`; when full the
+    least recently used slot is overwritten. Entries expire after `ttl_seconds`,
+    and everything is dropped when any of `watch_files` changes on disk
+    (dataset reload, rebuilt vector index or graph snapshot).
+    """
+
+    # How often (seconds) to stat the watched files
+    FINGERPRINT_INTERVAL = 1.0
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: Optional[float] = 3600,
+                 watch_files: Sequence[str] = ()):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.watch_files = list(watch_files)
+
+        self._vectors: Optional[np.ndarray] = None  # allocated on first store (dim unknown until then)
+        self._intent_keys: List[Optional[tuple]] = [None] * max_entries
+        self._entries: List[Optional[Dict]] = [None] * max_entries
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._lock = threading.Lock()
+
+        self._fingerprint = self._current_fingerprint()
+        self._fingerprint_checked = time.time()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def intent_key(intent: Optional[Dict]) -> tuple:
+        intent = intent or {}
+        return (intent.get("style"), intent.get("duration"),
+                tuple(intent.get("cities") or ()), tuple(intent.get("requested_types") or ()))
+
+    # ---- invalidation ----
+    def _current_fingerprint(self) -> tuple:
+        fingerprint = []
+        for path in self.watch_files:
+            try:
+                st = os.stat(path)
+                fingerprint.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                fingerprint.append((path, None, None))
+        return tuple(fingerprint)
+
+    def _check_fingerprint(self, now: float):
+        if now - self._fingerprint_checked < self.FINGERPRINT_INTERVAL:
+            return
+        self._fingerprint_checked = now
+        fingerprint = self._current_fingerprint()
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._clear()
+            self.invalidations += 1
+
+    def _clear(self):
+        self._valid[:] = False
+        self._entries = [None] * self.max_entries
+        self._intent_keys = [None] * self.max_entries
+
+    def invalidate(self):
+        """Drop every cached answer (call after reloading the dataset)."""
+        with self._lock:
+            self._clear()
+            self.invalidations += 1
+
+    # ---- lookup / store ----
+    def _normalize(self, embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, embedding, intent: Optional[Dict], threshold: Optional[float] = None) -> Optional[Dict]:
+        """Return the best cached entry for this query, or None (`threshold` overrides the configured one)."""
+        now = time.time()
+        with self._lock:
+            self._check_fingerprint(now)
+            if self._vectors is None or not self._valid.any():
+                self.misses += 1
+                return None
+
+            candidates = self._valid.copy()
+            if self.ttl_seconds is not None:
+                expired = candidates & (now - self._created > self.ttl_seconds)
+                self._valid[expired] = False
+                candidates &= ~expired
+            key = self.intent_key(intent)
+            for slot in np.flatnonzero(candidates):
+                if self._intent_keys[slot] != key:
+                    candidates[slot] = False
+            if not candidates.any():
+                self.misses += 1
+                return None
+
+            scores = self._vectors @ self._normalize(embedding)
+            scores[~candidates] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < (self.threshold if threshold is None else threshold):
+                self.misses += 1
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            return dict(self._entries[best], similarity=float(scores[best]))
+
+    def store(self, query: str, embedding, intent: Optional[Dict], answer: str, **extra):
+        """Cache an answer; `extra` (matches, graph_facts_count, ...) is returned on hits."""
+        if not answer:
+            return
+        vec = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+
+            free = np.flatnonzero(~self._valid)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            self._vectors[slot] = vec
+            self._intent_keys[slot] = self.intent_key(intent)
+            self._entries[slot] = dict(extra, query=query, answer=answer)
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._valid[slot] = True
+
+    def __len__(self):
+        return int(self._valid.sum())
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self)
+        }
+
+
+# -----------------------------
+# Stream replay
+# -----------------------------
+async def replay_stream(answer: str, chunk_chars: int = 64):
+    """
+    Yield a cached answer as OpenAI-style stream chunks
+    (chunk.choices[0].delta.content), so streaming consumers work unchanged.
+    """
+    for i in range(0, len(answer), chunk_chars):
+        delta = SimpleNamespace(content=answer[i:i + chunk_chars])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
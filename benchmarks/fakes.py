@@ -0,0 +1,309 @@
+# benchmarks/fakes.py
+"""
+Deterministic in-process stand-ins for OpenAI, Pinecone and Neo4j.
+
+Every fake draws latencies from a seeded log-normal distribution and can fail a
+configurable fraction of calls, so runs are reproducible on a machine with no
+network. Embeddings are hashed bag-of-words vectors: the same text always maps
+to the same vector, and texts sharing words are close in cosine space.
+"""
+import asyncio
+import hashlib
+import random
+import re
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from graph_snapshot import GraphSnapshot, encode_summary
+from vector_store import VectorBackend, LocalVectorIndex
+
+# -----------------------------
+# Latency / error model
+# -----------------------------
+class Latency:
+    """Log-normal latency with a given median (ms) and shape, plus an error rate."""
+
+    def __init__(self, median_ms: float = 0.0, sigma: float = 0.3, error_rate: float = 0.0, seed: int = 0):
+        self.median = median_ms / 1000.0
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = 0) -> "Latency":
+        """'median_ms[,sigma[,error_rate]]', e.g. '80,0.4,0.01'."""
+        parts = [float(p) for p in spec.split(",")] if spec else []
+        return cls(*parts, seed=seed)
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * self.rng.lognormvariate(0.0, self.sigma)
+
+    def _maybe_fail(self, what: str):
+        self.calls += 1
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            raise RuntimeError(f"injected {what} failure")
+
+    async def wait(self, what: str = "call"):
+        delay = self.sample()
+        if delay:
+            await asyncio.sleep(delay)
+        self._maybe_fail(what)
+
+    def block(self, what: str = "call"):
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+        self._maybe_fail(what)
+
+
+# -----------------------------
+# Embeddings
+# -----------------------------
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    vec = np.zeros(dim, dtype=np.float32)
+    for token in _TOKEN.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    vec[0] += 1e-3  # never all-zero
+    return vec.tolist()
+
+
+def _embedding_response(texts: List[str], dim: int):
+    return SimpleNamespace(data=[
+        SimpleNamespace(index=i, embedding=fake_embedding(t, dim)) for i, t in enumerate(texts)
+    ])
+
+
+# -----------------------------
+# OpenAI
+# -----------------------------
+class _FakeAsyncStream:
+    def __init__(self, text: str, token_latency: Latency):
+        self._tokens = re.findall(r"\S+\s*", text)
+        self._token_latency = token_latency
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for token in self._tokens:
+            if self.closed:
+                return
+            await self._token_latency.wait("token")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeAsyncOpenAI:
+    """AsyncOpenAI stand-in: embeddings.create and chat.completions.create."""
+
+    def __init__(self, dim: int, embed_latency: Latency, chat_latency: Latency,
+                 token_latency: Optional[Latency] = None, answer_tokens: int = 200):
+        self.dim = dim
+        self.embed_latency = embed_latency
+        self.chat_latency = chat_latency
+        self.token_latency = token_latency or Latency()
+        self.answer_tokens = answer_tokens
+        self.embedding_calls = 0
+        self.embedded_texts = 0
+        self.embeddings = SimpleNamespace(create=self._embeddings_create)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat_create))
+
+    async def _embeddings_create(self, model: str, input: List[str], **kwargs):
+        self.embedding_calls += 1
+        self.embedded_texts += len(input)
+        await self.embed_latency.wait("embedding")
+        return _embedding_response(list(input), kwargs.get("dimensions") or self.dim)
+
+    def _answer(self, messages) -> str:
+        seed = hashlib.sha1(messages[-1]["content"].encode("utf-8")).hexdigest()
+        return " ".join(f"tok{seed[i % 40]}{i}" for i in range(self.answer_tokens))
+
+    async def _chat_create(self, model: str, messages: List[Dict], stream: bool = False, **kwargs):
+        await self.chat_latency.wait("chat")
+        text = self._answer(messages)
+        if stream:
+            return _FakeAsyncStream(text, self.token_latency)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+    async def close(self):
+        pass
+
+
+class FakeOpenAI:
+    """Sync OpenAI stand-in for pinecone_upload (embeddings only)."""
+
+    def __init__(self, dim: int, embed_latency: Latency):
+        self.dim = dim
+        self.embed_latency = embed_latency
+        self.embeddings = SimpleNamespace(create=self._embeddings_create)
+
+    def _embeddings_create(self, model: str, input: List[str], **kwargs):
+        self.embed_latency.block("embedding")
+        return _embedding_response(list(input), kwargs.get("dimensions") or self.dim)
+
+
+# -----------------------------
+# Pinecone
+# -----------------------------
+class FakeVectorBackend(VectorBackend):
+    """Remote-index stand-in: exact top-k over a LocalVectorIndex behind simulated network latency."""
+
+    def __init__(self, local: LocalVectorIndex, latency: Latency):
+        self.local = local
+        self.latency = latency
+
+    def query_batch(self, vectors, top_k=5, filter=None):
+        self.latency.block("vector query")
+        return self.local.query_batch(vectors, top_k=top_k, filter=filter)
+
+    async def aquery(self, vector, top_k=5, **kwargs):
+        await self.latency.wait("vector query")
+        return self.local.query(vector, top_k=top_k, **kwargs)
+
+
+class FakePineconeIndex:
+    """pinecone.Index stand-in for pinecone_upload: counts upserts/deletes."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.vectors: Dict[str, Dict] = {}
+
+    def upsert(self, vectors):
+        self.latency.block("upsert")
+        for v in vectors:
+            self.vectors[v["id"]] = v
+
+    def delete(self, ids):
+        self.latency.block("delete")
+        for i in ids:
+            self.vectors.pop(i, None)
+
+
+# -----------------------------
+# Neo4j
+# -----------------------------
+class _FakeAsyncResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for row in self._rows:
+            yield row
+
+
+class _FakeAsyncSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query: str, **params):
+        await self.driver.latency.wait("graph query")
+        return _FakeAsyncResult(self.driver.answer(query, params))
+
+
+class FakeAsyncNeo4jDriver:
+    """
+    AsyncGraphDatabase driver stand-in serving the read queries hybrid_chat issues,
+    answered from a GraphSnapshot built from the dataset JSON. With `precomputed`
+    every node carries the neighborhood summary load_to_neo4j materializes.
+    """
+
+    def __init__(self, snapshot: GraphSnapshot, latency: Latency, precomputed: bool = True):
+        self.snapshot = snapshot
+        self.latency = latency
+        self.precomputed = precomputed
+
+    def session(self, **kwargs):
+        return _FakeAsyncSession(self)
+
+    def answer(self, query: str, params: Dict) -> List[Dict]:
+        if "node_ids" in params and "n.neighborhood" in query:
+            return [
+                {"source": nid, "neighborhood": encode_summary(self.snapshot.neighborhood_summary(nid))
+                 if self.precomputed else None}
+                for nid in params["node_ids"] if nid in self.snapshot.index
+            ]
+        if "node_ids" in params:
+            depth_match = re.search(r"\[\*1\.\.(\d+)\]", query)
+            depth = int(depth_match.group(1)) if depth_match else 1
+            facts = self.snapshot.neighborhood(params["node_ids"], depth=depth, limit=100, desc_chars=10_000)
+            return [
+                {"source": f["source"], "rel": f["rel"], "labels": f["labels"], "id": f["target_id"],
+                 "name": f["target_name"], "type": f["labels"][0], "description": f["target_desc"]}
+                for f in facts
+            ]
+        if "ids" in params:
+            return [{"id": i} for i in params["ids"] if i in self.snapshot.index]
+        if "types" in params and "keywords" in params:
+            seeds = self.snapshot.find_nodes(params["types"], params["keywords"], limit=params.get("limit", 3))
+            return [{"id": s} for s in seeds]
+        return []
+
+    async def close(self):
+        pass
+
+
+class _FakeTx:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def run(self, query: str, **params):
+        self.driver.statements += 1
+        self.driver.rows += len(params.get("rows", [])) or 1
+
+
+class _FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, fn, *args, **kwargs):
+        self.driver.latency.block("graph write")
+        return fn(_FakeTx(self.driver), *args, **kwargs)
+
+    def run(self, query: str, **params):
+        self.driver.latency.block("graph query")
+        return []
+
+
+class FakeNeo4jDriver:
+    """Sync GraphDatabase driver stand-in for load_to_neo4j: one latency sample per transaction."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.statements = 0
+        self.rows = 0
+
+    def session(self, **kwargs):
+        return _FakeSession(self)
+
+    def close(self):
+        pass
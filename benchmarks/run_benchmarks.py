@@ -0,0 +1,690 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmark harness.
+
+Runs the real pinecone_upload, load_to_neo4j and hybrid_retrieval_async code
+paths against the in-process fakes in benchmarks/fakes.py, so results are
+reproducible on a machine with no network and comparable between commits:
+
+    python benchmarks/run_benchmarks.py                      # full run, JSON to benchmarks/results/
+    python benchmarks/run_benchmarks.py --time-scale 0.1     # same shape, 10x faster (smoke run)
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<old>.json
+
+The harness installs its own `config` module (local vector backend, files in a
+temporary work directory), so it never reads real credentials.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from typing import Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, HERE]
+
+import numpy as np
+
+DATA_FILE = os.path.join(ROOT, "vietnam_travel_dataset.json")
+RESULTS_DIR = os.path.join(HERE, "results")
+SCHEMA_VERSION = 1
+
+QUERY_TEMPLATES = [
+    "create a romantic 4 day itinerary for {city}",
+    "best budget food and street markets in {city}",
+    "adventure activities and trekking near {city}",
+    "cultural temples and museums to visit in {city}",
+    "family friendly hotels and beaches around {city}",
+    "relaxing 2 day nature trip from {city}",
+]
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """count/mean/p50/p95/p99/max of samples given in seconds, reported in ms."""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3)
+    }
+
+
+def timed(fn, samples: List[float]):
+    """Wrap a sync callable so each call's duration is appended to `samples`."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Swallow the modules' progress prints / tqdm bars while measuring."""
+    if not enabled:
+        yield
+        return
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        yield
+
+
+def git_revision() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def install_config(workdir: str, dim: int, answer_cache: bool):
+    """Benchmark-only `config` module: local vector backend, all files under workdir."""
+    config = types.ModuleType("config")
+    config.OPENAI_API_KEY = "offline"
+    config.PINECONE_API_KEY = "offline"
+    config.PINECONE_INDEX_NAME = "benchmark"
+    config.PINECONE_VECTOR_DIM = dim
+    config.NEO4J_URI = "bolt://localhost:7687"
+    config.NEO4J_USER = "neo4j"
+    config.NEO4J_PASSWORD = "offline"
+    config.VECTOR_BACKEND = "local"
+    config.LOCAL_INDEX_PATH = os.path.join(workdir, "vector_index")
+    config.GRAPH_SNAPSHOT_PATH = os.path.join(workdir, "graph_snapshot")
+    config.LEXICAL_INDEX_PATH = os.path.join(workdir, "lexical_index")
+    config.EMBED_CACHE_PATH = os.path.join(workdir, "embedding_cache.sqlite")
+    config.ANSWER_CACHE_ENABLED = answer_cache
+    sys.modules["config"] = config
+    return config
+
+
+def build_queries(n: int) -> List[str]:
+    from ingest import iter_records, iter_valid
+    cities = sorted({r["name"] for r in iter_valid(iter_records(DATA_FILE)) if r["type"] == "City" and r.get("name")})
+    combos = [t.format(city=c) for c in cities for t in QUERY_TEMPLATES]
+    return [combos[i % len(combos)] for i in range(n)]
+
+
+# -----------------------------
+# pinecone_upload
+# -----------------------------
+def upload_module(config):
+    """pinecone_upload reading the repo dataset and keeping its manifest in the work directory."""
+    import pinecone_upload
+
+    pinecone_upload.DATA_FILE = DATA_FILE
+    pinecone_upload.MANIFEST_FILE = os.path.join(os.path.dirname(config.LOCAL_INDEX_PATH), ".vector_manifest.json")
+    return pinecone_upload
+
+
+def build_local_index(fakes, config, dim: int):
+    """Local vector index over the dataset with fake embeddings (no latency, no errors)."""
+    pinecone_upload = upload_module(config)
+    pinecone_upload.client = fakes.FakeOpenAI(dim, fakes.Latency())
+    with quiet():
+        pinecone_upload.main(target="local", local_path=config.LOCAL_INDEX_PATH)
+
+
+def bench_upload(args, fakes, config) -> Dict:
+    pinecone_upload = upload_module(config)
+
+    embed_samples, upsert_samples = [], []
+    fake_client = fakes.FakeOpenAI(args.dim, args.latency("embed"))
+    pinecone_upload.client = fake_client
+    pinecone_upload.get_embeddings = timed(pinecone_upload.get_embeddings, embed_samples)
+    fake_index = fakes.FakePineconeIndex(args.latency("upsert"))
+    fake_index.upsert = timed(fake_index.upsert, upsert_samples)
+    pinecone_upload.connect_index = lambda: fake_index
+
+    start = time.perf_counter()
+    error = None
+    try:
+        with quiet(not args.verbose):
+            pinecone_upload.main(target="pinecone")
+    except RuntimeError as e:
+        error = str(e)  # the uploader has no retries: an injected failure aborts it
+    elapsed = time.perf_counter() - start
+
+    items = len(fake_index.vectors)
+    return {
+        "items": items,
+        "seconds": round(elapsed, 3),
+        "items_per_s": round(items / elapsed, 1) if elapsed else None,
+        "errors": fake_client.embed_latency.errors + fake_index.latency.errors,
+        "aborted": error,
+        "stages": {"embed_batch": percentiles(embed_samples), "upsert": percentiles(upsert_samples)}
+    }
+
+
+# -----------------------------
+# load_to_neo4j
+# -----------------------------
+def bench_load(args, fakes, config) -> List[Dict]:
+    import load_to_neo4j
+    from graph_snapshot import GraphSnapshot
+    from ingest import iter_records, iter_valid
+
+    workdir = os.path.dirname(config.LOCAL_INDEX_PATH)
+    runs = []
+    for workers in args.concurrency:
+        fake_driver = fakes.FakeNeo4jDriver(args.latency("graph_write"))
+        samples: List[float] = []
+        session_factory = fake_driver.session
+
+        def session(**kwargs):
+            s = session_factory(**kwargs)
+            s.execute_write = timed(s.execute_write, samples)
+            return s
+
+        fake_driver.session = session
+        load_to_neo4j.driver = fake_driver
+
+        start = time.perf_counter()
+        error = None
+        try:
+            with quiet(not args.verbose):
+                checkpoint_path = os.path.join(workdir, "load.checkpoint.json")
+                load_to_neo4j.bulk_load(DATA_FILE, batch_size=args.batch_size, workers=workers,
+                                        checkpoint_path=checkpoint_path)
+                snapshot = GraphSnapshot.from_dataset(iter_valid(iter_records(DATA_FILE)))
+                load_to_neo4j.write_neighborhoods(snapshot, DATA_FILE, batch_size=args.batch_size, workers=workers,
+                                                  checkpoint_path=checkpoint_path)
+        except RuntimeError as e:
+            error = str(e)  # injected failure aborts the load, as a real one would
+        elapsed = time.perf_counter() - start
+
+        runs.append({
+            "concurrency": workers,
+            "rows": fake_driver.rows,
+            "transactions": len(samples),
+            "seconds": round(elapsed, 3),
+            "rows_per_s": round(fake_driver.rows / elapsed, 1) if elapsed else None,
+            "errors": fake_driver.latency.errors,
+            "aborted": error,
+            "stages": {"transaction": percentiles(samples)}
+        })
+        print(f"  load_to_neo4j workers={workers}: {runs[-1]['rows_per_s']} rows/s")
+    return runs
+
+
+# -----------------------------
+# hybrid_retrieval_async
+# -----------------------------
+def classify(hybrid_chat, result) -> str:
+    answer = result.get("answer") or ""
+    if answer.startswith("An unexpected error occurred"):
+        return "error"
+    if answer in (hybrid_chat.CHAT_ERROR_MESSAGE, hybrid_chat.CHAT_UNAVAILABLE_MESSAGE) or not result.get("matches"):
+        return "degraded"
+    if result["timing"].get("resilience", {}).get("mode", "full") != "full":
+        return "degraded"  # served without a failed dependency (graph/vector only, cached answer)
+    return "ok"
+
+
+async def run_level(hybrid_chat, queries: List[str], concurrency: int, stream: bool) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    stage_samples: Dict[str, List[float]] = {}
+    outcomes = {"ok": 0, "degraded": 0, "error": 0}
+    cache_hits = 0
+
+    def add(name, value):
+        stage_samples.setdefault(name, []).append(value)
+
+    async def one(query):
+        nonlocal cache_hits
+        async with semaphore:
+            start = time.perf_counter()
+            result = await hybrid_chat.hybrid_retrieval_async(query, stream_response=stream)
+            if stream and result.get("stream") is not None:
+                async for _ in result["stream"]:
+                    pass
+                # Measured by the stream itself, from the moment the chat request returned
+                add("first_token", result["stream"].first_token or 0.0)
+                add("generation", result["stream"].generation)
+            add("end_to_end", time.perf_counter() - start)
+
+        outcomes[classify(hybrid_chat, result)] += 1
+        cache_hits += bool(result.get("cached"))
+        for name, t in result["timing"].get("stages", {}).items():
+            add(name, t["duration"])
+        if result["timing"].get("openai"):
+            add("openai", result["timing"]["openai"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "queries": len(queries),
+        "seconds": round(elapsed, 3),
+        "throughput_qps": round(len(queries) / elapsed, 3) if elapsed else None,
+        "outcomes": outcomes,
+        "answer_cache_hits": cache_hits,
+        "stages": {name: percentiles(s) for name, s in sorted(stage_samples.items())}
+    }
+
+
+def bench_queries(args, fakes, config) -> List[Dict]:
+    from graph_snapshot import GraphSnapshot
+    from ingest import iter_records, iter_valid
+    from vector_store import LocalVectorIndex
+
+    build_local_index(fakes, config, args.dim)
+    snapshot = GraphSnapshot.from_dataset(iter_valid(iter_records(DATA_FILE)))
+    snapshot.save(config.GRAPH_SNAPSHOT_PATH)
+
+    with quiet(not args.verbose):
+        import hybrid_chat
+
+    # Fakes stand in for the network clients; indexes and matchers load through the runtime as in production
+    hybrid_chat.runtime.override(
+        aclient=fakes.FakeAsyncOpenAI(
+            args.dim, args.latency("embed"), args.latency("chat"), args.latency("token"),
+            answer_tokens=args.answer_tokens
+        ),
+        vector_backend=fakes.FakeVectorBackend(LocalVectorIndex.load(config.LOCAL_INDEX_PATH), args.latency("vector")),
+        driver=fakes.FakeAsyncNeo4jDriver(snapshot, args.latency("graph"), precomputed=args.graph != "neo4j-live")
+    )
+    if args.graph != "snapshot":
+        hybrid_chat.runtime.override(graph_snapshot=None)  # every expansion goes through the (fake) driver
+    if args.no_lexical:
+        hybrid_chat.runtime.override(lexical_index=None)
+
+    queries = build_queries(args.queries)
+
+    async def sweep():
+        with quiet(not args.verbose):
+            await hybrid_chat.runtime.startup()  # cold start is measured by the startup suite, not here
+        runs = []
+        for concurrency in args.concurrency:
+            # Same query set per level; start each level cold
+            hybrid_chat.embedding_cache.clear()
+            hybrid_chat.answer_cache.invalidate()
+            with quiet(not args.verbose):
+                run = await run_level(hybrid_chat, queries, concurrency, args.stream)
+            run["embedding_batches"] = hybrid_chat.embed_batcher.stats()
+            runs.append(run)
+            e2e = run["stages"].get("end_to_end", {})
+            print(f"  hybrid_retrieval concurrency={concurrency}: {run['throughput_qps']} q/s, "
+                  f"p50 {e2e.get('p50_ms')} ms, p99 {e2e.get('p99_ms')} ms")
+        with quiet(not args.verbose):
+            await hybrid_chat.shutdown()
+        return runs
+
+    return asyncio.run(sweep())
+
+
+# -----------------------------
+# Cold start
+# -----------------------------
+STARTUP_PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+import hybrid_chat
+imported = time.perf_counter() - start
+
+import fakes
+from graph_snapshot import GraphSnapshot
+from vector_store import LocalVectorIndex
+import config
+
+async def main():
+    hybrid_chat.runtime.override(
+        aclient=fakes.FakeAsyncOpenAI(config.PINECONE_VECTOR_DIM, fakes.Latency(), fakes.Latency(), fakes.Latency()),
+        vector_backend=fakes.FakeVectorBackend(LocalVectorIndex.load(config.LOCAL_INDEX_PATH), fakes.Latency()),
+        driver=fakes.FakeAsyncNeo4jDriver(GraphSnapshot.load(config.GRAPH_SNAPSHOT_PATH), fakes.Latency())
+    )
+    started = time.perf_counter()
+    await hybrid_chat.runtime.startup()
+    startup = time.perf_counter() - started
+    first = time.perf_counter()
+    await hybrid_chat.hybrid_retrieval_async("create a romantic 4 day itinerary for Hanoi", stream_response=False)
+    first_query = time.perf_counter() - first
+    await hybrid_chat.runtime.shutdown()
+    return {"import_s": round(imported, 4), "startup_s": round(startup, 4), "first_query_s": round(first_query, 4),
+            "to_first_answer_s": round(time.perf_counter() - start, 4),
+            "connect_seconds": hybrid_chat.runtime.stats()["connect_seconds"]}
+
+print("STARTUP " + json.dumps(asyncio.run(main())))
+"""
+
+
+def write_config_file(config, workdir: str):
+    """The installed benchmark config as a config.py, for child interpreters."""
+    with open(os.path.join(workdir, "config.py"), "w", encoding="utf-8") as f:
+        for key, value in vars(config).items():
+            if key.isupper():
+                f.write(f"{key} = {value!r}\n")
+
+
+def bench_startup(args, fakes, config) -> Dict:
+    """
+    Cold start in fresh interpreters: import hybrid_chat (no clients created),
+    runtime.startup() (clients + indexes, fake clients so no connect time), then
+    one query. Reported as percentiles over `--startup-runs` processes.
+    """
+    from graph_snapshot import GraphSnapshot
+    from ingest import iter_records, iter_valid
+
+    workdir = os.path.dirname(config.LOCAL_INDEX_PATH)
+    if not os.path.exists(f"{config.LOCAL_INDEX_PATH}.npy"):
+        build_local_index(fakes, config, args.dim)
+    if not os.path.exists(f"{config.GRAPH_SNAPSHOT_PATH}.npz"):
+        GraphSnapshot.from_dataset(iter_valid(iter_records(DATA_FILE))).save(config.GRAPH_SNAPSHOT_PATH)
+    write_config_file(config, workdir)
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([workdir, ROOT, HERE]))
+    samples: Dict[str, List[float]] = {}
+    connect = {}
+    for _ in range(args.startup_runs):
+        proc = subprocess.run([sys.executable, "-c", STARTUP_PROBE], cwd=workdir, env=env,
+                              capture_output=True, text=True, check=True)
+        line = next(l for l in proc.stdout.splitlines() if l.startswith("STARTUP "))
+        run = json.loads(line[len("STARTUP "):])
+        connect = run.pop("connect_seconds")
+        for key, value in run.items():
+            samples.setdefault(key[:-2], []).append(value)
+    return {"runs": args.startup_runs, "stages": {name: percentiles(s) for name, s in samples.items()},
+            "connect_seconds": connect}
+
+
+# -----------------------------
+# Compact vector search (recall vs latency vs memory)
+# -----------------------------
+VECTOR_MODES = [
+    # label, search_dim, quantize; "float32" (exact search) is the reference
+    ("float32", None, None),
+    ("int8", None, "int8"),
+    ("f32-d512", 512, None),
+    ("int8-d512", 512, "int8"),
+    ("int8-d256", 256, "int8"),
+]
+
+
+def vector_corpora(args, fakes, config):
+    """
+    (name, rows, queries) per corpus, all L2-normalized float32:
+
+    - dataset: fake embeddings of the travel dataset, padded to --vector-rows with
+      noisy copies. Hashed bag-of-words spreads information evenly over the
+      dimensions, so shortened vectors are a worst case here.
+    - decaying: clustered synthetic vectors whose variance falls off with the
+      dimension index (~1/(i+1)), the way shortened text-embedding-3 vectors keep
+      most of their information in the leading dimensions.
+    """
+    from vector_store import LocalVectorIndex
+
+    rng = np.random.default_rng(args.seed)
+    n, dim = args.vector_rows, args.dim
+    if not os.path.exists(f"{config.LOCAL_INDEX_PATH}.npy"):
+        build_local_index(fakes, config, dim)
+    base = np.asarray(LocalVectorIndex.load(config.LOCAL_INDEX_PATH).vectors, dtype=np.float32)
+    picks = rng.integers(0, len(base), max(0, n - len(base)))
+    noise = rng.normal(scale=0.5 / np.sqrt(dim), size=(len(picks), dim)).astype(np.float32)
+    rows = np.vstack([base, base[picks] + noise])[:n]
+    queries = np.asarray([fakes.fake_embedding(q, dim) for q in build_queries(args.queries)], dtype=np.float32)
+    yield "dataset", _unit(rows), _unit(queries)
+
+    spectrum = (1.0 / np.sqrt(np.arange(1, dim + 1))).astype(np.float32)
+    centers = rng.normal(size=(max(1, n // 10), dim)).astype(np.float32) * spectrum
+    rows = centers[rng.integers(0, len(centers), n)] + rng.normal(size=(n, dim)).astype(np.float32) * spectrum
+    queries = centers[rng.integers(0, len(centers), args.queries)] + \
+        rng.normal(size=(args.queries, dim)).astype(np.float32) * spectrum
+    yield "decaying", _unit(rows), _unit(queries)
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(matrix / np.linalg.norm(matrix, axis=1, keepdims=True), dtype=np.float32)
+
+
+def bench_vectors(args, fakes, config) -> Dict:
+    """
+    LocalVectorIndex with each compact search copy (VECTOR_MODES) and rescore
+    factor against exact float32 search: recall@k (a hit is any row scoring at
+    least the exact k-th score, so tied rows count), single-query latency, and
+    bytes scanned per query.
+    """
+    from vector_store import LocalVectorIndex
+
+    k = args.vector_k
+    corpora = {}
+    for name, rows, queries in vector_corpora(args, fakes, config):
+        path = os.path.join(os.path.dirname(config.LOCAL_INDEX_PATH), f"vectors_{name}")
+        LocalVectorIndex([str(i) for i in range(len(rows))], rows, [{}] * len(rows)).save(path)
+        exact = queries @ rows.T
+        kth = -np.partition(-exact, k - 1, axis=1)[:, k - 1] - 1e-6
+        runs = []
+        for label, search_dim, quantize in VECTOR_MODES:
+            for rescore in (args.rescore if (search_dim or quantize) else [None]):
+                start = time.perf_counter()
+                index = LocalVectorIndex.load(path, search_dim=search_dim, quantize=quantize, rescore=rescore or 1)
+                build = time.perf_counter() - start
+                index.query(queries[0], top_k=k)  # page in the compact copy
+                samples: List[float] = []
+                found = [[int(m["id"]) for m in timed(index.query, samples)(q, top_k=k)] for q in queries]
+                recall = float(np.mean([np.sum(exact[i, ids] >= kth[i]) / k for i, ids in enumerate(found)]))
+                memory = index.memory_bytes()
+                runs.append({"mode": label, "rescore": rescore, f"recall_at_{k}": round(recall, 4),
+                             "latency": percentiles(samples), "search_bytes": memory["search"],
+                             "memory_ratio": memory["ratio"], "load_s": round(build, 3)})
+                print(f"  {name:<8} {label:<9} rescore={rescore or '-':<3} recall@{k} {recall:.3f}  "
+                      f"p50 {runs[-1]['latency']['p50_ms']} ms  memory 1/{memory['ratio']}")
+        corpora[name] = runs
+    return {"rows": args.vector_rows, "dim": args.dim, "k": k, "queries": args.queries, "corpora": corpora}
+
+
+def vector_report(result: Dict) -> str:
+    """Markdown tables of a bench_vectors result (QUANTIZATION_RESULTS.md is generated with this)."""
+    k = result["k"]
+    lines = [f"{result['rows']} vectors x {result['dim']} dims, {result['queries']} single-vector queries, "
+             f"recall@{k} against exact float32 search.", ""]
+    for name, runs in result["corpora"].items():
+        lines += [f"### {name}", "", f"| Search copy | Rescore | Recall@{k} | p50 ms | p95 ms | Scanned MiB | Memory |",
+                  "|---|---|---|---|---|---|---|"]
+        for run in runs:
+            lines.append(f"| {run['mode']} | {run['rescore'] or '-'} | {run[f'recall_at_{k}']:.3f} | "
+                         f"{run['latency']['p50_ms']} | {run['latency']['p95_ms']} | "
+                         f"{run['search_bytes'] / 2**20:.1f} | 1/{run['memory_ratio']} |")
+        lines.append("")
+    return "\n".join(lines)
+
+
+# -----------------------------
+# Regression comparison
+# -----------------------------
+def compare(current: Dict, baseline: Dict, threshold: float = 0.10, floor_ms: float = 1.0):
+    """
+    Print p50/p95 per stage and throughput against a baseline run. Changes beyond
+    `threshold` are flagged, except latency moves smaller than `floor_ms` (timer noise).
+    """
+    print(f"\nComparison against {baseline['git'].get('commit')} ({baseline['created']}):")
+
+    def line(label, new, old, higher_is_better=False):
+        if not old or new is None:
+            return
+        change = (new - old) / old
+        significant = higher_is_better or abs(new - old) >= floor_ms
+        worse = significant and (change < -threshold if higher_is_better else change > threshold)
+        better = significant and (change > threshold if higher_is_better else change < -threshold)
+        flag = "  REGRESSION" if worse else ("  improved" if better else "")
+        print(f"  {label:<48} {old:>10.3f} -> {new:>10.3f} ({change:+.1%}){flag}")
+
+    for section, key in (("hybrid_retrieval", "throughput_qps"), ("load_to_neo4j", "rows_per_s")):
+        old_runs = {r["concurrency"]: r for r in baseline["results"].get(section, [])}
+        for run in current["results"].get(section, []):
+            old = old_runs.get(run["concurrency"])
+            if old is None:
+                continue
+            line(f"{section} c={run['concurrency']} {key}", run[key], old[key], higher_is_better=True)
+            for stage, stats in run["stages"].items():
+                old_stats = old["stages"].get(stage, {})
+                for p in ("p50_ms", "p95_ms"):
+                    line(f"{section} c={run['concurrency']} {stage} {p}", stats.get(p), old_stats.get(p))
+
+    if "startup" in current["results"] and "startup" in baseline["results"]:
+        for stage, stats in current["results"]["startup"]["stages"].items():
+            old_stats = baseline["results"]["startup"]["stages"].get(stage, {})
+            line(f"startup {stage} p50_ms", stats.get("p50_ms"), old_stats.get("p50_ms"))
+
+    if "vectors" in current["results"] and "vectors" in baseline["results"]:
+        for name, runs in current["results"]["vectors"]["corpora"].items():
+            old_runs = {(r["mode"], r["rescore"]): r for r in baseline["results"]["vectors"]["corpora"].get(name, [])}
+            for run in runs:
+                old = old_runs.get((run["mode"], run["rescore"]))
+                if old is None:
+                    continue
+                label = f"vectors {name} {run['mode']} x{run['rescore'] or '-'}"
+                recall = next(key for key in run if key.startswith("recall_at_"))
+                line(f"{label} {recall}", run[recall], old.get(recall), higher_is_better=True)
+                line(f"{label} p50_ms", run["latency"]["p50_ms"], old["latency"].get("p50_ms"))
+
+    if "pinecone_upload" in current["results"] and "pinecone_upload" in baseline["results"]:
+        line("pinecone_upload items_per_s", current["results"]["pinecone_upload"]["items_per_s"],
+             baseline["results"]["pinecone_upload"]["items_per_s"], higher_is_better=True)
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+DEFAULT_LATENCY = {
+    # median_ms, sigma (log-normal shape), error_rate
+    "embed": "120,0.35,0",
+    "chat": "900,0.3,0",
+    "token": "0",
+    "vector": "40,0.4,0",
+    "graph": "25,0.5,0",
+    "upsert": "60,0.3,0",
+    "graph_write": "15,0.4,0",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks against deterministic fake backends.")
+    parser.add_argument("--suites", default="upload,load,query,startup",
+                        help="Comma-separated subset of: upload, load, query, startup, vectors")
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        help="Concurrency levels to sweep (queries in flight / loader workers)")
+    parser.add_argument("--queries", type=int, default=64, help="Queries per concurrency level")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--batch-size", type=int, default=100, help="load_to_neo4j bulk batch size")
+    parser.add_argument("--graph", choices=["snapshot", "neo4j", "neo4j-live"], default="snapshot",
+                        help="Serve graph context from the in-memory snapshot or the fake Neo4j driver "
+                             "(precomputed neighborhood rows, or live expansion without them)")
+    parser.add_argument("--no-lexical", action="store_true", help="Run queries without the BM25 lexical index")
+    parser.add_argument("--stream", action="store_true", help="Stream answers and time first token/generation")
+    parser.add_argument("--answer-tokens", type=int, default=200)
+    parser.add_argument("--startup-runs", type=int, default=5, help="Fresh interpreters timed by the startup suite")
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the semantic answer cache enabled")
+    parser.add_argument("--vector-rows", type=int, default=20000, help="Index size for the vectors suite")
+    parser.add_argument("--vector-k", type=int, default=10, help="top_k whose recall the vectors suite measures")
+    parser.add_argument("--rescore", default="2,4,8", help="Rescore factors (candidates per top_k) to sweep")
+    parser.add_argument("--vector-report", help="Also write the vectors suite as Markdown tables to this file")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiply every simulated latency (e.g. 0.1 for a quick run)")
+    parser.add_argument("--seed", type=int, default=0)
+    for name, spec in DEFAULT_LATENCY.items():
+        parser.add_argument(f"--{name.replace('_', '-')}-latency", dest=f"{name}_latency", default=spec,
+                            help=f"median_ms[,sigma[,error_rate]] (default {spec})")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier result file to diff against")
+    parser.add_argument("--verbose", action="store_true", help="Show the modules' own output")
+    args = parser.parse_args(argv)
+    args.suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    args.rescore = [int(r) for r in args.rescore.split(",")]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="hybrid-bench-")
+    config = install_config(workdir, args.dim, args.answer_cache)
+    import fakes
+
+    seeds = {name: args.seed * 100 + i for i, name in enumerate(DEFAULT_LATENCY)}
+
+    def latency(name):
+        lat = fakes.Latency.parse(getattr(args, f"{name}_latency"), seed=seeds[name])
+        lat.median *= args.time_scale
+        return lat
+
+    args.latency = latency
+
+    results = {}
+    if "upload" in args.suites:
+        print("Benchmarking pinecone_upload...")
+        results["pinecone_upload"] = bench_upload(args, fakes, config)
+        print(f"  pinecone_upload: {results['pinecone_upload']['items_per_s']} items/s")
+    if "load" in args.suites:
+        print("Benchmarking load_to_neo4j (bulk)...")
+        results["load_to_neo4j"] = bench_load(args, fakes, config)
+    if "query" in args.suites:
+        print(f"Benchmarking hybrid_retrieval_async ({args.queries} queries per level)...")
+        results["hybrid_retrieval"] = bench_queries(args, fakes, config)
+
+    if "startup" in args.suites:
+        print("Benchmarking cold start (import hybrid_chat -> first answer)...")
+        results["startup"] = bench_startup(args, fakes, config)
+        stages = results["startup"]["stages"]
+        print("  " + ", ".join(f"{name} p50 {stats['p50_ms']} ms" for name, stats in stages.items()))
+    if "vectors" in args.suites:
+        print(f"Benchmarking compact vector search ({args.vector_rows} vectors, {args.queries} queries)...")
+        results["vectors"] = bench_vectors(args, fakes, config)
+        if args.vector_report:
+            with open(args.vector_report, "w", encoding="utf-8") as f:
+                f.write(vector_report(results["vectors"]))
+
+    report = {
+        "schema": SCHEMA_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": git_revision(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__
+        },
+        "params": {
+            key: value for key, value in vars(args).items()
+            if key not in ("latency", "output", "compare", "verbose", "vector_report")
+        },
+        "results": results
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (report["git"]["commit"] or "nogit")[:10]
+        output = os.path.join(RESULTS_DIR, f"{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,3 +10,104 @@ PINECONE_API_KEY = "your-pinecone-api-key-here"  # Example: pcsk_...
 PINECONE_ENV = "us-east-1"   # AWS region for serverless
 PINECONE_INDEX_NAME = "vietnam-travel"
 PINECONE_VECTOR_DIM = 1536  # text-embedding-3-small dimension
+
+# Vector backend: "pinecone" (managed) or "local" (in-process index built by pinecone_upload.py --target local)
+VECTOR_BACKEND = "pinecone"
+LOCAL_INDEX_PATH = "vector_index"  # writes vector_index.npy + vector_index.json
+
+# In-memory graph snapshot (written by load_to_neo4j.py); Neo4j is used when it is missing
+GRAPH_SNAPSHOT_PATH = "graph_snapshot"  # writes graph_snapshot.npz + graph_snapshot.json
+
+# BM25 lexical index (written by pinecone_upload.py / lexical_index.py); skipped when missing
+LEXICAL_INDEX_PATH = "lexical_index"  # writes lexical_index.npz + lexical_index.json
+LEXICAL_TOP_K = 5
+LEXICAL_SKIP_EMBEDDING = False  # True: confident lexical hits replace vector search (answer cache only sees cached embeddings)
+LEXICAL_MIN_SCORE = 10.0  # confident needs a top BM25 score at least this high...
+LEXICAL_MIN_MARGIN = 0.15  # ...leading the runner-up by this fraction of its score...
+LEXICAL_MIN_TERMS = 2  # ...and this many distinctive query terms (in at most 5% of documents)
+
+# Prompt packing: input-token budget per chat call (system prompt + context + query), counted with
+# tiktoken when installed (else ~4 chars/token); entity descriptions are cut to this many tokens
+PROMPT_TOKEN_BUDGET = 2000
+PROMPT_DESCRIPTION_TOKENS = 60
+
+# Embedding cache: LRU in memory + SQLite file shared by restarts and worker processes
+EMBED_CACHE_PATH = "embedding_cache.sqlite"  # None for memory only
+EMBED_CACHE_MAX_BYTES = 64 * 1024 * 1024
+EMBED_CACHE_TTL = 7 * 24 * 3600  # seconds
+EMBED_CACHE_QUANTIZE = False  # int8 entries: ~4x more cached embeddings per byte (cosine to original > 0.999)
+
+# Compact vectors (see QUANTIZATION_RESULTS.md)
+EMBED_DIMENSIONS = None  # e.g. 512: shortened text-embedding-3 output everywhere (needs a full re-upload)
+VECTOR_SEARCH_DIM = None  # local index: first pass on this many leading dimensions (e.g. 512)...
+VECTOR_QUANTIZATION = None  # ...and/or "int8"; the best candidates are then rescored at full precision
+VECTOR_RESCORE_FACTOR = 8  # candidates rescored per requested result
+
+# Semantic answer cache (skips retrieval + generation for near-duplicate queries with the same intent)
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_THRESHOLD = 0.95  # minimum cosine similarity between query embeddings
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_TTL = 3600  # seconds
+
+# Embedding micro-batching: concurrent cache misses within the window share one API call
+EMBED_BATCH_WINDOW_MS = 5
+EMBED_BATCH_MAX = 64
+
+# Stage scheduling
+INTENT_PREFETCH_SEEDS = 3  # entities matched on intent keywords whose neighborhoods are prefetched
+GRAPH_PRECOMPUTED_NEIGHBORHOODS = True  # Neo4j: read the summaries load_to_neo4j.py stores on each node
+
+# Vector search shaped by intent: type / city metadata filters pushed into the query, top_k per query
+VECTOR_FILTER_ENABLED = True
+VECTOR_FILTER_MIN_RESULTS = 3  # fewer filtered hits than this -> fill up from an unfiltered query
+ADAPTIVE_TOP_K = True
+TOP_K_MIN = 3  # point lookups: a requested type in a named place ("hotels in Hoi An")
+TOP_K_MAX = 12
+TOP_K_PER_DAY = 2  # multi-day itineraries: extra candidates per day beyond the first
+
+# Multi-city / multi-style queries: split into per-city and per-style sub-queries run concurrently, fused
+MULTI_AGENT_ENABLED = True  # default for hybrid_retrieval_async(use_multi_agent=None)
+MULTI_AGENT_MAX_SUBQUERIES = 6
+MULTI_AGENT_SUBQUERY_K = 5  # vector results per sub-query
+MULTI_AGENT_CONCURRENCY = 8  # sub-queries in flight across all queries in the process
+MULTI_AGENT_MAX_MATCHES = 20  # fused matches kept for a split query
+
+# HTTP server (server.py): admission control and load shedding
+SERVER_MAX_IN_FLIGHT = 64  # concurrent queries running retrieval/generation
+SERVER_MAX_QUEUE = 256  # queries allowed to wait for a slot; beyond this -> 429
+SERVER_QUEUE_TIMEOUT = 2.0  # seconds a queued query may wait before 429
+
+# Resilience: one deadline per query split across dependencies, bounded retries, hedging, circuit breakers
+QUERY_DEADLINE_S = 20.0
+STAGE_SHARES = {"vector": 0.25, "graph": 0.25, "chat": 0.75}  # max fraction of the deadline per dependency
+VECTOR_TIMEOUT_S = 3.0  # per attempt
+GRAPH_TIMEOUT_S = 3.0
+CHAT_TIMEOUT_S = 15.0
+HEDGE_ENABLED = True  # vector / graph: send a duplicate request once a call is slower than HEDGE_QUANTILE
+HEDGE_QUANTILE = 0.95
+RETRY_BUDGET_RATIO = 0.2  # retries per request, per dependency (token bucket)
+BREAKER_FAILURES = 5  # consecutive failures that open a circuit (vector -> graph only, graph -> vector only)
+BREAKER_RESET_S = 10.0
+DEGRADED_ANSWER_THRESHOLD = 0.85  # chat down: serve a cached answer this similar instead of an error
+
+# Streaming answers: small token deltas are coalesced; abandoned or overlong generations are closed upstream
+STREAM_MIN_CHUNK_CHARS = 24
+STREAM_MAX_DELAY_MS = 50  # flush a partial chunk once its oldest delta waited this long
+GENERATION_DEADLINE_S = 60.0
+
+# Startup: clients are created lazily; hybrid_chat.startup() (server / chat) creates them up front
+RUNTIME_WARM_UP = True  # also pre-open the OpenAI / Pinecone / Neo4j connections during startup()
+
+# Telemetry: per-stage spans, retry/fallback counters, latency histograms (off = near-zero cost)
+TELEMETRY_ENABLED = False
+TELEMETRY_JSON_LOG = None  # e.g. "traces.jsonl": one JSON line per finished span
+TELEMETRY_METRICS_PORT = None  # e.g. 9100: Prometheus /metrics for the interactive chat (server.py serves /metrics itself)
+
+# Fusion of the ranked lists (vector, graph, ...): "rrf" or "score" (min-max normalized CombSUM)
+FUSION_METHOD = "rrf"
+RRF_K = 60
+FUSION_WEIGHTS = {"vector": 1.0, "lexical": 1.0, "graph": 1.0, "subquery": 1.0}  # "subquery": each sub-query list
+
+# Intent taxonomy: JSON list of {"style", "triggers", "keywords", "entity_types"} (default: intent.DEFAULT_TAXONOMY).
+# Dataset tags are added to the matcher vocabulary automatically.
+INTENT_TAXONOMY_FILE = None
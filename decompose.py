@@ -0,0 +1,81 @@
+# decompose.py
+import copy
+from typing import Callable, Dict, Iterable, List, Optional
+
+MAX_SUBQUERIES = 6
+
+# -----------------------------
+# Sub-query planning
+# -----------------------------
+def _join(words: List[str]) -> str:
+    if len(words) <= 1:
+        return "".join(words)
+    return ", ".join(words[:-1]) + " and " + words[-1]
+
+
+def plan_subqueries(intent: Dict, style_profile: Callable[[str], Dict],
+                    max_subqueries: int = MAX_SUBQUERIES) -> List[Dict]:
+    """
+    Split a multi-facet query into focused sub-queries, one per named city and
+    one per detected style ("2 weeks covering Hanoi, Hue and Hoi An with food
+    and beaches" -> food and beach in Hanoi / in Hue / in Hoi An, food in all
+    three, beach in all three). Cities come first; at most `max_subqueries`.
+
+    Each sub-query is {"name", "text", "intent"}: `text` is what gets embedded,
+    `intent` a narrowed copy of the query intent (its vector filter and graph
+    keywords). A query naming at most one city and one style has nothing to
+    split and gets [].
+    """
+    cities = list(intent.get("cities") or [])
+    styles = list(intent.get("styles") or ([intent["style"]] if intent.get("style") else []))
+    if len(cities) < 2 and len(styles) < 2:
+        return []
+
+    requested = [t.lower() + "s" for t in intent.get("requested_types") or []]
+    facets = _join(styles + requested) or "things to do"
+    plan = []
+    if len(cities) > 1:
+        for city in cities:
+            sub_intent = copy.deepcopy(intent)
+            sub_intent["cities"] = [city]
+            sub_intent["duration"] = None  # one stop of the trip, not the whole itinerary
+            plan.append({"name": f"city:{city}", "text": f"{facets} in {city}", "intent": sub_intent})
+    if len(styles) > 1:
+        where = _join(cities) or "Vietnam"
+        for style in styles:
+            profile = style_profile(style)
+            sub_intent = copy.deepcopy(intent)
+            sub_intent.update(style=style, styles=[style], keywords=profile["keywords"],
+                              entity_types=profile["entity_types"], duration=None)
+            words = " ".join(dict.fromkeys([style] + profile["keywords"]))
+            plan.append({"name": f"style:{style}", "text": f"{words} in {where}", "intent": sub_intent})
+    return plan[:max_subqueries]
+
+
+# -----------------------------
+# Merging
+# -----------------------------
+def dedupe_matches(lists: Iterable[List[Dict]]) -> Dict[str, Dict]:
+    """id -> match over several match lists; the first list holding an id supplies its match."""
+    by_id: Dict[str, Dict] = {}
+    for matches in lists:
+        for match in matches:
+            node_id = match.get("id")
+            if node_id and node_id not in by_id:
+                by_id[node_id] = match
+    return by_id
+
+
+def dedupe_facts(facts: Iterable[Dict], limit: Optional[int] = None) -> List[Dict]:
+    """Graph facts without repeats of the same (source, relationship, target), first occurrence kept."""
+    seen = set()
+    unique = []
+    for fact in facts:
+        key = (fact.get("source"), fact.get("rel"), fact.get("target_id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(fact)
+        if limit is not None and len(unique) >= limit:
+            break
+    return unique
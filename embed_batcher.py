@@ -0,0 +1,123 @@
+# embed_batcher.py
+import asyncio
+import inspect
+import time
+from collections import deque
+from typing import Callable, Dict, List, Sequence
+
+# -----------------------------
+# Micro-batching coalescer for embedding requests
+# -----------------------------
+class EmbeddingBatcher:
+    """
+    Coalesce concurrent embedding requests into batched API calls.
+
+    Callers `await batcher.embed(text)`. The first pending request opens a
+    window of `window_ms`; everything that arrives inside it (or until
+    `max_batch` texts are waiting) is sent as one call to `embed_batch_fn`,
+    and each caller receives its own vector. Identical texts in a batch are
+    sent once.
+
+    `embed_batch_fn(texts) -> vectors` may be a plain function (run in a worker
+    thread) or a coroutine function.
+    """
+
+    def __init__(self, embed_batch_fn: Callable[[List[str]], Sequence], window_ms: float = 5.0,
+                 max_batch: int = 64, latency_samples: int = 1000):
+        self.embed_batch_fn = embed_batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._is_async = inspect.iscoroutinefunction(embed_batch_fn)
+
+        self._loop = None
+        self._pending: List[tuple] = []  # (text, future)
+        self._timer = None
+        self._tasks: set = set()  # in-flight sends; the loop itself only holds weak references
+
+        self.requests = 0
+        self.batches = 0
+        self.texts_sent = 0
+        self.batch_latencies = deque(maxlen=latency_samples)
+
+    def _bind_loop(self):
+        # Pending requests belong to one event loop; rebind if the caller starts a new one (e.g. repeated asyncio.run)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+            self._tasks = set()
+        return loop
+
+    async def embed(self, text: str):
+        loop = self._bind_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending:
+            self._timer = self._loop.call_later(self.window, self._flush)
+        if batch:
+            task = self._loop.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Send whatever is still waiting for its window and wait for all in-flight batches."""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        while self._pending:
+            self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _send(self, batch: List[tuple]):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        start = time.perf_counter()
+        try:
+            if self._is_async:
+                vectors = await self.embed_batch_fn(texts)
+            else:
+                vectors = await asyncio.to_thread(self.embed_batch_fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.batch_latencies.append(time.perf_counter() - start)
+            self.batches += 1
+            self.texts_sent += len(texts)
+
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> Dict:
+        latencies = sorted(self.batch_latencies)
+
+        def pct(p):
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000, 2) if latencies else 0.0
+
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.texts_sent / self.batches, 2) if self.batches else 0.0,
+            "batch_latency_ms_p50": pct(0.50),
+            "batch_latency_ms_p95": pct(0.95),
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch
+        }
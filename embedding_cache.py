@@ -0,0 +1,322 @@
+# embedding_cache.py
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence, Dict
+
+import numpy as np
+
+from vector_store import dequantize_int8, quantize_int8
+
+# -----------------------------
+# Bounded, persistent embedding cache
+# -----------------------------
+class EmbeddingCache:
+    """
+    Two-tier embedding cache.
+
+    - Memory tier: LRU OrderedDict of float32 vectors, bounded by `max_bytes`.
+    - Disk tier (optional): SQLite file in WAL mode, so a restarted process or a
+      second worker on the same machine starts warm. Bounded by the same byte
+      budget, pruned least-recently-used first.
+
+    Entries older than `ttl_seconds` are treated as misses and dropped.
+
+    Disk writes are buffered: put() only touches memory, and pending rows (plus
+    access-time bumps and expiry deletes) are committed together by flush() -
+    every FLUSH_BATCH rows / FLUSH_INTERVAL seconds, and on close(). From async
+    code use aget()/aput(), which run SQLite reads and flushes on a worker
+    thread instead of the event loop.
+
+    With `quantize=True` both tiers hold int8 codes plus one float32 scale
+    (~4x more entries per byte); get() returns the dequantized float32 vector,
+    whose cosine with the original is > 0.999. Rows are decoded by their stored
+    size, so float32 and int8 entries can share one file.
+    """
+
+    # Only bump the on-disk access time when it is at least this stale
+    ACCESS_TOUCH_INTERVAL = 60.0
+    # Check the disk budget every N writes rather than on every put
+    PRUNE_EVERY = 64
+    # Commit buffered writes once this many are pending / this many seconds after the last flush
+    FLUSH_BATCH = 32
+    FLUSH_INTERVAL = 2.0
+
+    def __init__(self, path: Optional[str] = "embedding_cache.sqlite", max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600, namespace: str = "", quantize: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.quantize = quantize
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored vector, created_at, dim)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()  # memory tier + pending writes
+        self._db_lock = threading.Lock()  # the SQLite connection (reads and flushes run off the event loop)
+        self._pending: Dict[str, tuple] = {}  # key -> row awaiting INSERT
+        self._touched: Dict[str, float] = {}  # key -> access time awaiting UPDATE
+        self._expired_keys: set = set()  # keys awaiting DELETE
+        self._last_flush = time.time()
+        self._flushing = False
+        self._flush_tasks: set = set()
+        self._writes_since_prune = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.expirations = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, dim INTEGER, vector BLOB, created REAL, accessed REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings(accessed)")
+            self._db.commit()
+
+    def key(self, text: str) -> str:
+        """Cache key from model namespace + text."""
+        return hashlib.sha1(f"{self.namespace}\n{text}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    # ---- stored form ----
+    def _encode(self, vector: np.ndarray) -> np.ndarray:
+        """What the tiers store: the float32 vector, or float32 scale + int8 codes as one byte array."""
+        if not self.quantize:
+            return vector
+        codes, scale = quantize_int8(vector)
+        packed = np.frombuffer(np.float32(scale).tobytes() + codes.tobytes(), dtype=np.uint8)
+        packed.setflags(write=False)
+        return packed
+
+    @staticmethod
+    def _decode(stored: np.ndarray, dim: int) -> np.ndarray:
+        if stored.dtype == np.float32:
+            return stored
+        scale = np.frombuffer(stored[:4].tobytes(), dtype=np.float32)[0]
+        vector = dequantize_int8(stored[4:4 + dim].view(np.int8), scale)
+        vector.setflags(write=False)
+        return vector
+
+    @staticmethod
+    def _from_blob(blob: bytes, dim: int) -> np.ndarray:
+        if len(blob) == dim * 4:
+            return np.frombuffer(blob, dtype=np.float32, count=dim)
+        return np.frombuffer(blob, dtype=np.uint8)
+
+    # ---- memory tier ----
+    def _remember(self, key: str, vector: np.ndarray, created_at: float, dim: int):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old[0].nbytes
+        self._memory[key] = (vector, created_at, dim)
+        self._memory_bytes += vector.nbytes
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, (evicted, _, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _memory_get(self, key: str, now: float) -> Optional[np.ndarray]:
+        """Memory tier (and not-yet-flushed writes) only; never touches SQLite."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return self._decode(entry[0], entry[2])
+                self._memory.pop(key)
+                self._memory_bytes -= entry[0].nbytes
+                self.expirations += 1
+            row = self._pending.get(key)
+            if row is not None and not self._expired(row[3], now):
+                dim, blob, created = row[1], row[2], row[3]
+                stored = self._from_blob(blob, dim)
+                self._remember(key, stored, created, dim)
+                self.hits += 1
+                return self._decode(stored, dim)
+            if self._db is None:
+                self.misses += 1
+        return None
+
+    def _disk_get(self, key: str, now: float) -> Optional[np.ndarray]:
+        """SQLite lookup for a memory miss (blocking - run off the event loop from async code)."""
+        with self._db_lock:
+            if self._db is None:
+                row = None
+            else:
+                row = self._db.execute(
+                    "SELECT dim, vector, created, accessed FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+        with self._lock:
+            if row is not None:
+                dim, blob, created, accessed = row
+                if self._expired(created, now):
+                    self._expired_keys.add(key)
+                    self.expirations += 1
+                else:
+                    stored = self._from_blob(blob, dim)
+                    self._remember(key, stored, created, dim)
+                    if now - accessed > self.ACCESS_TOUCH_INTERVAL:
+                        self._touched[key] = now
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return self._decode(stored, dim)
+            self.misses += 1
+            return None
+
+    # ---- public API ----
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        now = time.time()
+        found = self._memory_get(key, now)
+        if found is not None or self._db is None:
+            return found
+        return self._disk_get(key, now)
+
+    async def aget(self, text: str) -> Optional[np.ndarray]:
+        """get() for async callers: memory hits return inline, disk lookups run on a worker thread."""
+        key = self.key(text)
+        now = time.time()
+        found = self._memory_get(key, now)
+        if found is not None or self._db is None:
+            return found
+        return await asyncio.to_thread(self._disk_get, key, now)
+
+    def _store(self, text: str, vector: Sequence[float]) -> np.ndarray:
+        key = self.key(text)
+        now = time.time()
+        arr = np.ascontiguousarray(vector, dtype=np.float32)
+        arr.setflags(write=False)
+        stored = self._encode(arr)
+        with self._lock:
+            self._remember(key, stored, now, arr.shape[0])
+            if self._db is not None:
+                self._pending[key] = (key, arr.shape[0], stored.tobytes(), now, now)
+                self._expired_keys.discard(key)
+        return self._decode(stored, arr.shape[0])
+
+    def _flush_due(self) -> bool:
+        if self._flushing or not (self._pending or self._touched or self._expired_keys):
+            return False
+        return len(self._pending) >= self.FLUSH_BATCH or time.time() - self._last_flush >= self.FLUSH_INTERVAL
+
+    def put(self, text: str, vector: Sequence[float]) -> np.ndarray:
+        """Store a vector and return it as float32 (as later get() calls will: dequantized when quantizing)."""
+        result = self._store(text, vector)
+        if self._flush_due():
+            self.flush()
+        return result
+
+    async def aput(self, text: str, vector: Sequence[float]) -> np.ndarray:
+        """put() for async callers: a due flush is committed on a worker thread in the background."""
+        result = self._store(text, vector)
+        if self._flush_due():
+            self._flushing = True
+            task = asyncio.get_running_loop().create_task(asyncio.to_thread(self.flush))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+        return result
+
+    def flush(self):
+        """Commit buffered inserts, access-time bumps and expiry deletes in one transaction."""
+        with self._lock:
+            self._flushing = True
+            pending = dict(self._pending)
+            touched = self._touched
+            expired = self._expired_keys
+            self._touched, self._expired_keys = {}, set()
+        try:
+            with self._db_lock:
+                if self._db is None:
+                    return
+                if pending or touched or expired:
+                    self._db.executemany("DELETE FROM embeddings WHERE key = ?", [(k,) for k in expired])
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, dim, vector, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                        list(pending.values())
+                    )
+                    self._db.executemany("UPDATE embeddings SET accessed = ? WHERE key = ?",
+                                         [(t, k) for k, t in touched.items()])
+                    self._db.commit()
+                self._writes_since_prune += len(pending)
+                if self._writes_since_prune >= self.PRUNE_EVERY:
+                    self._prune_disk(time.time())
+            with self._lock:
+                # Rows re-put while this flush ran stay pending
+                for key, row in pending.items():
+                    if self._pending.get(key) is row:
+                        del self._pending[key]
+        finally:
+            self._last_flush = time.time()
+            self._flushing = False
+
+    def _prune_disk(self, now: float):
+        """Drop expired rows, then least-recently-used rows until under budget (caller holds _db_lock)."""
+        self._writes_since_prune = 0
+        if self.ttl_seconds is not None:
+            cur = self._db.execute("DELETE FROM embeddings WHERE created < ?", (now - self.ttl_seconds,))
+            self.expirations += cur.rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            doomed = []
+            for key, size in self._db.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY accessed"):
+                if freed >= excess:
+                    break
+                doomed.append((key,))
+                freed += size
+            self._db.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+            self.disk_evictions += len(doomed)
+        self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._pending.clear()
+            self._touched.clear()
+            self._expired_keys.clear()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        return len(self._memory)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "expirations": self.expirations,
+            "entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "pending_writes": len(self._pending)
+        }
@@ -0,0 +1,317 @@
+# graph_snapshot.py
+import argparse
+import json
+import os
+from typing import List, Dict, Iterable, Optional
+
+import numpy as np
+
+from ingest import iter_records, iter_valid
+
+DATA_FILE = "vietnam_travel_dataset.json"
+DEFAULT_SNAPSHOT_PATH = "graph_snapshot"
+
+# Relationship importance: ranks graph facts at query time and neighbors in precomputed summaries
+RELATIONSHIP_WEIGHTS = {
+    'Located_In': 1.0,
+    'Connected_To': 0.9,
+    'Near': 0.8,
+    'Has_Activity': 0.7,
+    'Has_Restaurant': 0.7,
+    'Has_Hotel': 0.7,
+    'Related_To': 0.5,
+    'RELATED_TO': 0.5
+}
+SUMMARY_TOP_N = 20  # neighbors kept per node in a precomputed neighborhood summary
+SUMMARY_DESC_CHARS = 300  # description characters kept per neighbor (prompts use ~60 tokens)
+
+# -----------------------------
+# CSR adjacency snapshot
+# -----------------------------
+def rel_code_dtype(rel_type_count: int):
+    """Smallest unsigned dtype that can hold a code for each of `rel_type_count` relationship types."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if rel_type_count <= np.iinfo(dtype).max + 1:
+            return dtype
+    raise ValueError(f"too many relationship types for the snapshot: {rel_type_count}")
+
+
+class GraphSnapshot:
+    """
+    Read-only, in-memory copy of the travel graph in CSR form.
+
+    Nodes get dense integer ids (row order of `ids`). For node i, its neighbors are
+    neighbors[offsets[i]:offsets[i+1]] and the matching relationship types are
+    rel_types[rel_codes[offsets[i]:offsets[i+1]]]. Relationships are stored in both
+    directions, mirroring the undirected `(n)-[r]-(m)` match used against Neo4j.
+
+    On disk: <path>.npz (offsets, neighbors, rel_codes) + <path>.json (strings).
+    """
+
+    def __init__(self, ids, names, types, descriptions, rel_types, offsets, neighbors, rel_codes):
+        self.ids = list(ids)
+        self.names = list(names)
+        self.types = list(types)
+        self.descriptions = list(descriptions)
+        self.rel_types = list(rel_types)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.neighbors = np.asarray(neighbors, dtype=np.int32)
+        self.rel_codes = np.asarray(rel_codes, dtype=rel_code_dtype(len(self.rel_types)))
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        self._search_text = None  # lowercased name + description, built on first find_nodes()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self) -> int:
+        return int(self.neighbors.shape[0]) // 2
+
+    # ---- construction ----
+    @classmethod
+    def from_edges(cls, nodes: List[Dict], edges: Iterable[tuple]) -> "GraphSnapshot":
+        """
+        Build from node dicts (id, name, type, description) and (source_id, rel, target_id)
+        edges. Edges whose endpoints are unknown are skipped, like the MATCH in load_to_neo4j.
+        """
+        ids = [n["id"] for n in nodes]
+        index = {node_id: i for i, node_id in enumerate(ids)}
+        rel_types: List[str] = []
+        rel_lookup: Dict[str, int] = {}
+
+        src, dst, codes = [], [], []
+        seen = set()
+        for source_id, rel, target_id in edges:
+            a, b = index.get(source_id), index.get(target_id)
+            if a is None or b is None or (a, rel, b) in seen:
+                continue
+            seen.add((a, rel, b))
+            if rel not in rel_lookup:
+                rel_lookup[rel] = len(rel_types)
+                rel_types.append(rel)
+            src.append(a)
+            dst.append(b)
+            codes.append(rel_lookup[rel])
+
+        return cls.from_arrays(
+            ids,
+            [n.get("name") or n["id"] for n in nodes],
+            [n.get("type") or "Unknown" for n in nodes],
+            [n.get("description") or "" for n in nodes],
+            rel_types, src, dst, codes
+        )
+
+    @classmethod
+    def from_arrays(cls, ids, names, types, descriptions, rel_types, src, dst, codes) -> "GraphSnapshot":
+        """
+        Build from node columns and parallel arrays of (already de-duplicated)
+        relationships: source index, target index, relationship code. Each is
+        stored in both directions.
+        """
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        codes = np.asarray(codes, dtype=rel_code_dtype(len(rel_types)))
+        # Interleaved (a->b, b->a) per relationship, then a stable sort by source
+        both_src = np.stack([src, dst], axis=1).ravel()
+        both_dst = np.stack([dst, src], axis=1).ravel()
+        order = np.argsort(both_src, kind="stable")
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(both_src, minlength=len(ids)), out=offsets[1:])
+        return cls(ids, names, types, descriptions, rel_types, offsets,
+                   both_dst[order].astype(np.int32), np.repeat(codes, 2)[order])
+
+    @classmethod
+    def from_dataset(cls, records: Iterable[Dict]) -> "GraphSnapshot":
+        """
+        Build from dataset records (same shape as vietnam_travel_dataset.json) in one
+        pass; `records` may be a stream. Only the columns the snapshot keeps are retained.
+        """
+        nodes, edges = [], []
+        for record in records:
+            nodes.append({k: record.get(k) for k in ("id", "name", "type", "description")})
+            edges.extend(
+                (record["id"], rel.get("relation", "RELATED_TO"), rel["target"])
+                for rel in record.get("connections", [])
+                if rel.get("target")
+            )
+        return cls.from_edges(nodes, edges)
+
+    @classmethod
+    def from_neo4j(cls, driver) -> "GraphSnapshot":
+        """Export the current graph from Neo4j (two reads, run once)."""
+        with driver.session() as session:
+            nodes = [
+                dict(record) for record in session.run(
+                    "MATCH (n:Entity) RETURN n.id AS id, n.name AS name, "
+                    "n.type AS type, n.description AS description"
+                )
+            ]
+            edges = [
+                (record["a"], record["rel"], record["b"]) for record in session.run(
+                    "MATCH (a:Entity)-[r]->(b:Entity) RETURN a.id AS a, type(r) AS rel, b.id AS b"
+                )
+            ]
+        return cls.from_edges(nodes, edges)
+
+    # ---- persistence ----
+    @classmethod
+    def load(cls, path: str = DEFAULT_SNAPSHOT_PATH) -> "GraphSnapshot":
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            header = json.load(f)
+        arrays = np.load(f"{path}.npz")
+        return cls(
+            header["ids"], header["names"], header["types"], header["descriptions"],
+            header["rel_types"], arrays["offsets"], arrays["neighbors"], arrays["rel_codes"]
+        )
+
+    def save(self, path: str = DEFAULT_SNAPSHOT_PATH):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # np.savez appends .npz unless the name already ends with it
+        tmp_npz = f"{path}.tmp.npz"
+        np.savez(tmp_npz, offsets=self.offsets, neighbors=self.neighbors, rel_codes=self.rel_codes)
+        tmp_json = f"{path}.json.tmp"
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "names": self.names,
+                "types": self.types,
+                "descriptions": self.descriptions,
+                "rel_types": self.rel_types
+            }, f)
+
+        os.replace(tmp_npz, f"{path}.npz")
+        os.replace(tmp_json, f"{path}.json")
+
+    # ---- queries ----
+    def neighbors_of(self, idx: int):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return self.neighbors[start:end], self.rel_codes[start:end]
+
+    def _fact(self, source_idx: int, target_idx: int, code: int, desc_chars: int) -> Dict:
+        target_type = self.types[target_idx]
+        return {
+            "source": self.ids[source_idx],
+            "rel": self.rel_types[code],
+            "target_id": self.ids[target_idx],
+            "target_name": self.names[target_idx],
+            "target_desc": self.descriptions[target_idx][:desc_chars],
+            "labels": [target_type, "Entity"]
+        }
+
+    def find_nodes(self, types: Iterable[str], keywords: Iterable[str], limit: int = 3) -> List[str]:
+        """Ids of nodes of the given types ranked by how many keywords their name/description mention."""
+        if self._search_text is None:
+            self._search_text = [f"{n} {d}".lower() for n, d in zip(self.names, self.descriptions)]
+        types = set(types)
+        keywords = [k.lower() for k in keywords]
+        scored = []
+        for i, text in enumerate(self._search_text):
+            if self.types[i] not in types:
+                continue
+            hits = sum(1 for k in keywords if k in text)
+            if hits:
+                scored.append((-hits, i))
+        scored.sort()
+        return [self.ids[i] for _, i in scored[:limit]]
+
+    def neighborhood(self, node_ids: List[str], depth: int = 1, limit: int = 100,
+                     desc_chars: int = 400) -> List[Dict]:
+        """
+        k-hop expansion from node_ids, returned as fact dicts shaped like the
+        Neo4j rows in fetch_graph_context. Hop 1 lists every relationship of the
+        seeds; deeper hops only follow edges to nodes not seen yet. `source` is the
+        node the target was reached from.
+        """
+        frontier = [self.index[n] for n in node_ids if n in self.index]
+        visited = set(frontier)
+        facts: List[Dict] = []
+
+        for hop in range(max(depth, 1)):
+            next_frontier = []
+            for src in frontier:
+                nbrs, codes = self.neighbors_of(src)
+                for dst, code in zip(nbrs.tolist(), codes.tolist()):
+                    if hop > 0 and dst in visited:
+                        continue
+                    facts.append(self._fact(src, dst, code, desc_chars))
+                    if len(facts) >= limit:
+                        return facts
+                    if dst not in visited:
+                        visited.add(dst)
+                        next_frontier.append(dst)
+            frontier = next_frontier
+            if not frontier:
+                break
+
+        return facts
+
+    def neighborhood_summary(self, node_id: str, top_n: int = SUMMARY_TOP_N,
+                             desc_chars: int = SUMMARY_DESC_CHARS, weights: Dict[str, float] = RELATIONSHIP_WEIGHTS) -> List[list]:
+        """
+        Compact 1-hop neighborhood of one node for materializing at load time:
+        [rel, id, name, type, description] rows, heaviest relationship first
+        (ties keep adjacency order), at most `top_n`, descriptions truncated.
+        """
+        idx = self.index.get(node_id)
+        if idx is None:
+            return []
+        nbrs, codes = self.neighbors_of(idx)
+        rows = sorted(zip(nbrs.tolist(), codes.tolist()),
+                      key=lambda nc: -weights.get(self.rel_types[nc[1]], 0.5))[:top_n]
+        return [
+            [self.rel_types[code], self.ids[dst], self.names[dst], self.types[dst], self.descriptions[dst][:desc_chars]]
+            for dst, code in rows
+        ]
+
+
+def encode_summary(rows: List[list]) -> str:
+    """Neighborhood summary as the compact JSON string stored on the node (Neo4j properties cannot hold maps)."""
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+
+
+def summary_facts(source_id: str, summary: str) -> List[Dict]:
+    """Decode a stored summary into fact dicts shaped like GraphSnapshot.neighborhood() rows."""
+    return [
+        {"source": source_id, "rel": rel, "target_id": target_id, "target_name": name,
+         "target_desc": description, "labels": [node_type, "Entity"]}
+        for rel, target_id, name, node_type, description in json.loads(summary)
+    ]
+
+
+def load_snapshot(path: str = DEFAULT_SNAPSHOT_PATH) -> Optional[GraphSnapshot]:
+    """Load a snapshot if one has been built, else None."""
+    if not (os.path.exists(f"{path}.npz") and os.path.exists(f"{path}.json")):
+        return None
+    return GraphSnapshot.load(path)
+
+
+# -----------------------------
+# CLI: build a snapshot
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Build the in-memory graph snapshot used by hybrid_chat.")
+    parser.add_argument("--from-neo4j", action="store_true",
+                        help="Export from the live Neo4j graph instead of the dataset JSON")
+    parser.add_argument("--data-file", default=DATA_FILE)
+    parser.add_argument("--output", default=DEFAULT_SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    if args.from_neo4j:
+        from neo4j import GraphDatabase
+        import config
+        driver = GraphDatabase.driver(config.NEO4J_URI, auth=(config.NEO4J_USER, config.NEO4J_PASSWORD))
+        try:
+            snapshot = GraphSnapshot.from_neo4j(driver)
+        finally:
+            driver.close()
+    else:
+        snapshot = GraphSnapshot.from_dataset(iter_valid(iter_records(args.data_file)))
+
+    snapshot.save(args.output)
+    print(f"Saved graph snapshot: {len(snapshot)} nodes, {snapshot.edge_count} relationships -> {args.output}.npz/.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,27 @@
 # hybrid_chat.py
+import time
+_IMPORT_START = time.perf_counter()  # cold-import cost is tracked in runtime.stats()
+
 import json
 import asyncio
-import time
-import hashlib
 from typing import List, Dict, Optional
-from functools import lru_cache
-from openai import OpenAI
-from pinecone import Pinecone, ServerlessSpec
-from neo4j import GraphDatabase
+import numpy as np
 import config
+from vector_store import PineconeBackend, LocalVectorIndex
+from graph_snapshot import RELATIONSHIP_WEIGHTS, load_snapshot, summary_facts
+from embedding_cache import EmbeddingCache
+from answer_cache import SemanticAnswerCache, replay_stream
+from embed_batcher import EmbeddingBatcher
+from pipeline import StageGraph
+from telemetry import Telemetry, JsonLogSink, start_metrics_server
+from fusion import RankedList, fuse, top_k as select_top_k
+from intent import IntentMatcher
+from lexical_index import load_lexical_index
+from prompt_packer import PromptPacker, TokenCounter
+from resilience import CircuitBreaker, CircuitOpenError, Deadline, ResiliencePolicy, RetryBudget, current_deadline
+from runtime import Runtime
+from streaming import TokenStream
+from decompose import dedupe_facts, dedupe_matches, plan_subqueries
 
 # -----------------------------
 # Config
@@ -18,103 +31,260 @@ CHAT_MODEL = "gpt-4o-mini"
 TOP_K = 5
 
 INDEX_NAME = config.PINECONE_INDEX_NAME
+VECTOR_BACKEND = getattr(config, "VECTOR_BACKEND", "pinecone")  # "pinecone" or "local"
+LOCAL_INDEX_PATH = getattr(config, "LOCAL_INDEX_PATH", "vector_index")
+GRAPH_SNAPSHOT_PATH = getattr(config, "GRAPH_SNAPSHOT_PATH", "graph_snapshot")
+EMBED_CACHE_PATH = getattr(config, "EMBED_CACHE_PATH", "embedding_cache.sqlite")
+EMBED_CACHE_MAX_BYTES = getattr(config, "EMBED_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+EMBED_CACHE_TTL = getattr(config, "EMBED_CACHE_TTL", 7 * 24 * 3600)
+EMBED_CACHE_QUANTIZE = getattr(config, "EMBED_CACHE_QUANTIZE", False)     # int8 cache entries (~4x more per byte)
+EMBED_DIMENSIONS = getattr(config, "EMBED_DIMENSIONS", None)              # shortened embeddings (e.g. 512); must match the index
+VECTOR_SEARCH_DIM = getattr(config, "VECTOR_SEARCH_DIM", None)            # local index: first pass on this many leading dims...
+VECTOR_QUANTIZATION = getattr(config, "VECTOR_QUANTIZATION", None)        # ...and/or int8 ("int8"), then exact rescore
+VECTOR_RESCORE_FACTOR = getattr(config, "VECTOR_RESCORE_FACTOR", 8)       # candidates rescored at full precision per top_k
+DATA_FILE = "vietnam_travel_dataset.json"
+ANSWER_CACHE_ENABLED = getattr(config, "ANSWER_CACHE_ENABLED", True)
+ANSWER_CACHE_THRESHOLD = getattr(config, "ANSWER_CACHE_THRESHOLD", 0.95)
+ANSWER_CACHE_MAX_ENTRIES = getattr(config, "ANSWER_CACHE_MAX_ENTRIES", 1000)
+ANSWER_CACHE_TTL = getattr(config, "ANSWER_CACHE_TTL", 3600)
+EMBED_BATCH_WINDOW_MS = getattr(config, "EMBED_BATCH_WINDOW_MS", 5)
+EMBED_BATCH_MAX = getattr(config, "EMBED_BATCH_MAX", 64)
+INTENT_PREFETCH_SEEDS = getattr(config, "INTENT_PREFETCH_SEEDS", 3)
+VECTOR_FILTER_ENABLED = getattr(config, "VECTOR_FILTER_ENABLED", True)        # push intent type/city filters into vector search
+VECTOR_FILTER_MIN_RESULTS = getattr(config, "VECTOR_FILTER_MIN_RESULTS", 3)   # fewer filtered hits -> unfiltered query
+ADAPTIVE_TOP_K = getattr(config, "ADAPTIVE_TOP_K", True)
+TOP_K_MIN = getattr(config, "TOP_K_MIN", 3)        # point lookups ("hotels in Hoi An")
+TOP_K_MAX = getattr(config, "TOP_K_MAX", 12)       # long itineraries
+TOP_K_PER_DAY = getattr(config, "TOP_K_PER_DAY", 2)  # extra candidates per itinerary day beyond the first
+GRAPH_PRECOMPUTED_NEIGHBORHOODS = getattr(config, "GRAPH_PRECOMPUTED_NEIGHBORHOODS", True)  # Neo4j path: read n.neighborhood
+INTENT_TAXONOMY_FILE = getattr(config, "INTENT_TAXONOMY_FILE", None)  # JSON override of intent.DEFAULT_TAXONOMY
+FUSION_METHOD = getattr(config, "FUSION_METHOD", "rrf")  # "rrf" or "score" (min-max normalized)
+RRF_K = getattr(config, "RRF_K", 60)
+FUSION_WEIGHTS = getattr(config, "FUSION_WEIGHTS", {"vector": 1.0, "lexical": 1.0, "graph": 1.0, "subquery": 1.0})
+LEXICAL_INDEX_PATH = getattr(config, "LEXICAL_INDEX_PATH", "lexical_index")
+LEXICAL_TOP_K = getattr(config, "LEXICAL_TOP_K", TOP_K)
+LEXICAL_SKIP_EMBEDDING = getattr(config, "LEXICAL_SKIP_EMBEDDING", False)  # no embeddings call when BM25 is confident
+LEXICAL_MIN_SCORE = getattr(config, "LEXICAL_MIN_SCORE", 10.0)           # lowest top BM25 score counted as confident
+LEXICAL_MIN_MARGIN = getattr(config, "LEXICAL_MIN_MARGIN", 0.15)         # top hit's relative lead over the runner-up
+LEXICAL_MIN_TERMS = getattr(config, "LEXICAL_MIN_TERMS", 2)              # distinctive (rare) query terms required
+PROMPT_TOKEN_BUDGET = getattr(config, "PROMPT_TOKEN_BUDGET", 2000)         # input tokens per chat call (system + context + query)
+PROMPT_DESCRIPTION_TOKENS = getattr(config, "PROMPT_DESCRIPTION_TOKENS", 60)
+QUERY_DEADLINE_S = getattr(config, "QUERY_DEADLINE_S", 20.0)               # whole-query budget (retrieval + generation)
+STAGE_SHARES = getattr(config, "STAGE_SHARES", {"vector": 0.25, "graph": 0.25, "chat": 0.75})  # max fraction per operation
+VECTOR_TIMEOUT_S = getattr(config, "VECTOR_TIMEOUT_S", 3.0)                # per attempt
+GRAPH_TIMEOUT_S = getattr(config, "GRAPH_TIMEOUT_S", 3.0)
+CHAT_TIMEOUT_S = getattr(config, "CHAT_TIMEOUT_S", 15.0)                   # until the response (or first stream chunk) arrives
+HEDGE_ENABLED = getattr(config, "HEDGE_ENABLED", True)                     # duplicate slow vector/graph calls after their p95
+HEDGE_QUANTILE = getattr(config, "HEDGE_QUANTILE", 0.95)
+RETRY_BUDGET_RATIO = getattr(config, "RETRY_BUDGET_RATIO", 0.2)            # retries allowed per request, per dependency
+BREAKER_FAILURES = getattr(config, "BREAKER_FAILURES", 5)                  # consecutive failures that open a circuit
+BREAKER_RESET_S = getattr(config, "BREAKER_RESET_S", 10.0)                 # open circuit fails fast this long, then probes
+DEGRADED_ANSWER_THRESHOLD = getattr(config, "DEGRADED_ANSWER_THRESHOLD", 0.85)  # looser answer-cache match when chat is down
+GENERATION_DEADLINE_S = getattr(config, "GENERATION_DEADLINE_S", 60.0)    # streamed answer cut off (upstream closed) after this
+STREAM_MIN_CHUNK_CHARS = getattr(config, "STREAM_MIN_CHUNK_CHARS", 24)     # token deltas coalesced into chunks of this size...
+STREAM_MAX_DELAY_MS = getattr(config, "STREAM_MAX_DELAY_MS", 50)           # ...or flushed once the oldest waited this long
+MULTI_AGENT_ENABLED = getattr(config, "MULTI_AGENT_ENABLED", True)        # default for use_multi_agent=None
+MULTI_AGENT_MAX_SUBQUERIES = getattr(config, "MULTI_AGENT_MAX_SUBQUERIES", 6)
+MULTI_AGENT_SUBQUERY_K = getattr(config, "MULTI_AGENT_SUBQUERY_K", 5)     # vector results per sub-query
+MULTI_AGENT_CONCURRENCY = getattr(config, "MULTI_AGENT_CONCURRENCY", 8)   # sub-queries in flight, shared by all queries
+MULTI_AGENT_MAX_MATCHES = getattr(config, "MULTI_AGENT_MAX_MATCHES", 20)  # fused matches kept for a decomposed query
+RUNTIME_WARM_UP = getattr(config, "RUNTIME_WARM_UP", True)  # startup(): pre-open OpenAI / Pinecone / Neo4j connections
+TELEMETRY_ENABLED = getattr(config, "TELEMETRY_ENABLED", False)
+TELEMETRY_JSON_LOG = getattr(config, "TELEMETRY_JSON_LOG", None)          # JSON-lines span log path
+TELEMETRY_METRICS_PORT = getattr(config, "TELEMETRY_METRICS_PORT", None)  # /metrics for the interactive chat
 
 # -----------------------------
-# Initialize clients
+# Clients and indexes (created on first use; see runtime.py)
 # -----------------------------
-client = OpenAI(api_key=config.OPENAI_API_KEY)
-pc = Pinecone(api_key=config.PINECONE_API_KEY)
-
-# Connect to Pinecone index
-if INDEX_NAME not in pc.list_indexes().names():
-    print(f"Creating managed index: {INDEX_NAME}")
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=config.PINECONE_VECTOR_DIM,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
+# Importing this module does no network I/O. Clients are created on first access
+# (`runtime.aclient`, ...) or up front by `await runtime.startup(warm=...)`.
+# The Pinecone index itself is provisioned by pinecone_upload.py, not here.
+runtime = Runtime()
+
+def _openai_client():
+    from openai import AsyncOpenAI  # ~1s import, paid on first use instead of at import
+    # Native async client: every query stage runs on one event loop, no worker threads
+    return AsyncOpenAI(api_key=config.OPENAI_API_KEY)
+
+def _vector_backend():
+    if VECTOR_BACKEND == "local":
+        # In-process index built by `pinecone_upload.py --target local`
+        backend = LocalVectorIndex.load(LOCAL_INDEX_PATH, search_dim=VECTOR_SEARCH_DIM,
+                                        quantize=VECTOR_QUANTIZATION, rescore=VECTOR_RESCORE_FACTOR)
+        print(f"Loaded local vector index: {len(backend)} vectors from {LOCAL_INDEX_PATH}")
+        if backend.compact is not None:
+            memory = backend.memory_bytes()
+            print(f"  searching the {backend.compact.tag} copy ({memory['search'] / 2**20:.1f} MiB, "
+                  f"{memory['ratio']}x smaller), rescoring {VECTOR_RESCORE_FACTOR}x top_k at full precision")
+        return backend
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=config.PINECONE_API_KEY)
+    try:
+        host = pc.describe_index(INDEX_NAME).host
+    except Exception as e:
+        raise RuntimeError(f"Pinecone index {INDEX_NAME!r} is not available ({e}); "
+                           f"create and fill it with `python pinecone_upload.py`") from e
+    return PineconeBackend(pc.Index(INDEX_NAME), host=host, api_key=config.PINECONE_API_KEY)
+
+def _neo4j_driver():
+    from neo4j import AsyncGraphDatabase
+    # Optimized connection pooling settings; no connection is opened until the first session (or warm-up)
+    return AsyncGraphDatabase.driver(
+        config.NEO4J_URI, 
+        auth=(config.NEO4J_USER, config.NEO4J_PASSWORD),
+        max_connection_lifetime=600,
+        max_connection_pool_size=50,
+        connection_acquisition_timeout=60,
+        keep_alive=True
     )
 
-index = pc.Index(INDEX_NAME)
+def _graph_snapshot():
+    # In-memory CSR snapshot of the graph (built by load_to_neo4j.py / graph_snapshot.py).
+    # When present, graph context is served from memory and Neo4j is only the fallback.
+    snapshot = load_snapshot(GRAPH_SNAPSHOT_PATH)
+    if snapshot is not None:
+        print(f"Loaded graph snapshot: {len(snapshot)} nodes, {snapshot.edge_count} relationships")
+    return snapshot
+
+def _lexical_index():
+    # In-process BM25 index over names, tags and descriptions (built by pinecone_upload.py / lexical_index.py).
+    # Adds a lexical list to fusion; confident lexical hits stand in for vector search.
+    index = load_lexical_index(LEXICAL_INDEX_PATH)
+    if index is not None:
+        print(f"Loaded lexical index: {len(index)} documents, {len(index.terms)} terms")
+    return index
 
-# Connect to Neo4j with optimized connection pooling settings
-driver = GraphDatabase.driver(
-    config.NEO4J_URI, 
-    auth=(config.NEO4J_USER, config.NEO4J_PASSWORD),
-    max_connection_lifetime=600,
-    max_connection_pool_size=50,
-    connection_acquisition_timeout=60,
-    keep_alive=True
+async def _warm_neo4j(driver):
+    await driver.verify_connectivity()  # opens (and returns to the pool) one connection
+
+runtime.register("aclient", _openai_client, close=lambda c: c.close(), warm=lambda c: c.models.list())
+runtime.register("vector_backend", _vector_backend, close=lambda b: b.aclose(), warm=lambda b: b.warm())
+runtime.register("driver", _neo4j_driver, close=lambda d: d.close(), warm=_warm_neo4j)
+runtime.register("graph_snapshot", _graph_snapshot)
+runtime.register("lexical_index", _lexical_index)
+
+# -----------------------------
+# Cache System (LRU memory tier + SQLite file shared across processes)
+# -----------------------------
+embedding_cache = EmbeddingCache(
+    path=EMBED_CACHE_PATH,
+    max_bytes=EMBED_CACHE_MAX_BYTES,
+    ttl_seconds=EMBED_CACHE_TTL,
+    namespace=f"{EMBED_MODEL}:{EMBED_DIMENSIONS}" if EMBED_DIMENSIONS else EMBED_MODEL,
+    quantize=EMBED_CACHE_QUANTIZE
+)
+
+# Semantic answer cache: near-duplicate queries with the same intent reuse the answer.
+# Cleared automatically when the dataset, vector index or graph snapshot is rebuilt.
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL,
+    watch_files=[DATA_FILE, f"{LOCAL_INDEX_PATH}.npy", f"{GRAPH_SNAPSHOT_PATH}.npz", f"{LEXICAL_INDEX_PATH}.npz"]
 )
 
 # -----------------------------
-# Cache System (In-Memory)
+# Telemetry (spans per stage / retry attempt, metrics; no-op unless enabled)
+# -----------------------------
+telemetry = Telemetry(
+    enabled=TELEMETRY_ENABLED,
+    sink=JsonLogSink(TELEMETRY_JSON_LOG) if TELEMETRY_ENABLED and TELEMETRY_JSON_LOG else None
+)
+telemetry.describe("span_duration_seconds", "Duration of each traced stage / attempt")
+telemetry.describe("retries_total", "Attempts retried after a failure, by operation")
+telemetry.describe("fallbacks_total", "Degraded results served instead of failing, by operation")
+telemetry.describe("stream_aborts_total", "Streamed answers stopped early (client gone, deadline, upstream error)")
+telemetry.gauge("embedding_cache_hit_ratio", lambda: embedding_cache.stats()["hit_ratio"],
+                "Embedding cache hits / lookups")
+telemetry.gauge("answer_cache_hit_ratio", lambda: answer_cache.stats()["hit_ratio"],
+                "Semantic answer cache hits / lookups")
+telemetry.gauge("import_seconds", lambda: runtime.import_seconds or 0.0,
+                "Time to import hybrid_chat (no client is created at import)")
+telemetry.gauge("startup_seconds", lambda: runtime.startup_seconds or 0.0,
+                "Time runtime.startup() took to create clients, load indexes and warm up")
+telemetry.gauge("embedding_batch_avg_size", lambda: embed_batcher.stats()["avg_batch_size"],
+                "Texts per embeddings API call")
+
 # -----------------------------
-embedding_cache = {}
+# Resilience (per-query deadline, retry budgets, hedging, circuit breakers)
+# -----------------------------
+telemetry.describe("hedges_total", "Duplicate requests sent after the p95 latency, by operation")
+telemetry.describe("timeouts_total", "Attempts cut off by their timeout, by operation")
+telemetry.describe("short_circuits_total", "Calls failed fast by an open circuit breaker, by operation")
+telemetry.describe("deadline_exceeded_total", "Calls abandoned because the query deadline ran out, by operation")
+
+def resilience_policy(name: str, timeout: float, hedge: bool) -> ResiliencePolicy:
+    return ResiliencePolicy(
+        name,
+        timeout=timeout,
+        hedge=hedge and HEDGE_ENABLED,
+        hedge_quantile=HEDGE_QUANTILE,
+        breaker=CircuitBreaker(name, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_S),
+        retry_budget=RetryBudget(ratio=RETRY_BUDGET_RATIO),
+        on_event=lambda event, operation: telemetry.inc(f"{event}_total", operation=operation)
+    )
+
+vector_policy = resilience_policy("vector", VECTOR_TIMEOUT_S, hedge=True)
+graph_policy = resilience_policy("graph", GRAPH_TIMEOUT_S, hedge=True)
+chat_policy = resilience_policy("chat", CHAT_TIMEOUT_S, hedge=False)  # generation is too costly to duplicate
+policies = {p.name: p for p in (vector_policy, graph_policy, chat_policy)}
+
+for _policy in policies.values():
+    telemetry.gauge(f"{_policy.name}_circuit_open", lambda p=_policy: float(p.breaker.state != p.breaker.CLOSED),
+                    f"1 while the {_policy.name} circuit breaker is open or half-open")
 
-def get_cache_key(text: str) -> str:
-    """Generate cache key from text."""
-    return hashlib.md5(text.encode('utf-8')).hexdigest()
+def mark_failed(operation: str):
+    """Record on the current query's deadline that `operation` gave up (drives the degraded mode in timing)."""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.failed.add(operation)
+
+def breaker_states() -> Dict[str, str]:
+    return {name: p.breaker.state for name, p in policies.items()}
 
 # -----------------------------
-# Relationship Weighting & Query Analysis
+# Query Analysis (relationship weights: graph_snapshot.RELATIONSHIP_WEIGHTS)
 # -----------------------------
-RELATIONSHIP_WEIGHTS = {
-    'Located_In': 1.0,
-    'Connected_To': 0.9,
-    'Near': 0.8,
-    'Has_Activity': 0.7,
-    'Has_Restaurant': 0.7,
-    'Has_Hotel': 0.7,
-    'Related_To': 0.5,
-    'RELATED_TO': 0.5
-}
+# Built once, on first use: taxonomy triggers/keywords plus the dataset's tag vocabulary in one compiled pattern
+runtime.register("intent_matcher", lambda: IntentMatcher.from_dataset(DATA_FILE, INTENT_TAXONOMY_FILE))
 
 def extract_query_intent(query: str) -> Dict:
-    """Extract intent keywords from query for better filtering."""
-    query_lower = query.lower()
-    
-    intent = {
-        'keywords': [],
-        'style': None,
-        'duration': None,
-        'entity_types': ['City', 'Attraction', 'Activity']
-    }
-    
-    # Style detection
-    if any(word in query_lower for word in ['romantic', 'romance', 'couple', 'honeymoon']):
-        intent['style'] = 'romantic'
-        intent['keywords'].extend(['romantic', 'lanterns', 'heritage', 'scenic'])
-        intent['entity_types'].extend(['Restaurant', 'Hotel'])
-    
-    if any(word in query_lower for word in ['adventure', 'trek', 'hiking', 'climb']):
-        intent['style'] = 'adventure'
-        intent['keywords'].extend(['mountain', 'trekking', 'adventure', 'nature'])
-        intent['entity_types'].extend(['Activity', 'Tour'])
-    
-    if any(word in query_lower for word in ['food', 'cuisine', 'restaurant', 'eat']):
-        intent['style'] = 'food'
-        intent['keywords'].extend(['food', 'cuisine', 'restaurant', 'market'])
-        intent['entity_types'].extend(['Restaurant', 'Market'])
-    
-    if any(word in query_lower for word in ['beach', 'coast', 'sea', 'ocean']):
-        intent['style'] = 'beach'
-        intent['keywords'].extend(['beach', 'coast', 'cruise', 'island'])
-    
-    if any(word in query_lower for word in ['culture', 'history', 'heritage', 'temple']):
-        intent['style'] = 'culture'
-        intent['keywords'].extend(['culture', 'heritage', 'history', 'temple', 'museum'])
-    
-    # Duration detection
-    import re
-    duration_match = re.search(r'(\d+)\s*(day|week)', query_lower)
-    if duration_match:
-        days = int(duration_match.group(1))
-        if duration_match.group(2) == 'week':
-            days *= 7
-        intent['duration'] = days
-    
-    return intent
+    """Extract intent keywords from query for better filtering (one pass of the compiled matcher)."""
+    return runtime.intent_matcher.intent(query)
+
+def intent_filter(intent: Dict) -> Optional[Dict]:
+    """
+    Vector metadata filter (Pinecone syntax) from the detected intent:
+    - type: entity types asked for by name, else the intent's entity types;
+      omitted when that would allow every type in the dataset
+    - city: cities named in the query (regions expand to their cities); City
+      nodes carry their region in `city`, so their `name` is matched too
+    """
+    if not VECTOR_FILTER_ENABLED:
+        return None
+    clauses = []
+    known = runtime.intent_matcher.entity_types
+    types = intent.get('requested_types') or [t for t in intent.get('entity_types', []) if t in known]
+    types = sorted(set(types))
+    if types and known and len(types) < len(known):
+        clauses.append({"type": {"$in": types}})
+    cities = intent.get('cities')
+    if cities:
+        clauses.append({"$or": [{"city": {"$in": cities}}, {"name": {"$in": cities}}]})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def adaptive_top_k(intent: Dict, top_k: int = TOP_K) -> int:
+    """More vector candidates for multi-day itineraries, fewer for point lookups (a type in a named place)."""
+    if not ADAPTIVE_TOP_K:
+        return top_k
+    duration = intent.get('duration') or 0
+    if duration > 1:
+        return max(top_k, min(TOP_K_MAX, top_k + TOP_K_PER_DAY * (duration - 1)))
+    if intent.get('requested_types') and intent.get('cities') and not intent.get('style'):
+        return min(top_k, TOP_K_MIN)
+    return top_k
 
 def rank_graph_facts(facts: List[Dict], query_keywords: List[str]) -> List[Dict]:
     """
@@ -124,30 +294,41 @@ def rank_graph_facts(facts: List[Dict], query_keywords: List[str]) -> List[Dict]
     if not facts:
         return facts
     
-    scored_facts = []
+    # Relationship importance
+    scores = [RELATIONSHIP_WEIGHTS.get(fact.get('rel', 'Related_To'), 0.5) for fact in facts]
     
-    for fact in facts:
-        score = 0.0
-        
-        # Relationship importance
-        rel_type = fact.get('rel', 'Related_To')
-        score += RELATIONSHIP_WEIGHTS.get(rel_type, 0.5)
-        
-        # Keyword matching in description
-        desc = fact.get('target_desc', '').lower()
-        name = fact.get('target_name', '').lower()
-        
-        for keyword in query_keywords:
-            if keyword.lower() in desc:
-                score += 0.3
-            if keyword.lower() in name:
-                score += 0.2
-        
-        scored_facts.append((score, fact))
+    # Keyword matching in description / name: one (memoized) matcher pass per text
+    keywords = frozenset(keyword.lower() for keyword in query_keywords)
+    if keywords:
+        count = runtime.intent_matcher.count
+        scores = [
+            score + 0.3 * count(fact.get('target_desc', ''), keywords) + 0.2 * count(fact.get('target_name', ''), keywords)
+            for score, fact in zip(scores, facts)
+        ]
     
-    # Sort by score descending and return top facts
-    scored_facts.sort(key=lambda x: x[0], reverse=True)
-    return [fact for score, fact in scored_facts[:20]]
+    # Top 20 by score (partial selection, ties keep input order)
+    return [facts[i] for i in select_top_k(np.asarray(scores), 20).tolist()]
+
+def vector_ranking(matches: List[Dict], weight: float = 1.0, name: str = "vector") -> RankedList:
+    """Vector (or lexical) matches, already best first, as a fusion input list."""
+    return RankedList(name, [m['id'] for m in matches if m.get('id')],
+                      [m.get('score') or 0.0 for m in matches if m.get('id')], weight=weight)
+
+def graph_ranking(graph_facts: List[Dict], weight: float = 1.0) -> RankedList:
+    """
+    Graph facts as a fusion input list: every target and source node once (first
+    occurrence wins), ordered by relationship weight. Sources count as 0.5.
+    """
+    ids, scores = [], []
+    for fact in graph_facts:
+        target_id, source_id = fact.get('target_id'), fact.get('source')
+        if target_id:
+            ids.append(target_id)
+            scores.append(RELATIONSHIP_WEIGHTS.get(fact.get('rel', ''), 0.5))
+        if source_id:
+            ids.append(source_id)
+            scores.append(0.5)
+    return RankedList("graph", ids, scores, weight=weight, sort=True)
 
 def reciprocal_rank_fusion(pinecone_results: List[Dict], graph_facts: List[Dict], k=60) -> List[tuple]:
     """
@@ -155,6 +336,7 @@ def reciprocal_rank_fusion(pinecone_results: List[Dict], graph_facts: List[Dict]
     
     RRF Formula: score = 1/(k + rank)
     Combines rankings from both sources to produce unified ranking.
+    Two-list shorthand for fusion.fuse(), which takes any number of weighted lists.
     
     Research: Cormack et al., 2009 - "RRF outperforms individual ranking methods"
     
@@ -166,99 +348,117 @@ def reciprocal_rank_fusion(pinecone_results: List[Dict], graph_facts: List[Dict]
     Returns:
         List of (node_id, fused_score) tuples, ranked by fused score
     """
-    scores = {}
-    
-    # Score Pinecone results by rank (higher rank = more relevant)
-    for rank, result in enumerate(pinecone_results, start=1):
-        node_id = result.get('id')
-        if node_id:
-            rrf_score = 1.0 / (k + rank)
-            scores[node_id] = scores.get(node_id, 0) + rrf_score
-    
-    # Score Neo4j facts by extracting unique target nodes and ranking them
-    # Group facts by target_id to get unique nodes
-    unique_targets = {}
-    for fact in graph_facts:
-        target_id = fact.get('target_id')
-        source_id = fact.get('source')
-        
-        # Track both targets and sources (bidirectional relationships)
-        if target_id and target_id not in unique_targets:
-            unique_targets[target_id] = fact
-        if source_id and source_id not in unique_targets:
-            unique_targets[source_id] = {'target_id': source_id, 'target_name': fact.get('source')}
-    
-    # Rank unique targets by their relationship importance
-    target_scores = []
-    for target_id, fact in unique_targets.items():
-        rel_weight = RELATIONSHIP_WEIGHTS.get(fact.get('rel', ''), 0.5)
-        target_scores.append((rel_weight, target_id, fact))
-    
-    target_scores.sort(key=lambda x: x[0], reverse=True)
-    
-    # Apply RRF scoring to Neo4j results
-    for rank, (rel_weight, target_id, fact) in enumerate(target_scores, start=1):
-        rrf_score = 1.0 / (k + rank)
-        scores[target_id] = scores.get(target_id, 0) + rrf_score
-    
-    # Sort by fused score (descending)
-    ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-    
-    print(f"DEBUG: RRF fusion - Combined {len(pinecone_results)} vector + {len(unique_targets)} graph nodes into {len(ranked)} fused results")
-    
-    return ranked
+    fused = fuse([vector_ranking(pinecone_results), graph_ranking(graph_facts)], method="rrf", k=k)
+    telemetry.annotate(fusion_lists=fused.contributions, fusion_candidates=len(fused))
+    return fused.items()
 
 # -----------------------------
 # Helper functions
 # -----------------------------
-def embed_text(text: str) -> List[float]:
-    """Get embedding for a text string with caching."""
-    cache_key = get_cache_key(text)
-    
-    if cache_key in embedding_cache:
-        return embedding_cache[cache_key]
-    
-    resp = client.embeddings.create(model=EMBED_MODEL, input=[text])
-    embedding = resp.data[0].embedding
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """One embeddings API call for a batch of texts (order preserved)."""
+    with telemetry.span("openai.embeddings", batch_size=len(texts)):
+        resp = await runtime.aclient.embeddings.create(
+            model=EMBED_MODEL, input=texts, **({"dimensions": EMBED_DIMENSIONS} if EMBED_DIMENSIONS else {})
+        )
+    return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+# Concurrent queries share batched embeddings calls
+embed_batcher = EmbeddingBatcher(embed_texts, window_ms=EMBED_BATCH_WINDOW_MS, max_batch=EMBED_BATCH_MAX)
+
+async def embed_text(text: str):
+    """Cached embedding (float32 array); misses are coalesced with other in-flight queries into one API call."""
+    cached = await embedding_cache.aget(text)
+    if cached is not None:
+        return cached
+    return await embedding_cache.aput(text, await embed_batcher.embed(text))
+
+async def pinecone_query(query_text: str, top_k=TOP_K, max_retries=3, metadata_filter=None):
+    """Query the configured vector backend (Pinecone or local index) under the vector resilience policy."""
+    async def attempt(n):
+        with telemetry.span("vector.attempt", attempt=n + 1, top_k=top_k, backend=VECTOR_BACKEND,
+                            filtered=metadata_filter is not None) as span:
+            vec = await embed_text(query_text)
+            matches = await runtime.vector_backend.aquery(vec, top_k=top_k, filter=metadata_filter)
+            span.set(results=len(matches))
+        return matches
     
-    embedding_cache[cache_key] = embedding
-    return embedding
+    try:
+        return await vector_policy.call(attempt, max_attempts=max_retries)
+    except Exception as e:
+        print(f"Vector query failed ({type(e).__name__}: {e}). Returning empty results.")
+        mark_failed("vector")
+        telemetry.inc("fallbacks_total", operation="vector", to="empty")
+        return []
 
-def pinecone_query(query_text: str, top_k=TOP_K, max_retries=3):
-    """Query Pinecone index using embedding with retry logic."""
-    for attempt in range(max_retries):
-        try:
-            vec = embed_text(query_text)
-            res = index.query(
-                vector=vec,
-                top_k=top_k,
-                include_metadata=True,
-                include_values=False
-            )
-            print(f"DEBUG: Pinecone results: {len(res['matches'])}")
-            return res["matches"]
-        except Exception as e:
-            print(f"Pinecone query attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-            else:
-                print("Max retries reached. Returning empty results.")
-                return []
-    return []
+async def vector_search(query_text: str, top_k=TOP_K, metadata_filter=None):
+    """
+    Vector query with the intent filter pushed down. If the filter leaves fewer
+    than VECTOR_FILTER_MIN_RESULTS hits, an unfiltered query fills up the list
+    (filtered hits first).
+    """
+    if metadata_filter is None:
+        return await pinecone_query(query_text, top_k)
+    matches = await pinecone_query(query_text, top_k, metadata_filter=metadata_filter)
+    if len(matches) >= min(VECTOR_FILTER_MIN_RESULTS, top_k) or not vector_policy.breaker.allow():
+        return matches
+    telemetry.inc("fallbacks_total", operation="vector_filter", to="unfiltered")
+    seen = {m["id"] for m in matches}
+    unfiltered = await pinecone_query(query_text, top_k)
+    return (matches + [m for m in unfiltered if m["id"] not in seen])[:top_k]
 
-def fetch_graph_context(node_ids: List[str], neighborhood_depth=1, max_retries=3):
+async def fetch_graph_context(node_ids: List[str], neighborhood_depth=1, max_retries=3):
     """
-    Fetch neighboring nodes from Neo4j with retry logic and connection handling.
-    Uses batched query for better performance.
+    Fetch neighboring nodes up to `neighborhood_depth` hops away.
+    Served from the in-memory graph snapshot when loaded, otherwise from Neo4j
+    with retry logic and connection handling (batched query for better performance).
     """
     facts = []
     
     if not node_ids:
         return facts
     
-    for attempt in range(max_retries):
+    if runtime.graph_snapshot is not None:
         try:
-            with driver.session() as session:
+            with telemetry.span("graph.snapshot", seeds=len(node_ids), depth=neighborhood_depth) as span:
+                facts = runtime.graph_snapshot.neighborhood(node_ids, depth=neighborhood_depth, limit=100)
+                span.set(facts=len(facts))
+            return facts
+        except Exception as e:
+            print(f"Graph snapshot lookup failed, falling back to Neo4j: {e}")
+            telemetry.inc("fallbacks_total", operation="graph", to="neo4j")
+            facts = []
+    
+    depth = max(int(neighborhood_depth), 1)
+    
+    async def attempt(n):
+        facts = []  # per attempt: a failed or hedged attempt never leaks partial rows
+        async with telemetry.span("graph.neo4j.attempt", attempt=n + 1, seeds=len(node_ids), depth=depth) as span, \
+                runtime.driver.session() as session:
+            pending = node_ids
+            if depth == 1 and GRAPH_PRECOMPUTED_NEIGHBORHOODS:
+                # One precomputed row per id (written by load_to_neo4j.py); nodes without one use the live match
+                result = await session.run(
+                    """
+                    UNWIND $node_ids AS nid
+                    MATCH (n:Entity {id:nid})
+                    RETURN nid AS source, n.neighborhood AS neighborhood
+                    """,
+                    node_ids=node_ids
+                )
+                summarized = set()
+                async for record in result:
+                    if record["neighborhood"] is not None:
+                        facts.extend(summary_facts(record["source"], record["neighborhood"]))
+                        summarized.add(record["source"])
+                pending = [nid for nid in node_ids if nid not in summarized]
+                span.set(precomputed=len(summarized))
+                if not pending:
+                    facts = facts[:100]
+                    span.set(facts=len(facts))
+                    return facts
+            
+            if depth == 1:
                 batch_query = """
                 UNWIND $node_ids AS nid
                 MATCH (n:Entity {id:nid})-[r]-(m:Entity)
@@ -267,39 +467,116 @@ def fetch_graph_context(node_ids: List[str], neighborhood_depth=1, max_retries=3
                        m.description AS description
                 LIMIT 100
                 """
-                
-                result = session.run(batch_query, node_ids=node_ids)
-                
-                for record in result:
-                    facts.append({
-                        "source": record["source"],
-                        "rel": record["rel"],
-                        "target_id": record["id"],
-                        "target_name": record["name"],
-                        "target_desc": (record["description"] or "")[:400],
-                        "labels": record["labels"]
-                    })
-                
-                print(f"DEBUG: Graph facts: {len(facts)}")
-                return facts
-                
-        except Exception as e:
-            print(f"Neo4j query attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                print(f"Retrying in {2 ** attempt} seconds...")
-                time.sleep(2 ** attempt)
             else:
-                print("Max retries reached. Returning empty graph context.")
-                return []
+                # k-hop: report the last relationship on the path and the node it came from
+                batch_query = f"""
+                UNWIND $node_ids AS nid
+                MATCH p = (n:Entity {{id:nid}})-[*1..{depth}]-(m:Entity)
+                WHERE m.id <> nid
+                WITH m, last(relationships(p)) AS r, nodes(p)[-2] AS prev
+                RETURN DISTINCT prev.id AS source, type(r) AS rel, labels(m) AS labels,
+                       m.id AS id, m.name AS name, m.type AS type,
+                       m.description AS description
+                LIMIT 100
+                """
+            
+            result = await session.run(batch_query, node_ids=pending)
+            
+            async for record in result:
+                facts.append({
+                    "source": record["source"],
+                    "rel": record["rel"],
+                    "target_id": record["id"],
+                    "target_name": record["name"],
+                    "target_desc": (record["description"] or "")[:400],
+                    "labels": record["labels"]
+                })
+            
+            facts = facts[:100]
+            span.set(facts=len(facts))
+            return facts
     
-    return facts
+    try:
+        return await graph_policy.call(attempt, max_attempts=max_retries)
+    except Exception as e:
+        print(f"Neo4j query failed ({type(e).__name__}: {e}). Returning empty graph context.")
+        mark_failed("graph")
+        telemetry.inc("fallbacks_total", operation="graph", to="empty")
+        return []
 
-def build_prompt(user_query, pinecone_matches, graph_facts, intent=None):
+async def fetch_intent_context(intent: Dict, max_seeds=INTENT_PREFETCH_SEEDS, limit=30):
     """
-    Build a chat prompt combining vector DB matches and graph facts with enhanced reasoning.
-    Uses intent analysis for better targeting.
+    Intent-driven graph prefetch: find entities of the detected types whose text
+    mentions the intent keywords, and return their 1-hop facts. Needs no
+    embedding, so it can run while vector search is still in flight.
     """
-    system = """You are an expert Vietnam travel consultant with deep knowledge of local culture, destinations, and travel logistics.
+    keywords = intent.get('keywords', [])
+    if not keywords:
+        return []
+    types = list(dict.fromkeys(intent.get('entity_types', [])))
+    
+    try:
+        if runtime.graph_snapshot is not None:
+            seeds = runtime.graph_snapshot.find_nodes(types, keywords, limit=max_seeds)
+            return runtime.graph_snapshot.neighborhood(seeds, depth=1, limit=limit)
+        if not graph_policy.breaker.allow():
+            return []
+        
+        async with runtime.driver.session() as session:
+            result = await session.run(
+                """
+                MATCH (m:Entity) WHERE m.type IN $types
+                WITH m, size([k IN $keywords WHERE toLower(m.name + ' ' + coalesce(m.description, '')) CONTAINS k]) AS hits
+                WHERE hits > 0
+                RETURN m.id AS id ORDER BY hits DESC LIMIT $limit
+                """,
+                types=types, keywords=[k.lower() for k in keywords], limit=max_seeds
+            )
+            seeds = [record["id"] async for record in result]
+        return (await fetch_graph_context(seeds))[:limit]
+    except Exception as e:
+        print(f"Intent graph prefetch failed: {e}")
+        telemetry.inc("fallbacks_total", operation="graph_prefetch", to="empty")
+        return []
+
+# -----------------------------
+# Multi-agent decomposition (per-city / per-style sub-queries)
+# -----------------------------
+# One pool of slots for every query in the process, so a burst of multi-city questions cannot
+# multiply the load on the vector and graph backends
+runtime.register("subquery_slots", lambda: asyncio.Semaphore(MULTI_AGENT_CONCURRENCY))
+
+async def run_subquery(subquery: Dict, top_k: int = MULTI_AGENT_SUBQUERY_K) -> Dict:
+    """Vector search for one sub-query (its own text and narrowed intent filter), then its graph neighborhood."""
+    async with runtime.subquery_slots:
+        start = time.time()
+        with telemetry.span("subquery", subquery=subquery["name"]) as span:
+            matches = await vector_search(subquery["text"], top_k, intent_filter(subquery["intent"]))
+            facts = await fetch_graph_context([m["id"] for m in matches]) if matches else []
+            span.set(matches=len(matches), graph_facts=len(facts))
+    return {**subquery, "matches": matches, "graph_facts": facts, "seconds": round(time.time() - start, 3)}
+
+async def run_subqueries(plan: List[Dict], top_k: int = MULTI_AGENT_SUBQUERY_K) -> List[Dict]:
+    """All sub-queries concurrently; their embeddings share batched API calls, slots bound the fan-out."""
+    return list(await asyncio.gather(*(run_subquery(subquery, top_k) for subquery in plan)))
+
+def multi_agent_report(subqueries: List[Dict]) -> Optional[Dict]:
+    if not subqueries:
+        return None
+    seconds = [s["seconds"] for s in subqueries]
+    return {
+        "subqueries": [
+            {"name": s["name"], "text": s["text"], "matches": len(s["matches"]),
+             "graph_facts": len(s["graph_facts"]), "seconds": s["seconds"]}
+            for s in subqueries
+        ],
+        "slowest_seconds": max(seconds),
+        "sequential_seconds": round(sum(seconds), 3),  # what running them one after another would have cost
+        "concurrency": MULTI_AGENT_CONCURRENCY
+    }
+
+# Byte-identical on every call (static instructions included) so provider-side prompt caching applies
+SYSTEM_PROMPT = """You are an expert Vietnam travel consultant with deep knowledge of local culture, destinations, and travel logistics.
 
 YOUR REASONING PROCESS:
 1. Analyze the user's intent (duration, style, preferences, budget if mentioned)
@@ -319,143 +596,322 @@ QUALITY STANDARDS:
 - Balance popular destinations with practical considerations
 - Use specific details from the provided context
 - Keep responses organized and easy to follow
-"""
 
-    vec_context = []
-    for m in pinecone_matches:
-        meta = m["metadata"]
-        score = m.get("score", None)
-        tags = meta.get('tags', [])
-        tags_str = ', '.join(tags) if isinstance(tags, list) else str(tags)
-        
-        snippet = f"- ID: {m['id']}\n  Name: {meta.get('name','Unknown')}\n  Type: {meta.get('type','')}\n  Relevance Score: {score:.3f}"
-        if meta.get("city"):
-            snippet += f"\n  Location: {meta.get('city')}"
-        if tags_str:
-            snippet += f"\n  Tags: {tags_str}"
-        vec_context.append(snippet)
-
-    graph_context = []
-    for f in graph_facts[:20]:
-        context_item = f"- {f['target_name']} ({f['target_id']})\n  Type: {f.get('labels', ['Unknown'])[0] if f.get('labels') else 'Unknown'}\n  Relationship: {f['rel']} from {f['source']}\n  Description: {f['target_desc'][:200]}"
-        graph_context.append(context_item)
-    
-    # Add intent context if available
-    intent_context = ""
-    if intent:
-        if intent.get('style'):
-            intent_context += f"\nDetected travel style: {intent['style']}"
-        if intent.get('duration'):
-            intent_context += f"\nTrip duration: {intent['duration']} days"
-
-    user_content = f"""User Query: "{user_query}"{intent_context}
-
-SEMANTICALLY SIMILAR DESTINATIONS (from vector search):
-{chr(10).join(vec_context[:10])}
-
-RELATED LOCATIONS & CONNECTIONS (from knowledge graph):
-{chr(10).join(graph_context) if graph_context else "No additional graph context available."}
-
-Based on the above context, provide a comprehensive answer that:
-1. Directly addresses the user's query
-2. Uses specific place names and details from the context
-3. Explains WHY these recommendations fit the request
-4. Includes practical travel advice (transportation, timing, costs if relevant)
-5. Structures information clearly (use day-by-day format for multi-day itineraries)
-6. Prioritizes authentic experiences and local insights
+ANSWER REQUIREMENTS:
+1. Directly address the user's query
+2. Use specific place names and details from the context
+3. Explain WHY these recommendations fit the request
+4. Include practical travel advice (transportation, timing, costs if relevant)
+5. Structure information clearly (use day-by-day format for multi-day itineraries)
+6. Prioritize authentic experiences and local insights
 """
 
-    prompt = [
-        {"role": "system", "content": system},
-        {"role": "user", "content": user_content}
-    ]
+# The tokenizer may need its encoding file (a download on first use), so the packer is lazy too
+runtime.register("prompt_packer", lambda: PromptPacker(
+    SYSTEM_PROMPT, budget=PROMPT_TOKEN_BUDGET, description_tokens=PROMPT_DESCRIPTION_TOKENS,
+    counter=TokenCounter(CHAT_MODEL)
+))
+
+def build_prompt(user_query, pinecone_matches, graph_facts, intent=None, scores=None):
+    """
+    Build a chat prompt combining vector DB matches and graph facts with enhanced reasoning.
+    Uses intent analysis for better targeting.
+    
+    Entities are de-duplicated across vector and graph context and packed best
+    first (fused `scores`, when given) into PROMPT_TOKEN_BUDGET input tokens.
+    The system message is a fixed prefix; the query comes last.
+    """
+    prompt, stats = runtime.prompt_packer.pack(user_query, pinecone_matches, graph_facts, intent, scores)
+    telemetry.annotate(prompt_tokens=stats["prompt_tokens"], prompt_entities=stats["entities"],
+                       prompt_dropped=stats["dropped"], prompt_duplicates=stats["duplicates"])
+    telemetry.observe("prompt_tokens", stats["prompt_tokens"])
     return prompt
 
-def call_chat(prompt_messages, max_retries=3, stream=False):
-    """Call OpenAI ChatCompletion with retry logic and optional streaming."""
-    for attempt in range(max_retries):
-        try:
-            resp = client.chat.completions.create(
+CHAT_ERROR_MESSAGE = "I apologize, but I'm having trouble generating a response right now. Please try again."
+CHAT_UNAVAILABLE_MESSAGE = "Service temporarily unavailable."
+
+async def call_chat(prompt_messages, max_retries=3, stream=False):
+    """Call OpenAI ChatCompletion under the chat resilience policy, with optional streaming (returns an async stream)."""
+    async def attempt(n):
+        with telemetry.span("openai.chat.attempt", attempt=n + 1, stream=stream):
+            resp = await runtime.aclient.chat.completions.create(
                 model=CHAT_MODEL,
                 messages=prompt_messages,
                 max_tokens=1000,
                 temperature=0.2,
                 stream=stream
             )
-            
-            if stream:
-                return resp
-            else:
-                return resp.choices[0].message.content
-                
-        except Exception as e:
-            print(f"OpenAI API attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-            else:
-                return "I apologize, but I'm having trouble generating a response right now. Please try again."
-    return "Service temporarily unavailable."
+        
+        if stream:
+            return resp
+        else:
+            return resp.choices[0].message.content
+    
+    try:
+        # A non-streaming attempt that timed out was generating the whole answer; retrying would pay for it twice
+        return await chat_policy.call(attempt, max_attempts=max_retries, retry_timeouts=stream)
+    except CircuitOpenError:
+        mark_failed("chat")
+        telemetry.inc("fallbacks_total", operation="chat", to="unavailable")
+        return CHAT_UNAVAILABLE_MESSAGE
+    except Exception as e:
+        print(f"OpenAI API call failed ({type(e).__name__}: {e})")
+        mark_failed("chat")
+        telemetry.inc("fallbacks_total", operation="chat", to="error_message")
+        return CHAT_ERROR_MESSAGE
 
 # -----------------------------
 # Async Hybrid Retrieval
 # -----------------------------
-async def hybrid_retrieval_async(query_text: str, top_k: int = TOP_K, stream_response: bool = True, use_multi_agent: bool = False) -> Dict:
+def observe_stream(stream: TokenStream):
+    telemetry.observe("first_token_seconds", stream.first_token or 0.0)
+    telemetry.observe("generation_seconds", stream.generation, stream=True)
+    if stream.aborted:
+        telemetry.inc("stream_aborts_total", reason=stream.aborted)
+
+def token_stream(upstream, timing: Dict, on_complete=None) -> TokenStream:
+    """Wrap a chat (or replayed) stream: coalesced text chunks, first-token/generation timing, upstream abort."""
+    return TokenStream(upstream, timing=timing, deadline=GENERATION_DEADLINE_S, min_chars=STREAM_MIN_CHUNK_CHARS,
+                       max_delay=STREAM_MAX_DELAY_MS / 1000.0, on_complete=on_complete, on_close=observe_stream)
+
+async def hybrid_retrieval_async(query_text: str, top_k: int = TOP_K, stream_response: bool = True,
+                                 use_multi_agent: Optional[bool] = None) -> Dict:
     """
     Asynchronous hybrid retrieval combining Pinecone and Neo4j.
+    Every stage awaits a native async client, so many queries can be in flight on one event loop.
     Includes error handling, retry logic, and optional streaming for production resilience.
+    
+    Retrieval is a dependency graph of stages, each starting as soon as its inputs are ready:
+    
+        intent ──────────────────────────────┬──> graph_prefetch ───────────────────┐
+        intent ─> lexical ─> embedding ─> answer_cache ─> vector ─> graph_expand ───┤
+        intent ─> subquery_plan ─────────────┴────────> multi_agent ────────────────┴─> fusion
+    
+    With `use_multi_agent` (None = MULTI_AGENT_ENABLED), a query naming several
+    cities or styles is also split into per-city / per-style sub-queries whose
+    vector searches and graph expansions run concurrently (bounded by
+    MULTI_AGENT_CONCURRENCY process-wide); each becomes one more fusion list,
+    with matches and facts deduplicated. They are skipped (no embeddings calls)
+    on an answer-cache hit or a lexical-only lookup. `multi_agent_report`
+    describes them.
+    
+    The lexical stage is an in-process BM25 lookup (well under a millisecond).
+    With LEXICAL_SKIP_EMBEDDING, a confident lookup (every query term known,
+    every hit contains all of them, enough distinctive terms, and a top score
+    above LEXICAL_MIN_SCORE that clearly leads the runner-up) replaces vector
+    search with its top adaptive-k hits and skips the embeddings call unless
+    the embedding is already cached.
+    
+    `timing["stages"]` has start/end offsets per stage and `timing["critical_path"]`
+    lists the chain of stages that determined when fusion finished.
+    
+    With telemetry enabled each call is one `query` span; stages, retry attempts
+    and client calls are recorded as child spans.
     """
+    if not runtime.started:
+        # Used without startup(): create everything off the event loop once, without warm-up
+        await runtime.startup()
+    with telemetry.span("query", top_k=top_k, stream=stream_response) as span, \
+            Deadline(QUERY_DEADLINE_S, STAGE_SHARES):
+        result = await _hybrid_retrieval(query_text, top_k, stream_response, use_multi_agent)
+        span.set(cached=bool(result.get("cached")), matches=len(result["matches"]),
+                 graph_facts=result["graph_facts_count"])
+        return result
+
+async def _hybrid_retrieval(query_text: str, top_k: int, stream_response: bool, use_multi_agent: Optional[bool]) -> Dict:
     start_time = time.time()
+    graph = StageGraph(span=telemetry.span)
+    split_query = MULTI_AGENT_ENABLED if use_multi_agent is None else use_multi_agent
+    subqueries_ran = False
+    
+    def stage_time(*names):
+        """Wall-clock span covered by the named stages."""
+        spans = [graph.timings[n] for n in names if n in graph.timings]
+        if not spans:
+            return 0.0
+        return round(max(t["end"] for t in spans) - min(t["start"] for t in spans), 3)
+    
+    deadline = current_deadline()
+    degraded_answer = False
+    
+    def resilience_report():
+        failed = deadline.failed
+        if degraded_answer:
+            mode = "cached_answer"
+        elif {"vector", "graph"} <= failed or "chat" in failed:
+            mode = "degraded"
+        elif "vector" in failed:
+            mode = "graph_only"
+        elif "graph" in failed:
+            mode = "vector_only"
+        else:
+            mode = "full"
+        return {"mode": mode, **deadline.report(), "breakers": breaker_states()}
+    
+    def timing(openai_time=0.0):
+        # Same keys on every return path (cache hit, no context, error)
+        return {
+            "lexical": stage_time("lexical"),
+            "embedding": stage_time("embedding"),
+            "pinecone": stage_time("vector"),
+            "neo4j": stage_time("graph_prefetch", "graph_expand"),
+            "rrf_fusion": stage_time("fusion"),
+            "multi_agent": stage_time("subquery_plan", "multi_agent") if subqueries_ran else 0.0,
+            "openai": round(openai_time, 3),
+            "first_token": 0.0,  # streaming: filled in by the TokenStream when it ends
+            "generation": round(openai_time, 3),
+            "total": round(time.time() - start_time, 3),
+            "stages": graph.report(),
+            "critical_path": graph.critical_path("fusion"),
+            "resilience": resilience_report()
+        }
     
     try:
-        # Step 1: Generate embedding (required for Pinecone query)
-        embedding = await asyncio.to_thread(embed_text, query_text)
-        embed_time = time.time() - start_time
+        # ---- stage definitions ----
+        async def intent_stage():
+            return extract_query_intent(query_text)
         
-        # Step 2: Query Pinecone (async with error handling)
-        pinecone_start = time.time()
-        try:
-            matches_result = await asyncio.to_thread(pinecone_query, query_text, top_k)
-            matches = matches_result if matches_result else []
-        except Exception as e:
-            print(f"Pinecone query failed: {e}")
-            matches = []
-        pinecone_time = time.time() - pinecone_start
+        async def lexical_stage(intent):
+            if runtime.lexical_index is None:
+                return None
+            # Enough hits to stand in for the adaptive vector k when confident; fusion takes LEXICAL_TOP_K
+            k = max(LEXICAL_TOP_K, adaptive_top_k(intent, top_k))
+            result = runtime.lexical_index.search(query_text, k)
+            result["confident"] = runtime.lexical_index.is_confident(
+                result, LEXICAL_MIN_SCORE, LEXICAL_MIN_MARGIN, LEXICAL_MIN_TERMS)
+            telemetry.annotate(results=len(result["matches"]), confident=result["confident"])
+            return result
         
-        # Step 3: Extract query intent
-        intent = extract_query_intent(query_text)
+        def lexical_only(lexical):
+            return LEXICAL_SKIP_EMBEDDING and lexical is not None and lexical["confident"]
         
-        # Step 4: Extract match IDs and query Neo4j (async with error handling)
-        match_ids = [m["id"] for m in matches] if matches else []
-        neo4j_start = time.time()
-        try:
-            graph_facts_raw = await asyncio.to_thread(fetch_graph_context, match_ids) if match_ids else []
-        except Exception as e:
-            print(f"Neo4j query failed: {e}")
-            graph_facts_raw = []
-        neo4j_time = time.time() - neo4j_start
+        async def embedding_stage(lexical):
+            if lexical_only(lexical):
+                # Still usable for the answer cache when it costs no API call
+                return await embedding_cache.aget(query_text)
+            return await embed_text(query_text)
         
-        # Step 5: Apply Reciprocal Rank Fusion to combine Pinecone + Neo4j rankings
-        rrf_start = time.time()
-        if matches and graph_facts_raw:
-            # Get fused ranking
-            fused_ranking = reciprocal_rank_fusion(matches, graph_facts_raw, k=60)
-            
-            # Extract top node IDs from fused ranking
-            top_node_ids = [node_id for node_id, score in fused_ranking[:20]]
+        async def answer_cache_stage(embedding, intent):
+            # Semantic answer cache - skip retrieval and generation for near-duplicates
+            if not ANSWER_CACHE_ENABLED or embedding is None:
+                return None
+            return answer_cache.lookup(embedding, intent)
+        
+        async def graph_prefetch_stage(intent):
+            return await fetch_intent_context(intent)
+        
+        async def vector_stage(answer_cache, lexical, intent):
+            if answer_cache is not None:
+                return []
+            k = adaptive_top_k(intent, top_k)
+            if lexical_only(lexical):
+                return lexical["matches"][:k]
+            metadata_filter = intent_filter(intent)
+            telemetry.annotate(top_k=k, metadata_filter=json.dumps(metadata_filter) if metadata_filter else None)
+            matches = await vector_search(query_text, k, metadata_filter) or []
+            if not matches and lexical is not None and "vector" in current_deadline().failed:
+                # Vector search is down: BM25 hits keep retrieval going (graph expansion still works)
+                telemetry.inc("fallbacks_total", operation="vector", to="lexical")
+                return lexical["matches"][:k]
+            return matches
+        
+        async def graph_expand_stage(vector):
+            ids = [m["id"] for m in vector]
+            return await fetch_graph_context(ids) if ids else []
+        
+        async def subquery_plan_stage(intent):
+            if not split_query:
+                return []
+            plan = plan_subqueries(intent, runtime.intent_matcher.style_profile, MULTI_AGENT_MAX_SUBQUERIES)
+            if plan:
+                telemetry.annotate(subqueries=len(plan))
+            return plan
+        
+        async def multi_agent_stage(answer_cache, lexical, subquery_plan):
+            nonlocal subqueries_ran
+            # Sub-query texts are embedded only from here, once a cache hit or lexical-only
+            # answer has been ruled out (they share one batched embeddings call between them)
+            if answer_cache is not None or lexical_only(lexical) or not subquery_plan:
+                return []
+            subqueries_ran = True
+            return await run_subqueries(subquery_plan)
+        
+        async def fusion_stage(vector, lexical, graph_expand, graph_prefetch, multi_agent, intent):
+            matches = vector
+            graph_facts_raw = graph_expand[:100] + graph_prefetch
+            limit = adaptive_top_k(intent, top_k)
             
-            # Filter graph facts to only include top-ranked nodes
-            graph_facts = [fact for fact in graph_facts_raw if fact.get('target_id') in top_node_ids or fact.get('source') in top_node_ids]
+            ranked = [vector_ranking(matches, FUSION_WEIGHTS.get('vector', 1.0))]
+            pools = [vector]
+            if multi_agent:
+                # One list per sub-query, so every city / style gets its best hits near the top
+                ranked += [vector_ranking(s["matches"], FUSION_WEIGHTS.get('subquery', 1.0), name=s["name"])
+                           for s in multi_agent]
+                pools += [s["matches"] for s in multi_agent]
+                graph_facts_raw = dedupe_facts(graph_facts_raw + [f for s in multi_agent for f in s["graph_facts"]])
+                limit = max(limit, min(MULTI_AGENT_MAX_MATCHES, MULTI_AGENT_SUBQUERY_K * len(multi_agent)))
+            if lexical is not None and lexical["matches"] and not lexical_only(lexical):
+                lexical_matches = lexical["matches"][:LEXICAL_TOP_K]
+                ranked.append(vector_ranking(lexical_matches, FUSION_WEIGHTS.get('lexical', 1.0), name="lexical"))
+                pools.append(lexical_matches)
+            if len(ranked) > 1:
+                # Vector, sub-query and lexical hits merged into the prompt's match list (each id once), best fused first
+                by_id = dedupe_matches(pools)
+                merged = fuse(ranked, method=FUSION_METHOD, k=RRF_K, limit=limit)
+                matches = [by_id[node_id] for node_id in merged.ids]
             
-            # Final ranking by keywords (secondary sort)
-            graph_facts = rank_graph_facts(graph_facts, intent.get('keywords', []))
-        else:
+            # Fuse the vector + lexical + graph rankings (RRF or score-normalized, per-list weights)
+            if matches and graph_facts_raw:
+                # Top fused node ids (partial selection)
+                fused = fuse(
+                    ranked + [graph_ranking(graph_facts_raw, FUSION_WEIGHTS.get('graph', 1.0))],
+                    method=FUSION_METHOD, k=RRF_K, limit=max(20, limit)
+                )
+                telemetry.annotate(fusion_lists=fused.contributions, fusion_method=FUSION_METHOD)
+                
+                # Filter graph facts to only include top-ranked nodes (set membership)
+                graph_facts = [fact for fact in graph_facts_raw if fact.get('target_id') in fused or fact.get('source') in fused]
+                
+                # Final ranking by keywords (secondary sort)
+                return matches, rank_graph_facts(graph_facts, intent.get('keywords', [])), dict(fused.items())
             # Fallback to keyword ranking only if RRF not applicable
-            graph_facts = rank_graph_facts(graph_facts_raw, intent.get('keywords', []))
+            return matches, rank_graph_facts(graph_facts_raw, intent.get('keywords', [])), None
         
-        rrf_time = time.time() - rrf_start
-        print(f"DEBUG: RRF fusion completed in {rrf_time:.3f}s")
+        graph.add("intent", intent_stage)
+        graph.add("lexical", lexical_stage, deps=["intent"])
+        graph.add("embedding", embedding_stage, deps=["lexical"])
+        graph.add("answer_cache", answer_cache_stage, deps=["embedding", "intent"])
+        graph.add("graph_prefetch", graph_prefetch_stage, deps=["intent"])
+        graph.add("vector", vector_stage, deps=["answer_cache", "lexical", "intent"])
+        graph.add("graph_expand", graph_expand_stage, deps=["vector"])
+        graph.add("subquery_plan", subquery_plan_stage, deps=["intent"])
+        graph.add("multi_agent", multi_agent_stage, deps=["answer_cache", "lexical", "subquery_plan"])
+        graph.add("fusion", fusion_stage, deps=["vector", "lexical", "graph_expand", "graph_prefetch",
+                                                "multi_agent", "intent"])
+        graph.start()
+        
+        # ---- answer cache short-circuit ----
+        embedding = await graph.result("embedding")
+        intent = await graph.result("intent")
+        cached = await graph.result("answer_cache")
+        if cached is not None:
+            graph.cancel()
+            telemetry.annotate(answer_cache_similarity=round(cached["similarity"], 4))
+            result_timing = timing()
+            return {
+                "answer": None if stream_response else cached["answer"],
+                "stream": token_stream(replay_stream(cached["answer"]), result_timing) if stream_response else None,
+                "matches": cached.get("matches", []),
+                "graph_facts_count": cached.get("graph_facts_count", 0),
+                "multi_agent_report": None,
+                "cached": True,
+                "timing": result_timing
+            }
+        
+        results = await graph.run()
+        matches, graph_facts, fused_scores = results["fusion"]
+        telemetry.annotate(critical_path=" -> ".join(graph.critical_path("fusion")))
         
-        # Step 6: Build prompt with intent
         if not matches and not graph_facts:
             return {
                 "answer": "I apologize, but I couldn't retrieve enough information to answer your question. Please try rephrasing or try again.",
@@ -463,87 +919,88 @@ async def hybrid_retrieval_async(query_text: str, top_k: int = TOP_K, stream_res
                 "graph_facts_count": 0,
                 "stream": None,
                 "multi_agent_report": None,
-                "timing": {
-                    "embedding": round(embed_time, 3),
-                    "pinecone": round(pinecone_time, 3),
-                    "neo4j": round(neo4j_time, 3),
-                    "rrf_fusion": 0.0,
-                    "multi_agent": 0.0,
-                    "openai": 0.0,
-                    "total": round(time.time() - start_time, 3)
-                }
+                "timing": timing()
             }
         
-        # Step 7: Build prompt and call OpenAI
-        prompt = build_prompt(query_text, matches, graph_facts, intent)
+        # Build prompt with intent and call OpenAI (optional streaming)
+        prompt = build_prompt(query_text, matches, graph_facts, intent, fused_scores)
         chat_start = time.time()
         
-        # Step 8: Call OpenAI (async with error handling and optional streaming)
-        chat_start = time.time()
+        def remember_answer(answer_text):
+            if ANSWER_CACHE_ENABLED and embedding is not None and answer_text and answer_text not in (CHAT_ERROR_MESSAGE, CHAT_UNAVAILABLE_MESSAGE):
+                answer_cache.store(
+                    query_text, embedding, intent, answer_text,
+                    matches=[{"id": m["id"], "score": m.get("score"), "metadata": m["metadata"]} for m in matches],
+                    graph_facts_count=len(graph_facts)
+                )
         
         if stream_response:
-            stream = await asyncio.to_thread(call_chat, prompt, 3, True)
+            stream = await call_chat(prompt, 3, True)
             chat_time = time.time() - chat_start
-            
-            return {
-                "answer": None,
-                "stream": stream,
-                "matches": matches,
-                "graph_facts_count": len(graph_facts),
-                "multi_agent_report": None,
-                "timing": {
-                    "embedding": round(embed_time, 3),
-                    "pinecone": round(pinecone_time, 3),
-                    "neo4j": round(neo4j_time, 3),
-                    "rrf_fusion": round(rrf_time, 3),
-                    "multi_agent": 0.0,
-                    "openai": round(chat_time, 3),
-                    "total": round(time.time() - start_time, 3)
-                }
-            }
+            answer = None
+            if isinstance(stream, str):
+                # call_chat gave up and returned an error message instead of a stream
+                answer, stream = stream, None
         else:
-            answer = await asyncio.to_thread(call_chat, prompt, 3, False)
+            answer = await call_chat(prompt, 3, False)
+            stream = None
             chat_time = time.time() - chat_start
-            
-            total_time = time.time() - start_time
-            
-            return {
-                "answer": answer,
-                "stream": None,
-                "matches": matches,
-                "graph_facts_count": len(graph_facts),
-                "multi_agent_report": None,
-                "timing": {
-                    "embedding": round(embed_time, 3),
-                    "pinecone": round(pinecone_time, 3),
-                    "neo4j": round(neo4j_time, 3),
-                    "rrf_fusion": round(rrf_time, 3),
-                    "openai": round(chat_time, 3),
-                    "total": round(total_time, 3)
-                }
-            }
+            telemetry.observe("generation_seconds", chat_time, stream=False)
+            remember_answer(answer)
+        
+        if "chat" in deadline.failed and ANSWER_CACHE_ENABLED and embedding is not None:
+            # Generation is down: a looser semantic match beats an error message
+            fallback = answer_cache.lookup(embedding, intent, threshold=DEGRADED_ANSWER_THRESHOLD)
+            if fallback is not None:
+                degraded_answer = True
+                telemetry.inc("fallbacks_total", operation="chat", to="cached_answer")
+                answer = None if stream_response else fallback["answer"]
+                stream = replay_stream(fallback["answer"]) if stream_response else None
+        
+        result_timing = timing(chat_time)
+        if stream is not None:
+            # Text chunks for the caller; the answer is cached once the whole stream has been consumed
+            stream = token_stream(stream, result_timing, on_complete=None if degraded_answer else remember_answer)
+        return {
+            "answer": answer,
+            "stream": stream,
+            "matches": matches,
+            "graph_facts_count": len(graph_facts),
+            "multi_agent_report": multi_agent_report(results["multi_agent"]),
+            "cached": degraded_answer,
+            "timing": result_timing
+        }
     
     except Exception as e:
+        graph.cancel()
         print(f"Critical error in hybrid retrieval: {e}")
         return {
             "answer": f"An unexpected error occurred: {str(e)}. Please try again.",
             "matches": [],
             "graph_facts_count": 0,
             "stream": None,
-            "timing": {
-                "embedding": 0.0,
-                "pinecone": 0.0,
-                "neo4j": 0.0,
-                "rrf_fusion": 0.0,
-                "openai": 0.0,
-                "total": round(time.time() - start_time, 3)
-            }
+            "multi_agent_report": None,
+            "timing": timing()
         }
 
 # -----------------------------
-# Interactive chat (Synchronous wrapper)
+# Interactive chat (one long-lived event loop)
 # -----------------------------
-def interactive_chat():
+async def startup(warm: bool = RUNTIME_WARM_UP):
+    """Create clients and load indexes up front (concurrently, off the event loop), optionally pre-opening connections."""
+    await runtime.startup(warm=warm)
+    stats = runtime.stats()
+    print(f"Runtime ready in {stats['startup_seconds']}s (import {stats['import_seconds']}s)")
+
+async def shutdown():
+    """Close pooled clients (Neo4j driver, OpenAI/Pinecone HTTP pools, embedding cache)."""
+    await embed_batcher.close()
+    await runtime.shutdown()
+    print("Clients closed.")
+    await asyncio.to_thread(embedding_cache.close)  # commits buffered writes
+    telemetry.close()
+
+async def interactive_chat_async():
     """Interactive CLI for travel queries with performance metrics and streaming responses."""
     print("="*60)
     print("ENHANCED HYBRID TRAVEL ASSISTANT v2.2")
@@ -551,22 +1008,34 @@ def interactive_chat():
     print("="*60)
     print("\nType your question or 'exit' to quit.\n")
     
+    if telemetry.enabled and TELEMETRY_METRICS_PORT:
+        start_metrics_server(telemetry, int(TELEMETRY_METRICS_PORT))
+        print(f"Metrics: http://127.0.0.1:{TELEMETRY_METRICS_PORT}/metrics\n")
+    
+    await startup()
+    
     query_count = 0
+    loop = asyncio.get_running_loop()
     
     try:
         while True:
             try:
-                query = input("Your travel question: ").strip()
+                # Blocking stdin read stays off the event loop
+                query = (await loop.run_in_executor(None, input, "Your travel question: ")).strip()
                 if not query or query.lower() in ("exit", "quit"):
-                    print(f"\nProcessed {query_count} queries. Cache hits: {len(embedding_cache)}")
+                    stats = embedding_cache.stats()
+                    print(f"\nProcessed {query_count} queries. Embedding cache: {stats['hits']} hits, "
+                          f"{stats['misses']} misses, {stats['evictions']} evictions")
+                    batch_stats = embed_batcher.stats()
+                    print(f"Embedding batches: {batch_stats['batches']} calls for {batch_stats['requests']} requests "
+                          f"(avg size {batch_stats['avg_batch_size']}, p95 {batch_stats['batch_latency_ms_p95']}ms)")
                     print("Thank you for using the travel assistant!")
                     break
                 
                 query_count += 1
                 print("\nProcessing your request...\n")
                 
-                # Run async function in event loop with streaming enabled
-                result = asyncio.run(hybrid_retrieval_async(query, stream_response=True))
+                result = await hybrid_retrieval_async(query, stream_response=True)
                 
                 # Display results with streaming
                 print("="*60)
@@ -574,17 +1043,15 @@ def interactive_chat():
                 print("="*60 + "\n")
                 
                 if result.get("stream"):
-                    # Stream the response token by token
-                    full_answer = ""
-                    for chunk in result["stream"]:
-                        if chunk.choices[0].delta.content:
-                            content = chunk.choices[0].delta.content
-                            print(content, end='', flush=True)
-                            full_answer += content
+                    # Stream the response in coalesced text chunks
+                    try:
+                        async for text in result["stream"]:
+                            print(text, end='', flush=True)
+                    finally:
+                        await result["stream"].aclose()  # no-op once complete; stops generation on Ctrl-C
                     print("\n")
                     
-                    # Update timing for total with streaming completion
-                    result["answer"] = full_answer
+                    result["answer"] = result["stream"].text
                 else:
                     # Non-streaming fallback
                     print(result["answer"])
@@ -597,13 +1064,25 @@ def interactive_chat():
                 print(f"Pinecone search: {result['timing']['pinecone']}s")
                 print(f"Neo4j graph query: {result['timing']['neo4j']}s")
                 print(f"RRF fusion: {result['timing']['rrf_fusion']}s")
-                print(f"OpenAI generation: {result['timing']['openai']}s (streaming)")
+                report = result.get("multi_agent_report")
+                if report:
+                    print(f"Sub-queries: {len(report['subqueries'])} in {result['timing']['multi_agent']}s "
+                          f"(slowest {report['slowest_seconds']}s, {report['sequential_seconds']}s one after another)")
+                print(f"OpenAI: first token {result['timing']['first_token']}s, "
+                      f"generation {result['timing']['generation']}s (streaming)")
                 print(f"Total time: {result['timing']['total']}s")
+                if result['timing'].get('critical_path'):
+                    print(f"Critical path: {' -> '.join(result['timing']['critical_path'])}")
+                if result.get("cached"):
+                    print("Answer served from semantic answer cache")
                 print(f"Results: {len(result['matches'])} vector matches, {result['graph_facts_count']} graph facts")
-                print(f"Cache size: {len(embedding_cache)} embeddings cached")
+                stats = embedding_cache.stats()
+                print(f"Embedding cache: {stats['hits']} hits / {stats['misses']} misses "
+                      f"(ratio {stats['hit_ratio']}), {stats['evictions']} evictions, "
+                      f"{stats['entries']} entries ({stats['memory_bytes'] // 1024} KB)")
                 print("="*60 + "\n")
                 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError):
                 print("\n\nInterrupted by user. Exiting gracefully...")
                 break
             except Exception as e:
@@ -614,11 +1093,16 @@ def interactive_chat():
     finally:
         # Clean up resources
         try:
-            driver.close()
-            print("Neo4j connection closed.")
-        except:
+            await shutdown()
+        except Exception:
             pass
 
+runtime.import_seconds = round(time.perf_counter() - _IMPORT_START, 4)
+
+def interactive_chat():
+    """Run the chat session on a single event loop for its whole lifetime."""
+    asyncio.run(interactive_chat_async())
+
 if __name__ == "__main__":
     print("="*60)
     print("BLUE ENIGMA HYBRID TRAVEL ASSISTANT v2.2")
@@ -0,0 +1,174 @@
+# ingest.py
+import hashlib
+import json
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+DATA_FILE = "vietnam_travel_dataset.json"
+READ_CHUNK = 1 << 16  # 64 KB
+
+# -----------------------------
+# Incremental parsing
+# -----------------------------
+def _iter_json_array(f) -> Iterator[Dict]:
+    """Yield the elements of a top-level JSON array one at a time, reading the file in chunks."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    consumed = 0  # bytes of the file before buf[0]
+
+    def fill():
+        nonlocal buf, pos, eof, consumed
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            eof = True
+        consumed += len(buf[:pos].encode("utf-8"))
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def byte_offset(i):
+        return consumed + len(buf[:i].encode("utf-8"))
+
+    # Opening bracket
+    while True:
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+        if pos < len(buf):
+            break
+        if eof:
+            return
+        fill()
+    if buf[pos] != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+
+    while True:
+        # Skip separators between elements
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ","):
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            fill()
+        if pos >= len(buf):
+            raise ValueError("Unterminated JSON array")
+        if buf[pos] == "]":
+            return
+
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            # An element cut off by the chunk boundary fails within a literal's length of the end of
+            # the buffer (or, for a string, from its start); an error anywhere else is malformed
+            # input, reported without reading further
+            truncated = e.pos >= len(buf) - 8 or e.msg.startswith("Unterminated string")
+            if eof or not truncated:
+                raise ValueError(f"Invalid JSON at byte {byte_offset(e.pos)}: {e.msg}") from e
+            fill()
+            continue
+        pos = end
+        yield record
+
+
+def _iter_jsonl(f) -> Iterator[Dict]:
+    for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_no}: {e}") from e
+
+
+def iter_records(path: str = DATA_FILE) -> Iterator[Dict]:
+    """
+    Stream raw records from a JSON array file or a JSONL file (one object per line).
+    The format is taken from the extension (.jsonl / .ndjson), else from the first
+    non-whitespace character. Memory use is one record plus one read chunk.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            yield from _iter_jsonl(f)
+            return
+        head = f.read(READ_CHUNK)
+        first = head.lstrip()[:1]
+        f.seek(0)
+        if first == "[":
+            yield from _iter_json_array(f)
+        else:
+            yield from _iter_jsonl(f)
+
+
+# -----------------------------
+# Validation
+# -----------------------------
+class IngestStats:
+    def __init__(self):
+        self.seen = 0
+        self.valid = 0
+        self.skipped = 0
+        self.errors: List[str] = []
+
+    def __str__(self):
+        return f"{self.valid} valid records, {self.skipped} skipped"
+
+
+def validate_record(record) -> Optional[str]:
+    """Return a reason string if the record cannot be loaded, else None."""
+    if not isinstance(record, dict):
+        return "record is not an object"
+    if not isinstance(record.get("id"), str) or not record["id"]:
+        return "missing string 'id'"
+    if not isinstance(record.get("type"), str) or not record["type"]:
+        return f"{record['id']}: missing string 'type'"
+    connections = record.get("connections", [])
+    if not isinstance(connections, list) or not all(isinstance(c, dict) for c in connections):
+        return f"{record['id']}: 'connections' must be a list of objects"
+    return None
+
+
+def iter_valid(records: Iterable, stats: Optional[IngestStats] = None, max_errors: int = 20) -> Iterator[Dict]:
+    """Pass through valid records; count (and keep the first few reasons for) skipped ones."""
+    for record in records:
+        if stats is not None:
+            stats.seen += 1
+        reason = validate_record(record)
+        if reason is not None:
+            if stats is not None:
+                stats.skipped += 1
+                if len(stats.errors) < max_errors:
+                    stats.errors.append(reason)
+            continue
+        if stats is not None:
+            stats.valid += 1
+        yield record
+
+
+# -----------------------------
+# Batching
+# -----------------------------
+def batched(iterable: Iterable, n: int) -> Iterator[List]:
+    """Group any iterable into lists of up to n items without materializing it."""
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, n))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_batches(path: str = DATA_FILE, batch_size: int = 1000,
+                 stats: Optional[IngestStats] = None) -> Iterator[List[Dict]]:
+    """Validated records from `path`, in batches of `batch_size`."""
+    return batched(iter_valid(iter_records(path), stats), batch_size)
+
+
+def file_fingerprint(path: str = DATA_FILE) -> str:
+    """sha1 of the file contents, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,298 @@
+# intent.py
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from ingest import iter_records, iter_valid
+
+DATA_FILE = "vietnam_travel_dataset.json"
+BASE_ENTITY_TYPES = ['City', 'Attraction', 'Activity']
+# Tags on more than this share of records (e.g. "stay", "experience") carry no intent signal
+MAX_TAG_SHARE = 0.25
+TERM_CACHE_SIZE = 4096  # distinct texts (node names / descriptions) whose term sets are memoized
+
+# -----------------------------
+# Intent taxonomy
+# -----------------------------
+# Checked in order; when several styles match, the last one wins (as before), while
+# keywords and entity types of every matched style are merged.
+DEFAULT_TAXONOMY = [
+    {"style": "romantic",
+     "triggers": ["romantic", "romance", "couple", "honeymoon"],
+     "keywords": ["romantic", "lanterns", "heritage", "scenic"],
+     "entity_types": ["Restaurant", "Hotel"]},
+    {"style": "adventure",
+     "triggers": ["adventure", "trek", "hiking", "climb"],
+     "keywords": ["mountain", "trekking", "adventure", "nature"],
+     "entity_types": ["Activity", "Tour"]},
+    {"style": "food",
+     "triggers": ["food", "cuisine", "restaurant", "eat"],
+     "keywords": ["food", "cuisine", "restaurant", "market"],
+     "entity_types": ["Restaurant", "Market"]},
+    {"style": "beach",
+     "triggers": ["beach", "coast", "sea", "ocean"],
+     "keywords": ["beach", "coast", "cruise", "island"],
+     "entity_types": []},
+    {"style": "culture",
+     "triggers": ["culture", "history", "heritage", "temple"],
+     "keywords": ["culture", "heritage", "history", "temple", "museum"],
+     "entity_types": []},
+]
+
+DURATION_PATTERN = re.compile(r'(\d+)\s*(day|week)')
+
+# Words that ask for one entity type outright ("hotels in Hoi An" -> Hotel); matched at word starts
+TYPE_TERMS = {
+    "Hotel": ["hotel", "accommodation", "resort", "hostel", "homestay"],
+    "Activity": ["activit", "things to do"],
+    "Attraction": ["attraction", "sight", "landmark"],
+}
+# Other spellings of dataset city names
+PLACE_ALIASES = {
+    "saigon": "Ho Chi Minh City",
+    "hcmc": "Ho Chi Minh City",
+    "halong": "Ha Long Bay",
+    "ha long": "Ha Long Bay",
+    "dalat": "Da Lat",
+    "danang": "Da Nang",
+    "hoian": "Hoi An",
+    "sa pa": "Sapa",
+    "mekong": "Mekong Delta",
+}
+
+
+def load_taxonomy(path: Optional[str] = None) -> List[Dict]:
+    """DEFAULT_TAXONOMY, or a JSON file with the same shape (a list of style entries)."""
+    if not path:
+        return DEFAULT_TAXONOMY
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def dataset_tags(path: str = DATA_FILE, max_share: float = MAX_TAG_SHARE) -> List[str]:
+    """Tag vocabulary of the dataset, minus tags too common to discriminate."""
+    counts = Counter()
+    records = 0
+    for record in iter_valid(iter_records(path)):
+        records += 1
+        counts.update({str(tag).lower() for tag in record.get("tags") or []})
+    limit = max_share * records
+    return sorted(tag for tag, n in counts.items() if n <= limit)
+
+
+def dataset_places(path: str = DATA_FILE) -> Tuple[Dict[str, str], List[str]]:
+    """City name -> region for every City record, and the entity types present in the dataset."""
+    cities: Dict[str, str] = {}
+    types: Set[str] = set()
+    for record in iter_valid(iter_records(path)):
+        if record.get("type"):
+            types.add(record["type"])
+        if record.get("type") == "City" and record.get("name"):
+            cities[record["name"]] = record.get("region") or ""
+    return cities, sorted(types)
+
+
+def place_phrases(cities: Dict[str, str], aliases: Dict[str, str] = PLACE_ALIASES) -> Dict[str, FrozenSet[str]]:
+    """
+    Lowercased phrase -> city names it refers to: each city name (also without a
+    trailing "City"), known aliases, and each region ("Northern Vietnam",
+    "North Vietnam") standing for all of its cities.
+    """
+    phrases: Dict[str, Set[str]] = {}
+    for name, region in cities.items():
+        lowered = name.lower()
+        phrases.setdefault(lowered, set()).add(name)
+        if lowered.endswith(" city"):
+            phrases.setdefault(lowered[:-len(" city")], set()).add(name)
+        if region:
+            region_lower = region.lower()
+            phrases.setdefault(region_lower, set()).add(name)
+            first, _, rest = region_lower.partition(" ")
+            if first.endswith("ern") and rest:
+                phrases.setdefault(f"{first[:-3]} {rest}", set()).add(name)
+    for alias, name in aliases.items():
+        if name in cities:
+            phrases.setdefault(alias, set()).add(name)
+    return {phrase: frozenset(names) for phrase, names in phrases.items()}
+
+
+# -----------------------------
+# Compiled matcher
+# -----------------------------
+def trie_pattern(terms: Iterable[str]) -> str:
+    """
+    Regex for a set of literal terms with common prefixes factored out
+    ("mar(?:ket(?:s)?)" instead of "markets|market"), so the engine walks a
+    character trie instead of trying every alternative. Longer matches win.
+    """
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        terminal = "" in node
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if terminal else group
+
+    return build(trie)
+
+
+class IntentMatcher:
+    """
+    One compiled pattern over every trigger, keyword and tag term.
+
+    Terms match at the start of a word and may be followed by more letters
+    ("trek" matches "trekking", "temple" matches "temples"). The pattern is a
+    prefix trie, so the longest term wins at each position, and each term is
+    precomputed to also stand for the shorter vocabulary terms it contains at
+    word starts ("floating markets" also reports "floating" and "markets").
+    One scan of a text therefore yields every vocabulary term present in it;
+    term sets of repeated texts (graph node names and descriptions) are memoized.
+
+    Two smaller patterns find the cities / regions a query names (whole words)
+    and entity types it asks for outright; they feed vector metadata filters.
+    """
+
+    def __init__(self, taxonomy: Iterable[Dict] = DEFAULT_TAXONOMY, tags: Iterable[str] = (),
+                 cache_size: int = TERM_CACHE_SIZE, cities: Optional[Dict[str, str]] = None,
+                 entity_types: Iterable[str] = ()):
+        self.taxonomy = list(taxonomy)
+        self.tags = [tag.replace("_", " ").lower() for tag in tags]
+        self.entity_types = list(entity_types)  # types present in the dataset ([] = unknown)
+
+        self._places = place_phrases(cities or {})
+        self._place_pattern = (re.compile(r"\b(?:" + trie_pattern(self._places) + r")\b")
+                               if self._places else None)
+        self._type_of = {term: entity_type for entity_type, terms in TYPE_TERMS.items() for term in terms
+                         if not self.entity_types or entity_type in self.entity_types}
+        self._type_pattern = (re.compile(r"\b(?:" + trie_pattern(self._type_of) + ")")
+                              if self._type_of else None)
+
+        vocabulary: Set[str] = set(self.tags)
+        for entry in self.taxonomy:
+            vocabulary.update(t.lower() for t in entry.get("triggers", []))
+            vocabulary.update(k.lower() for k in entry.get("keywords", []))
+        self.vocabulary = frozenset(v for v in vocabulary if v)
+
+        # term -> every vocabulary term it implies (itself plus word-start substrings)
+        self._covers: Dict[str, FrozenSet[str]] = {}
+        for term in self.vocabulary:
+            self._covers[term] = frozenset(
+                other for other in self.vocabulary
+                if re.search(r"\b" + re.escape(other), term)
+            )
+        # Lowercased taxonomy entries with trigger sets, for set intersection per query
+        self._entries = [
+            (entry["style"],
+             frozenset(t.lower() for t in entry.get("triggers", [])),
+             [k.lower() for k in entry.get("keywords", [])],
+             list(entry.get("entity_types", [])))
+            for entry in self.taxonomy
+        ]
+        self._pattern = re.compile(r"\b(?:" + trie_pattern(self.vocabulary) + ")") if self.vocabulary else None
+        self._cached_terms = lru_cache(maxsize=cache_size)(self._scan)
+
+    @classmethod
+    def from_dataset(cls, path: str = DATA_FILE, taxonomy_path: Optional[str] = None) -> "IntentMatcher":
+        try:
+            tags = dataset_tags(path)
+            cities, entity_types = dataset_places(path)
+        except (OSError, ValueError):
+            tags, cities, entity_types = [], {}, []
+        return cls(load_taxonomy(taxonomy_path), tags, cities=cities, entity_types=entity_types)
+
+    def style_profile(self, style: str) -> Dict:
+        """Keywords and entity types (including the base types) a single style contributes to an intent."""
+        for name, _, keywords, entity_types in self._entries:
+            if name == style:
+                return {'keywords': list(keywords), 'entity_types': list(BASE_ENTITY_TYPES) + entity_types}
+        return {'keywords': [], 'entity_types': list(BASE_ENTITY_TYPES)}
+
+    def _scan(self, text: str) -> FrozenSet[str]:
+        found: Set[str] = set()
+        for match in self._pattern.finditer(text.lower()):
+            found |= self._covers[match.group(0)]
+        return frozenset(found)
+
+    def terms(self, text: str) -> FrozenSet[str]:
+        """All vocabulary terms present in `text` (one pass, memoized per distinct text)."""
+        if not text or self._pattern is None:
+            return frozenset()
+        return self._cached_terms(text)
+
+    def count(self, text: str, wanted: FrozenSet[str]) -> int:
+        """How many of the `wanted` terms appear in `text`; terms outside the vocabulary fall back to substring search."""
+        if not wanted or not text:
+            return 0
+        hits = len(self.terms(text) & wanted)
+        if not wanted <= self.vocabulary:
+            lowered = text.lower()
+            hits += sum(1 for k in wanted - self.vocabulary if k in lowered)
+        return hits
+
+    def places(self, query_lower: str) -> List[str]:
+        """Dataset city names a (lowercased) query refers to, by name, alias or region, in order of mention."""
+        if self._place_pattern is None:
+            return []
+        found: Dict[str, None] = {}
+        for match in self._place_pattern.finditer(query_lower):
+            found.update(dict.fromkeys(sorted(self._places[match.group(0)])))
+        return list(found)
+
+    def requested_types(self, query_lower: str) -> List[str]:
+        """Entity types a (lowercased) query asks for by name ("hotels", "activities")."""
+        if self._type_pattern is None:
+            return []
+        return list(dict.fromkeys(self._type_of[m.group(0)] for m in self._type_pattern.finditer(query_lower)))
+
+    def intent(self, query: str) -> Dict:
+        """
+        Style, keywords, entity types, named cities / requested types and trip
+        duration detected in a query. `style` is the last matched style, `styles`
+        every matched style in taxonomy order.
+        """
+        query_lower = query.lower()
+        found = self._scan(query_lower) if self._pattern is not None else frozenset()
+
+        intent = {
+            'keywords': [],
+            'style': None,
+            'duration': None,
+            'entity_types': list(BASE_ENTITY_TYPES),
+            'cities': self.places(query_lower),
+            'requested_types': self.requested_types(query_lower),
+            'styles': []
+        }
+        for style, triggers, keywords, entity_types in self._entries:
+            if not triggers.isdisjoint(found):
+                intent['style'] = style
+                intent['styles'].append(style)
+                intent['keywords'].extend(keywords)
+                intent['entity_types'].extend(entity_types)
+
+        # Dataset tags named in the query become keywords too
+        if found:
+            seen = set(intent['keywords'])
+            for tag in self.tags:
+                if tag in found and tag not in seen:
+                    intent['keywords'].append(tag)
+                    seen.add(tag)
+
+        duration_match = DURATION_PATTERN.search(query_lower)
+        if duration_match:
+            days = int(duration_match.group(1))
+            if duration_match.group(2) == 'week':
+                days *= 7
+            intent['duration'] = days
+
+        return intent
@@ -0,0 +1,250 @@
+# lexical_index.py
+import argparse
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from fusion import top_k as select_top_k
+from ingest import iter_records, iter_valid
+
+DATA_FILE = "vietnam_travel_dataset.json"
+DEFAULT_LEXICAL_PATH = "lexical_index"
+
+# Indexed fields and how much a term occurrence in each counts (BM25F-style tf weighting)
+FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "semantic_text": 1.0, "description": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# When lexical hits alone are trusted (is_confident): a top BM25 score floor, a relative margin over
+# the runner-up, and enough distinctive query terms (in at most DISTINCTIVE_MAX_DF of the documents).
+# City names sit in ~10% of the documents, so "Hanoi" or "beach" alone is never distinctive.
+MIN_SCORE = 10.0
+MIN_MARGIN = 0.15
+MIN_DISTINCTIVE_TERMS = 2
+DISTINCTIVE_MAX_DF = 0.05
+
+# Query filler that carries no retrieval signal (place-name fragments like "an", "ha", "da" are kept)
+STOPWORDS = frozenset("""
+a about and are around at be best can do find for from get give good how i in is it me my near
+of on or please recommend show some suggest tell the to top visit want what where which with you
+""".split())
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with a light plural strip ("hotels" -> "hotel"); numbers are dropped."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token.isdigit():
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _record_fields(record: Dict) -> Dict[str, str]:
+    return {
+        "name": record.get("name") or "",
+        "tags": " ".join(str(t).replace("_", " ") for t in record.get("tags") or []),
+        "semantic_text": record.get("semantic_text") or "",
+        "description": record.get("description") or ""
+    }
+
+
+def _record_metadata(record: Dict) -> Dict:
+    # Same shape as the vector index metadata (pinecone_upload.iter_items)
+    return {
+        "id": record.get("id"),
+        "type": record.get("type"),
+        "name": record.get("name"),
+        "city": record.get("city", record.get("region", "")),
+        "tags": record.get("tags", [])
+    }
+
+
+# -----------------------------
+# BM25 inverted index
+# -----------------------------
+class LexicalIndex:
+    """
+    In-process BM25 index over node name, tags, semantic_text and description.
+
+    Postings are CSR arrays: for term t, documents postings[offsets[t]:offsets[t+1]]
+    with (field-weighted) term frequencies freqs[...]. Document-length
+    normalization is static, so every posting's BM25 weight is computed once at
+    load; a query is a bincount over the postings of its terms.
+
+    On disk: <path>.npz (offsets, postings, freqs, doc_lens) + <path>.json (strings).
+    """
+
+    def __init__(self, ids, metadata, terms, offsets, postings, freqs, doc_lens,
+                 k1: float = BM25_K1, b: float = BM25_B):
+        self.ids = list(ids)
+        self.metadata = list(metadata)
+        self.terms = list(terms)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.postings = np.asarray(postings, dtype=np.int32)
+        self.freqs = np.asarray(freqs, dtype=np.float32)
+        self.doc_lens = np.asarray(doc_lens, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self.term_index = {term: i for i, term in enumerate(self.terms)}
+
+        n_docs = max(len(self.ids), 1)
+        doc_freq = np.diff(self.offsets).astype(np.float64)
+        self.doc_freq_ratio = doc_freq / n_docs
+        self.idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        avgdl = float(self.doc_lens.mean()) if len(self.doc_lens) else 1.0
+        norm = k1 * (1.0 - b + b * self.doc_lens[self.postings] / avgdl)
+        term_of_posting = np.repeat(np.arange(len(self.terms)), np.diff(self.offsets))
+        self.weights = (self.idf[term_of_posting] * self.freqs * (k1 + 1.0) / (self.freqs + norm)).astype(np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---- construction ----
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], field_weights: Dict[str, float] = FIELD_WEIGHTS) -> "LexicalIndex":
+        """Build from dataset records in one pass; `records` may be a stream."""
+        ids, metadata, doc_lens = [], [], []
+        term_docs: Dict[str, List[tuple]] = {}
+        for record in records:
+            doc = len(ids)
+            ids.append(record["id"])
+            metadata.append(_record_metadata(record))
+            tf = Counter()
+            for field, text in _record_fields(record).items():
+                weight = field_weights.get(field, 0.0)
+                if weight:
+                    for token in tokenize(text):
+                        tf[token] += weight
+            doc_lens.append(sum(tf.values()))
+            for term, freq in tf.items():
+                term_docs.setdefault(term, []).append((doc, freq))
+
+        terms = sorted(term_docs)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(term_docs[t]) for t in terms], out=offsets[1:])
+        postings = [doc for t in terms for doc, _ in term_docs[t]]
+        freqs = [freq for t in terms for _, freq in term_docs[t]]
+        return cls(ids, metadata, terms, offsets, postings, freqs, doc_lens)
+
+    # ---- persistence ----
+    @classmethod
+    def load(cls, path: str = DEFAULT_LEXICAL_PATH) -> "LexicalIndex":
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            header = json.load(f)
+        arrays = np.load(f"{path}.npz")
+        return cls(
+            header["ids"], header["metadata"], header["terms"],
+            arrays["offsets"], arrays["postings"], arrays["freqs"], arrays["doc_lens"],
+            k1=header.get("k1", BM25_K1), b=header.get("b", BM25_B)
+        )
+
+    def save(self, path: str = DEFAULT_LEXICAL_PATH):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # np.savez appends .npz unless the name already ends with it
+        tmp_npz = f"{path}.tmp.npz"
+        np.savez(tmp_npz, offsets=self.offsets, postings=self.postings, freqs=self.freqs, doc_lens=self.doc_lens)
+        tmp_json = f"{path}.json.tmp"
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "metadata": self.metadata, "terms": self.terms,
+                       "k1": self.k1, "b": self.b}, f)
+
+        os.replace(tmp_npz, f"{path}.npz")
+        os.replace(tmp_json, f"{path}.json")
+
+    # ---- queries ----
+    def search(self, text: str, top_k: int = 5) -> Dict:
+        """
+        BM25 top-k for a query. Returns {"matches", "query_terms", "unknown_terms",
+        "distinctive_terms", "full_coverage"}: matches are shaped like vector matches
+        (id, score, metadata), distinctive_terms counts known query terms found in at
+        most DISTINCTIVE_MAX_DF of the documents, and full_coverage counts how many
+        matches contain every known query term.
+        """
+        tokens = list(dict.fromkeys(t for t in tokenize(text) if t not in STOPWORDS))
+        known = [self.term_index[t] for t in tokens if t in self.term_index]
+        result = {"matches": [], "query_terms": len(tokens), "unknown_terms": len(tokens) - len(known),
+                  "distinctive_terms": int((self.doc_freq_ratio[known] <= DISTINCTIVE_MAX_DF).sum()),
+                  "full_coverage": 0}
+        if not known:
+            return result
+
+        spans = [np.arange(self.offsets[t], self.offsets[t + 1]) for t in known]
+        hits = np.concatenate(spans)
+        docs = self.postings[hits]
+        scores = np.bincount(docs, weights=self.weights[hits], minlength=len(self.ids))
+        coverage = np.bincount(docs, minlength=len(self.ids))
+
+        order = select_top_k(scores, top_k)
+        order = order[scores[order] > 0]
+        result["matches"] = [
+            {"id": self.ids[i], "score": float(scores[i]), "metadata": self.metadata[i]}
+            for i in order.tolist()
+        ]
+        result["full_coverage"] = int((coverage[order] == len(known)).sum())
+        return result
+
+    def is_confident(self, result: Dict, min_score: float = MIN_SCORE, min_margin: float = MIN_MARGIN,
+                     min_terms: int = MIN_DISTINCTIVE_TERMS) -> bool:
+        """
+        True when lexical results alone can stand in for vector search: every query
+        term is in the vocabulary, every returned match contains all of them, at
+        least `min_terms` of them are distinctive, and the top hit scores at least
+        `min_score` and beats the runner-up by `min_margin` (relative). Ties at the
+        top mean BM25 cannot tell the candidates apart, so they are never confident.
+        """
+        matches = result["matches"]
+        if not matches or result["unknown_terms"] or result["full_coverage"] != len(matches):
+            return False
+        if result["distinctive_terms"] < min_terms:
+            return False
+        top = matches[0]["score"]
+        runner_up = matches[1]["score"] if len(matches) > 1 else 0.0
+        return top >= min_score and top - runner_up >= min_margin * top
+
+
+def load_lexical_index(path: str = DEFAULT_LEXICAL_PATH) -> Optional[LexicalIndex]:
+    """Load a lexical index if one has been built, else None."""
+    if not (os.path.exists(f"{path}.npz") and os.path.exists(f"{path}.json")):
+        return None
+    return LexicalIndex.load(path)
+
+
+def build_lexical_index(data_file: str = DATA_FILE, path: str = DEFAULT_LEXICAL_PATH) -> LexicalIndex:
+    index = LexicalIndex.from_records(iter_valid(iter_records(data_file)))
+    index.save(path)
+    return index
+
+
+# -----------------------------
+# CLI: build the index
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Build the BM25 lexical index used by hybrid_chat.")
+    parser.add_argument("--data-file", default=DATA_FILE)
+    parser.add_argument("--output", default=DEFAULT_LEXICAL_PATH)
+    parser.add_argument("--query", help="Run one query against the built index and print the top 5")
+    args = parser.parse_args()
+
+    index = build_lexical_index(args.data_file, args.output)
+    print(f"Saved lexical index: {len(index)} documents, {len(index.terms)} terms -> {args.output}.npz/.json")
+    if args.query:
+        result = index.search(args.query)
+        for m in result["matches"]:
+            print(f"  {m['score']:.3f}  {m['id']}  {m['metadata']['name']}")
+        print(f"  distinctive terms: {result['distinctive_terms']}/{result['query_terms']}, "
+              f"confident: {index.is_confident(result)}")
+
+
+if __name__ == "__main__":
+    main()
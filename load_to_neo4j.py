@@ -1,10 +1,22 @@
 # load_to_neo4j.py
+import argparse
 import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
 from neo4j import GraphDatabase
 from tqdm import tqdm
 import config
+from graph_snapshot import GraphSnapshot, encode_summary
+from ingest import IngestStats, file_fingerprint, iter_records, iter_valid
 
 DATA_FILE = "vietnam_travel_dataset.json"
+GRAPH_SNAPSHOT_PATH = getattr(config, "GRAPH_SNAPSHOT_PATH", "graph_snapshot")
+BULK_BATCH_SIZE = 1000
+BULK_WORKERS = 4
+CHECKPOINT_FILE = ".load_to_neo4j.checkpoint.jsonl"
 
 driver = GraphDatabase.driver(config.NEO4J_URI, auth=(config.NEO4J_USER, config.NEO4J_PASSWORD))
 
@@ -39,25 +51,287 @@ def create_relationship(tx, source_id, rel):
     )
     tx.run(cypher, source_id=source_id, target_id=target_id)
 
-def main():
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        nodes = json.load(f)
+# -----------------------------
+# Bulk load (UNWIND batches on parallel sessions)
+# -----------------------------
+def cypher_name(name):
+    """Backtick-quote a label / relationship type taken from the data."""
+    return "`" + str(name).replace("`", "``") + "`"
+
+def node_props(node):
+    return {k: v for k, v in node.items() if k not in ("connections",)}
+
+def upsert_node_batch(tx, label, rows):
+    tx.run(
+        f"UNWIND $rows AS row "
+        f"MERGE (n:{cypher_name(label)}:Entity {{id: row.id}}) "
+        "SET n += row.props",
+        rows=rows
+    )
+
+def create_relationship_batch(tx, rel_type, rows):
+    tx.run(
+        "UNWIND $rows AS row "
+        "MATCH (a:Entity {id: row.source}) "
+        "MATCH (b:Entity {id: row.target}) "
+        f"MERGE (a)-[r:{cypher_name(rel_type)}]->(b)",
+        rows=rows
+    )
+
+def set_neighborhood_batch(tx, _group, rows):
+    tx.run(
+        "UNWIND $rows AS row "
+        "MATCH (n:Entity {id: row.id}) "
+        "SET n.neighborhood = row.summary",
+        rows=rows
+    )
+
+def _group_batches(kind, keyed_rows, batch_size):
+    """
+    Buffer (group, row) pairs per group and yield (key, group, rows) whenever a
+    group reaches batch_size, then the remainders. Keys are deterministic for a
+    given file, so a checkpoint can name them.
+    """
+    buffers = defaultdict(list)
+    counts = defaultdict(int)
+    for group, row in keyed_rows:
+        buffers[group].append(row)
+        if len(buffers[group]) >= batch_size:
+            yield f"{kind}:{group}:{counts[group]}", group, buffers.pop(group)
+            counts[group] += 1
+    for group, rows in sorted(buffers.items()):
+        yield f"{kind}:{group}:{counts[group]}", group, rows
+
+def iter_node_batches(nodes, batch_size):
+    """Node upsert batches grouped by label, from any iterable of records."""
+    rows = (
+        (node.get("type", "Unknown"), {"id": node["id"], "props": node_props(node)})
+        for node in nodes
+    )
+    return _group_batches("nodes", rows, batch_size)
+
+def iter_rel_batches(nodes, batch_size):
+    """Relationship batches grouped by type, from any iterable of records."""
+    rows = (
+        (rel.get("relation", "RELATED_TO"), {"source": node["id"], "target": rel["target"]})
+        for node in nodes
+        for rel in node.get("connections", [])
+        if rel.get("target")
+    )
+    return _group_batches("rels", rows, batch_size)
+
+class Checkpoint:
+    """
+    Completed batch keys of one load phase ("bulk", "neighborhoods", ...) for one
+    dataset + batch size. All phases share one append-only JSON-lines file: a
+    phase header line ({"phase", "fingerprint"}) starts or restarts a phase, and
+    each finished batch appends one {"phase", "key"} line. Phases never reset
+    each other, so resuming after a failure in a later phase skips the earlier
+    ones. main() removes the file once every phase has finished.
+    """
+
+    def __init__(self, path, phase, fingerprint, resume):
+        self.path = path
+        self.phase = phase
+        self.fingerprint = fingerprint
+        self.done = set()
+        self._lock = threading.Lock()
+        saved = self._read() if resume else None
+        if saved is not None and saved[0] == fingerprint:
+            self.done = saved[1]
+        else:
+            if saved is not None and saved[0] is not None:
+                print(f"Checkpoint for {phase} is for a different dataset or batch size; starting over.")
+            self._append({"phase": phase, "fingerprint": fingerprint})
+
+    def _read(self):
+        """(fingerprint, done keys) of this phase's latest header, or None."""
+        if not os.path.exists(self.path):
+            return None
+        fingerprint, done = None, set()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by a crash
+                if entry.get("phase") != self.phase:
+                    continue
+                if "fingerprint" in entry:
+                    fingerprint, done = entry["fingerprint"], set()
+                elif "key" in entry:
+                    done.add(entry["key"])
+        return fingerprint, done
+
+    def _append(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def mark(self, key):
+        with self._lock:
+            self.done.add(key)
+            self._append({"phase": self.phase, "key": key})
+
+def run_phase(name, batches, write_fn, checkpoint, workers):
+    """
+    Write batches (any iterable, typically a stream) on `workers` parallel
+    sessions. At most 2x workers batches are held in memory at once, and writing
+    starts with the first batch. Returns rows written.
+    """
+    def write(batch):
+        key, group, rows = batch
+        # One session per task: sessions are not thread-safe, the driver's pool is
+        with driver.session() as session:
+            session.execute_write(write_fn, group, rows)
+        checkpoint.mark(key)
+        return len(rows)
+
+    total_rows = 0
+    skipped = 0
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool, tqdm(desc=name, unit="rows") as bar:
+        in_flight = set()
+
+        def drain(return_when):
+            nonlocal total_rows, in_flight
+            done, in_flight = wait(in_flight, return_when=return_when)
+            for future in done:
+                n = future.result()
+                total_rows += n
+                bar.update(n)
+
+        for batch in batches:
+            if batch[0] in checkpoint.done:
+                skipped += 1
+                continue
+            in_flight.add(pool.submit(write, batch))
+            if len(in_flight) >= 2 * workers:
+                drain(FIRST_COMPLETED)
+        if in_flight:
+            drain(ALL_COMPLETED)
+
+    if skipped:
+        print(f"{name}: skipped {skipped} batches already written")
+    elapsed = time.time() - start
+    rate = total_rows / elapsed if elapsed > 0 else 0.0
+    print(f"{name}: {total_rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return total_rows
+
+def bulk_load(path=DATA_FILE, batch_size=BULK_BATCH_SIZE, workers=BULK_WORKERS, resume=False,
+              checkpoint_path=CHECKPOINT_FILE):
+    """
+    Bulk load: parameterized UNWIND batches grouped by label / relationship type,
+    written on parallel sessions. The dataset is streamed twice (nodes, then
+    relationships) so memory stays flat and relationships only run once every
+    node exists. Every finished batch is checkpointed, so `resume=True`
+    continues after a failure (the checkpoint is kept for later phases; main()
+    removes it when the whole load is done).
+    """
+    checkpoint = Checkpoint(checkpoint_path, "bulk", f"{file_fingerprint(path)}:{batch_size}", resume)
 
+    with driver.session() as session:
+        session.execute_write(create_constraints)
+
+    stats = IngestStats()
+    run_phase("Creating nodes", iter_node_batches(iter_valid(iter_records(path), stats), batch_size),
+              upsert_node_batch, checkpoint, workers)
+    print(f"Ingested {stats}")
+    run_phase("Creating relationships", iter_rel_batches(iter_valid(iter_records(path)), batch_size),
+              create_relationship_batch, checkpoint, workers)
+
+def iter_neighborhood_batches(snapshot, batch_size):
+    """Precomputed neighborhood summaries (one JSON string per node) in batches."""
+    rows = (
+        ("all", {"id": node_id, "summary": encode_summary(snapshot.neighborhood_summary(node_id))})
+        for node_id in snapshot.ids
+    )
+    return _group_batches("neighborhoods", rows, batch_size)
+
+def write_neighborhoods(snapshot, path=DATA_FILE, batch_size=BULK_BATCH_SIZE, workers=BULK_WORKERS, resume=False,
+                        checkpoint_path=CHECKPOINT_FILE):
+    """
+    Post-load stage: store each node's top neighbors (by relationship weight,
+    with truncated descriptions and labels) as `n.neighborhood`, so
+    hybrid_chat.fetch_graph_context reads one precomputed row per id instead of
+    expanding the graph and shipping full descriptions. `path` is the dataset
+    the snapshot was built from; its content hash keys the checkpoint, so an
+    edited dataset never resumes from summaries of the old one.
+    """
+    checkpoint = Checkpoint(checkpoint_path, "neighborhoods", f"{file_fingerprint(path)}:{batch_size}", resume)
+    run_phase("Precomputing neighborhoods", iter_neighborhood_batches(snapshot, batch_size),
+              set_neighborhood_batch, checkpoint, workers)
+
+def clear_neighborhood_batch(tx, limit):
+    return tx.run(
+        "MATCH (n:Entity) WHERE n.neighborhood IS NOT NULL "
+        "WITH n LIMIT $limit REMOVE n.neighborhood RETURN count(n) AS removed",
+        limit=limit
+    ).single()["removed"]
+
+def clear_neighborhoods(batch_size=BULK_BATCH_SIZE):
+    """
+    Remove `n.neighborhood` from every node. A load without the neighborhood
+    stage calls this, so hybrid_chat never serves summaries of an older graph.
+    """
+    removed = 0
+    with driver.session() as session:
+        while True:
+            n = session.execute_write(clear_neighborhood_batch, batch_size)
+            if not n:
+                break
+            removed += n
+    if removed:
+        print(f"Removed {removed} stale neighborhood summaries")
+
+# -----------------------------
+# Main
+# -----------------------------
+def main(bulk=False, batch_size=BULK_BATCH_SIZE, workers=BULK_WORKERS, resume=False, neighborhoods=True):
+    if bulk:
+        bulk_load(DATA_FILE, batch_size=batch_size, workers=workers, resume=resume)
+    else:
+        load_row_by_row(DATA_FILE)
+
+    print("Done loading into Neo4j.")
+
+    # Refresh the in-memory snapshot served by hybrid_chat.fetch_graph_context
+    snapshot = GraphSnapshot.from_dataset(iter_valid(iter_records(DATA_FILE)))
+    if neighborhoods:
+        write_neighborhoods(snapshot, DATA_FILE, batch_size=batch_size, workers=workers, resume=resume)
+    else:
+        clear_neighborhoods(batch_size)
+    if os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)  # every phase finished
+    snapshot.save(GRAPH_SNAPSHOT_PATH)
+    print(f"Saved graph snapshot: {len(snapshot)} nodes, {snapshot.edge_count} relationships.")
+     # Properly close the driver to avoid shutdown warnings
+    driver.close()
+
+def load_row_by_row(path=DATA_FILE):
+    """Original loader: one transaction per node and per relationship (streams the file twice)."""
     with driver.session() as session:
         session.execute_write(create_constraints)
         # Upsert all nodes
-        for node in tqdm(nodes, desc="Creating nodes"):
+        for node in tqdm(iter_valid(iter_records(path)), desc="Creating nodes"):
             session.execute_write(upsert_node, node)
 
         # Create relationships
-        for node in tqdm(nodes, desc="Creating relationships"):
+        for node in tqdm(iter_valid(iter_records(path)), desc="Creating relationships"):
             conns = node.get("connections", [])
             for rel in conns:
                 session.execute_write(create_relationship, node["id"], rel)
 
-    print("Done loading into Neo4j.")
-     # Properly close the driver to avoid shutdown warnings
-    driver.close()
-
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Load the travel dataset into Neo4j.")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Batched UNWIND writes on parallel sessions instead of one transaction per row")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS)
+    parser.add_argument("--resume", action="store_true",
+                        help=f"Skip batches recorded in {CHECKPOINT_FILE} by an interrupted bulk load")
+    parser.add_argument("--no-neighborhoods", action="store_true",
+                        help="Skip the post-load stage that stores precomputed neighborhood summaries "
+                             "(existing summaries are removed)")
+    args = parser.parse_args()
+    main(bulk=args.bulk, batch_size=args.batch_size, workers=args.workers, resume=args.resume,
+         neighborhoods=not args.no_neighborhoods)
@@ -1,10 +1,15 @@
 # pinecone_upload.py
+import argparse
+import hashlib
 import json
+import os
 import time
 from tqdm import tqdm
-from openai import OpenAI
-from pinecone import Pinecone, ServerlessSpec
+import numpy as np
 import config
+from vector_store import LocalVectorIndex, LocalIndexWriter
+from ingest import IngestStats, batched, iter_records, iter_valid
+from lexical_index import build_lexical_index
 
 # -----------------------------
 # Config
@@ -13,55 +18,69 @@ DATA_FILE = "vietnam_travel_dataset.json"
 BATCH_SIZE = 32
 
 INDEX_NAME = config.PINECONE_INDEX_NAME
-VECTOR_DIM = config.PINECONE_VECTOR_DIM  # 1536 for text-embedding-3-small
+EMBED_MODEL = "text-embedding-3-small"
+EMBED_DIMENSIONS = getattr(config, "EMBED_DIMENSIONS", None)  # shortened text-embedding-3 output (None = full size)
+VECTOR_DIM = EMBED_DIMENSIONS or config.PINECONE_VECTOR_DIM  # 1536 for text-embedding-3-small
+LOCAL_INDEX_PATH = getattr(config, "LOCAL_INDEX_PATH", "vector_index")
+MANIFEST_FILE = ".vector_manifest.json"  # node id -> content hash last uploaded + the targets holding it
+TARGETS = {"pinecone": ("pinecone",), "local": ("local",), "both": ("local", "pinecone")}
+LEXICAL_INDEX_PATH = getattr(config, "LEXICAL_INDEX_PATH", "lexical_index")
 
 # -----------------------------
-# Initialize clients
+# Initialize clients (on first use: openai/pinecone take ~1.5s to import, a no-op --sync needs neither)
 # -----------------------------
-client = OpenAI(api_key=config.OPENAI_API_KEY)
-pc = Pinecone(api_key=config.PINECONE_API_KEY)
+client = None
+
+def openai_client():
+    global client
+    if client is None:
+        from openai import OpenAI
+        client = OpenAI(api_key=config.OPENAI_API_KEY)
+    return client
 
 # -----------------------------
 # Create managed index if it doesn't exist
 # -----------------------------
-existing_indexes = pc.list_indexes().names()
-if INDEX_NAME not in existing_indexes:
-    print(f"Creating managed index: {INDEX_NAME}")
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=VECTOR_DIM,
-        metric="cosine",
-        spec=ServerlessSpec(
-            cloud="aws",
-            region="us-east-1"
+def connect_index():
+    from pinecone import Pinecone, ServerlessSpec
+    pc = Pinecone(api_key=config.PINECONE_API_KEY)
+    existing_indexes = pc.list_indexes().names()
+    if INDEX_NAME not in existing_indexes:
+        print(f"Creating managed index: {INDEX_NAME}")
+        pc.create_index(
+            name=INDEX_NAME,
+            dimension=VECTOR_DIM,
+            metric="cosine",
+            spec=ServerlessSpec(
+                cloud="aws",
+                region="us-east-1"
+            )
         )
-    )
-else:
-    print(f"Index {INDEX_NAME} already exists.")
+    else:
+        print(f"Index {INDEX_NAME} already exists.")
+        dimension = pc.describe_index(INDEX_NAME).dimension
+        if dimension != VECTOR_DIM:
+            raise RuntimeError(f"Index {INDEX_NAME} has dimension {dimension} but embeddings have {VECTOR_DIM}; "
+                               f"delete it or use another PINECONE_INDEX_NAME")
 
-# Connect to the index
-index = pc.Index(INDEX_NAME)
+    # Connect to the index
+    return pc.Index(INDEX_NAME)
 
 # -----------------------------
 # Helper functions
 # -----------------------------
-def get_embeddings(texts, model="text-embedding-3-small"):
+def get_embeddings(texts, model=EMBED_MODEL):
     """Generate embeddings using OpenAI v1.0+ API."""
-    resp = client.embeddings.create(model=model, input=texts)
+    resp = openai_client().embeddings.create(
+        model=model, input=texts, **({"dimensions": EMBED_DIMENSIONS} if EMBED_DIMENSIONS else {})
+    )
     return [data.embedding for data in resp.data]
 
-def chunked(iterable, n):
-    for i in range(0, len(iterable), n):
-        yield iterable[i:i+n]
+# Kept for callers that chunk a list; ingest.batched works on any iterable
+chunked = batched
 
-# -----------------------------
-# Main upload
-# -----------------------------
-def main():
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        nodes = json.load(f)
-
-    items = []
+def iter_items(nodes):
+    """Yield (id, semantic_text, metadata) for every node with embeddable text."""
     for node in nodes:
         semantic_text = node.get("semantic_text") or (node.get("description") or "")[:1000]
         if not semantic_text.strip():
@@ -73,27 +92,262 @@ def main():
             "city": node.get("city", node.get("region", "")),
             "tags": node.get("tags", [])
         }
-        items.append((node["id"], semantic_text, meta))
+        yield (node["id"], semantic_text, meta)
+
+def stream_items(stats=None):
+    """Validated items streamed from DATA_FILE (JSON array or JSONL)."""
+    return iter_items(iter_valid(iter_records(DATA_FILE), stats))
+
+def content_hash(item):
+    """Hash of the embedded text plus metadata; changes whenever the stored vector would."""
+    _id, text, meta = item
+    payload = json.dumps({"text": text, "meta": meta}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
-    print(f"Preparing to upsert {len(items)} items to Pinecone...")
+def embedding_fingerprint():
+    """What the stored vectors were embedded with; any change invalidates every vector."""
+    return {"model": EMBED_MODEL, "dimensions": VECTOR_DIM}
 
-    for batch in tqdm(list(chunked(items, BATCH_SIZE)), desc="Uploading batches"):
+def load_manifest(path):
+    """
+    {"embedding": fingerprint, "nodes": {node id: {"hash", "targets"}}}. Falls back to the older one-file-per-target
+    manifests (node id -> hash) next to `path`, so upgrading does not re-embed anything.
+    """
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    # Manifests from before the fingerprint was recorded were always full-size embeddings
+    manifest = {"embedding": {"model": EMBED_MODEL, "dimensions": config.PINECONE_VECTOR_DIM}, "nodes": {}}
+    stem, ext = os.path.splitext(path)
+    for target in TARGETS:
+        legacy = f"{stem}.{target}{ext}"
+        if not os.path.exists(legacy):
+            continue
+        with open(legacy, "r", encoding="utf-8") as f:
+            for node_id, digest in json.load(f).items():
+                record = manifest["nodes"].setdefault(node_id, {"hash": digest, "targets": []})
+                if record["hash"] == digest:
+                    record["targets"] = sorted(set(record["targets"]) | set(TARGETS[target]))
+    return manifest
+
+def save_manifest(path, manifest):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(tmp, path)
+
+def mark_uploaded(manifest, item, targets):
+    """Record that `targets` now hold the current version of `item`."""
+    digest = content_hash(item)
+    record = manifest["nodes"].get(item[0])
+    if record is None or record["hash"] != digest:
+        # Targets holding the old version are stale now; they re-embed on their next sync
+        manifest["nodes"][item[0]] = {"hash": digest, "targets": sorted(targets)}
+    else:
+        record["targets"] = sorted(set(record["targets"]) | set(targets))
+
+def mark_removed(manifest, node_id, targets):
+    """Record that `targets` no longer hold `node_id`; forget it once no target does."""
+    record = manifest["nodes"].get(node_id)
+    if record is None:
+        return
+    remaining = sorted(set(record["targets"]) - set(targets))
+    if remaining:
+        record["targets"] = remaining
+    else:
+        del manifest["nodes"][node_id]
+
+def check_fingerprint(manifest, local_path=None):
+    """
+    Mark every node as needing re-embedding if the embedding model / dimensions
+    changed since the manifest was written (or the local index has another
+    dimension). Returns True when that happened.
+    """
+    recorded = manifest.get("embedding", {"model": EMBED_MODEL, "dimensions": config.PINECONE_VECTOR_DIM})
+    local_dim = None
+    if local_path and os.path.exists(f"{local_path}.npy"):
+        local_dim = np.load(f"{local_path}.npy", mmap_mode="r").shape[1]
+    manifest["embedding"] = embedding_fingerprint()
+    if recorded == manifest["embedding"] and local_dim in (None, VECTOR_DIM):
+        return False
+    if recorded != manifest["embedding"]:
+        reason = f"{recorded['model']}/{recorded['dimensions']}d -> {EMBED_MODEL}/{VECTOR_DIM}d"
+    else:
+        reason = f"local index has {local_dim}d vectors, embeddings have {VECTOR_DIM}d"
+    print(f"Embedding settings changed ({reason}): every node will be re-embedded")
+    for record in manifest["nodes"].values():
+        record["hash"] = None
+    return True
+
+def plan_sync(items, manifest, target="pinecone"):
+    """
+    Split items against the manifest into added / changed (item lists),
+    removed (ids) and unchanged (count), as seen from `target`: a node is
+    unchanged only if every store of the target holds its current hash.
+    """
+    targets = set(TARGETS[target])
+    nodes = manifest["nodes"]
+    plan = {"added": [], "changed": [], "removed": [], "unchanged": 0}
+    current = set()
+    for item in items:
+        current.add(item[0])
+        record = nodes.get(item[0])
+        if record is None or not targets & set(record["targets"]):
+            plan["added"].append(item)
+        elif record["hash"] != content_hash(item) or not targets <= set(record["targets"]):
+            plan["changed"].append(item)
+        else:
+            plan["unchanged"] += 1
+    plan["removed"] = sorted(
+        node_id for node_id, record in nodes.items()
+        if node_id not in current and targets & set(record["targets"])
+    )
+    return plan
+
+def embed_and_write(items, index=None, local_writer=None, on_batch=None):
+    """
+    Embed items in batches and write each batch to Pinecone and/or the local index
+    writer as soon as it is embedded. `items` may be any iterable (e.g. a stream).
+    """
+    for batch in tqdm(batched(items, BATCH_SIZE), desc="Uploading batches", unit="batch"):
         ids = [item[0] for item in batch]
         texts = [item[1] for item in batch]
         metas = [item[2] for item in batch]
 
-        embeddings = get_embeddings(texts, model="text-embedding-3-small")
+        embeddings = get_embeddings(texts, model=EMBED_MODEL)
+
+        if local_writer is not None:
+            local_writer.add(ids, embeddings, metas)
 
-        vectors = [
-            {"id": _id, "values": emb, "metadata": meta}
-            for _id, emb, meta in zip(ids, embeddings, metas)
-        ]
+        if index is not None:
+            vectors = [
+                {"id": _id, "values": emb, "metadata": meta}
+                for _id, emb, meta in zip(ids, embeddings, metas)
+            ]
+            index.upsert(vectors)
+            time.sleep(0.2)
 
-        index.upsert(vectors)
-        time.sleep(0.2)
+        if on_batch is not None:
+            on_batch(batch, embeddings)
 
+# -----------------------------
+# Main upload
+# -----------------------------
+def lexical_index_stale():
+    """True when the BM25 index is missing or older than the dataset."""
+    path = f"{LEXICAL_INDEX_PATH}.npz"
+    return not os.path.exists(path) or os.path.getmtime(DATA_FILE) > os.path.getmtime(path)
+
+def write_lexical_index():
+    """Rebuild the BM25 index hybrid_chat loads next to the vectors (no API calls, well under a second)."""
+    lexical = build_lexical_index(DATA_FILE, LEXICAL_INDEX_PATH)
+    print(f"Wrote lexical index ({len(lexical)} documents, {len(lexical.terms)} terms) to {LEXICAL_INDEX_PATH}.npz/.json")
+
+def main(target="pinecone", local_path=LOCAL_INDEX_PATH):
+    """
+    Embed the dataset and write it to Pinecone, a local index file, or both.
+    target: "pinecone" | "local" | "both"
+    """
+    index = connect_index() if target in ("pinecone", "both") else None
+    local_writer = LocalIndexWriter(local_path, VECTOR_DIM) if target in ("local", "both") else None
+
+    # A full upload is a valid baseline for later incremental syncs of this target
+    targets = TARGETS[target]
+    manifest_path = MANIFEST_FILE
+    manifest = load_manifest(manifest_path)
+    # New model / dimension count: other targets' vectors are stale too (this target is rewritten below)
+    check_fingerprint(manifest)
+    for node_id in list(manifest["nodes"]):
+        mark_removed(manifest, node_id, targets)
+
+    def record(batch, embeddings):
+        for item in batch:
+            mark_uploaded(manifest, item, targets)
+
+    stats = IngestStats()
+    print(f"Streaming {DATA_FILE} into embeddings (target: {target})...")
+    embed_and_write(stream_items(stats), index=index, local_writer=local_writer, on_batch=record)
+    print(f"Ingested {stats}")
+
+    if local_writer is not None:
+        count = local_writer.close()
+        print(f"Wrote local vector index ({count} vectors) to {local_path}.npy/.json")
+
+    save_manifest(manifest_path, manifest)
+    write_lexical_index()
     print("All items uploaded successfully.")
 
+def sync(target="pinecone", local_path=LOCAL_INDEX_PATH, dry_run=False):
+    """
+    Incremental sync: embed and upsert only nodes whose text/metadata hash differs
+    from the manifest, delete vectors for nodes no longer in the dataset.
+    """
+    targets = TARGETS[target]
+    manifest_path = MANIFEST_FILE
+    manifest = load_manifest(manifest_path)
+    # New model / dimension count: re-embed everything, and rebuild the local index instead of mixing sizes
+    reembed = check_fingerprint(manifest, local_path if target in ("local", "both") else None)
+    # One streaming pass: only added/changed items are held in memory
+    plan = plan_sync(stream_items(), manifest, target)
+
+    print(f"Sync plan ({target}): {len(plan['added'])} added, {len(plan['changed'])} changed, "
+          f"{len(plan['removed'])} removed, {plan['unchanged']} unchanged")
+    to_write = plan["added"] + plan["changed"]
+    # Rewriting the lexical index clears running processes' answer caches, so only when it is out of date
+    if not dry_run and (to_write or plan["removed"] or lexical_index_stale()):
+        write_lexical_index()
+    if dry_run or (not to_write and not plan["removed"]):
+        print("Nothing to do." if not dry_run else "Dry run: no changes written.")
+        return plan
+
+    # Only connect (network) when there is work to do
+    index = connect_index() if target in ("pinecone", "both") else None
+    local_items = [] if target in ("local", "both") else None
+
+    def record(batch, embeddings):
+        if local_items is not None:
+            local_items.extend((item[0], emb, item[2]) for item, emb in zip(batch, embeddings))
+        # Persist progress per batch so an interrupted sync does not redo finished work
+        for item in batch:
+            mark_uploaded(manifest, item, targets)
+        save_manifest(manifest_path, manifest)
+
+    if to_write:
+        embed_and_write(to_write, index=index, on_batch=record)
+
+    if plan["removed"]:
+        if index is not None:
+            for batch in chunked(plan["removed"], 1000):
+                index.delete(ids=batch)
+        for node_id in plan["removed"]:
+            mark_removed(manifest, node_id, targets)
+        save_manifest(manifest_path, manifest)
+
+    if local_items is not None:
+        if os.path.exists(f"{local_path}.npy") and not reembed:
+            local_index = LocalVectorIndex.load(local_path, mmap=False)
+        else:
+            local_index = LocalVectorIndex.from_items([], dim=VECTOR_DIM)
+        local_index = local_index.upsert(local_items).delete(plan["removed"])
+        local_index.save(local_path)
+        print(f"Updated local vector index ({len(local_index)} vectors) at {local_path}.npy/.json")
+
+    print("Sync complete.")
+    return plan
+
 # -----------------------------
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Embed the travel dataset into a vector index.")
+    parser.add_argument("--target", choices=["pinecone", "local", "both"],
+                        default=getattr(config, "VECTOR_BACKEND", "pinecone"),
+                        help="Where to write vectors (default: config.VECTOR_BACKEND)")
+    parser.add_argument("--local-path", default=LOCAL_INDEX_PATH,
+                        help="File prefix for the local index (.npy + .json)")
+    parser.add_argument("--sync", action="store_true",
+                        help="Only embed/upsert new or changed nodes and delete removed ones")
+    parser.add_argument("--dry-run", action="store_true", help="With --sync: print the plan only")
+    args = parser.parse_args()
+    if args.sync:
+        sync(target=args.target, local_path=args.local_path, dry_run=args.dry_run)
+    else:
+        main(target=args.target, local_path=args.local_path)
@@ -0,0 +1,106 @@
+# pipeline.py
+import asyncio
+import time
+from typing import Awaitable, Callable, ContextManager, Dict, Iterable, List, Optional
+
+# -----------------------------
+# Dependency-graph stage scheduler
+# -----------------------------
+class StageGraph:
+    """
+    Run async stages as soon as their inputs are ready.
+
+    Each stage is `async fn(**deps)` where the keyword arguments are the results
+    of the stages it depends on. Independent stages run concurrently on the
+    current event loop. Start/end offsets are recorded per stage so the critical
+    path of a run can be reported.
+
+        graph = StageGraph()
+        graph.add("embedding", lambda: embed_text(q))
+        graph.add("vector", lambda embedding: search(embedding), deps=["embedding"])
+        results = await graph.run()
+
+    `span`, if given, is called with each stage name and the stage runs inside
+    the returned context manager (e.g. telemetry.Telemetry.span).
+    """
+
+    def __init__(self, span: Optional[Callable[[str], ContextManager]] = None):
+        self._span = span
+        self._stages: Dict[str, tuple] = {}  # name -> (fn, deps)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._t0: Optional[float] = None
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def add(self, name: str, fn: Callable[..., Awaitable], deps: Iterable[str] = ()):
+        deps = list(deps)
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (fn, deps)
+        return self
+
+    async def _run_stage(self, name: str):
+        fn, deps = self._stages[name]
+        inputs = {dep: await self._tasks[dep] for dep in deps}
+        start = time.perf_counter()
+        try:
+            if self._span is None:
+                return await fn(**inputs)
+            with self._span(name):
+                return await fn(**inputs)
+        finally:
+            end = time.perf_counter()
+            self.timings[name] = {
+                "start": start - self._t0,
+                "end": end - self._t0,
+                "duration": end - start
+            }
+
+    def start(self):
+        """Schedule every stage; returns immediately."""
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+            for name in self._stages:
+                self._tasks[name] = asyncio.ensure_future(self._run_stage(name))
+        return self
+
+    async def result(self, name: str):
+        """Await one stage (starting the graph if needed)."""
+        self.start()
+        return await self._tasks[name]
+
+    async def run(self) -> Dict[str, object]:
+        """Run all stages to completion and return {name: result}."""
+        self.start()
+        values = await asyncio.gather(*self._tasks.values())
+        return dict(zip(self._tasks.keys(), values))
+
+    def cancel(self):
+        """Cancel stages that have not finished (e.g. after a cache hit)."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+    def critical_path(self, sink: Optional[str] = None) -> List[str]:
+        """
+        Chain of stages that determined when `sink` (default: the last stage to
+        finish) completed: walk back through the dependency that finished last.
+        """
+        finished = {name: t for name, t in self.timings.items()}
+        if not finished:
+            return []
+        node = sink if sink in finished else max(finished, key=lambda n: finished[n]["end"])
+        path = [node]
+        while True:
+            deps = [d for d in self._stages[node][1] if d in finished]
+            if not deps:
+                break
+            node = max(deps, key=lambda d: finished[d]["end"])
+            path.append(node)
+        return list(reversed(path))
+
+    def report(self, ndigits: int = 3) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {key: round(value, ndigits) for key, value in t.items()}
+            for name, t in sorted(self.timings.items(), key=lambda item: item[1]["start"])
+        }
@@ -0,0 +1,193 @@
+# prompt_packer.py
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional: token counts fall back to a character estimate
+    tiktoken = None
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4  # estimate used when no tokenizer is available
+MESSAGE_OVERHEAD_TOKENS = 4  # role / framing tokens the API adds per chat message
+COUNT_CACHE_SIZE = 8192  # distinct texts (entity blocks, system prompt) whose counts are memoized
+MAX_CONNECTIONS = 3  # relationships listed per entity
+
+
+# -----------------------------
+# Token counting
+# -----------------------------
+def _load_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception:
+        return None  # encoding files not cached and no network
+    try:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception:
+        return None
+
+
+class TokenCounter:
+    """
+    Token counts with the model's tiktoken encoding, or ~4 characters per token
+    when tiktoken (or its encoding file) is unavailable; `exact` tells which.
+    Counts are memoized per distinct text.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, cache_size: int = COUNT_CACHE_SIZE):
+        self.model = model
+        self.encoding = _load_encoding(model)
+        self.exact = self.encoding is not None
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """`text` cut to at most `max_tokens` tokens (at a word boundary when estimating), with an ellipsis if cut."""
+        if max_tokens <= 0 or not text:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            return self.encoding.decode(self.encoding.encode(text)[:max_tokens - 1]).rstrip() + "…"
+        cut = text[:(max_tokens - 1) * CHARS_PER_TOKEN]
+        head, _, _ = cut.rpartition(" ")
+        return (head or cut).rstrip() + "…"
+
+    def messages(self, messages: List[Dict]) -> int:
+        return sum(self.count(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+# -----------------------------
+# Context packing
+# -----------------------------
+class PromptPacker:
+    """
+    Builds [system, user] chat messages under an input-token budget.
+
+    - The system message (`system` text, including all static instructions) is
+      the same bytes on every call, so provider-side prompt caching can reuse it.
+    - Vector matches and graph facts are merged into one entry per entity id:
+      a target reached from several sources is listed once with its connections.
+    - Entities are added best first (fused score, then retrieval order) while
+      they fit the budget; descriptions are cut by tokens, not characters.
+    - The user message is the packed context, then intent, then the query last.
+      Raw retriever scores are not shown (vector and BM25 scales differ); the
+      order of the context carries relevance.
+    """
+
+    def __init__(self, system: str, budget: int, description_tokens: int = 60,
+                 counter: Optional[TokenCounter] = None):
+        self.system = system
+        self.budget = budget
+        self.description_tokens = description_tokens
+        self.counter = counter or TokenCounter()
+
+    @staticmethod
+    def entities(matches: List[Dict], graph_facts: List[Dict]) -> Tuple[List[Dict], int]:
+        """One entry per entity id in first-seen order (vector matches first); returns (entities, duplicates merged)."""
+        by_id: Dict[str, Dict] = {}
+        duplicates = 0
+        for m in matches:
+            meta = m.get("metadata") or {}
+            node_id = m.get("id") or meta.get("id")
+            if not node_id:
+                continue
+            if node_id in by_id:
+                duplicates += 1
+                continue
+            by_id[node_id] = {
+                "id": node_id, "name": meta.get("name"), "type": meta.get("type"),
+                "city": meta.get("city"), "tags": meta.get("tags") or [],
+                "description": "", "connections": []
+            }
+        for f in graph_facts:
+            node_id = f.get("target_id")
+            if not node_id:
+                continue
+            entity = by_id.get(node_id)
+            if entity is None:
+                labels = f.get("labels") or []
+                entity = by_id[node_id] = {
+                    "id": node_id, "name": f.get("target_name"), "type": labels[0] if labels else None,
+                    "city": None, "tags": [], "description": "", "connections": []
+                }
+            else:
+                duplicates += 1
+            if not entity["description"] and f.get("target_desc"):
+                entity["description"] = f["target_desc"]
+            connection = f"{f.get('rel')} from {f.get('source')}"
+            if connection not in entity["connections"]:
+                entity["connections"].append(connection)
+        return list(by_id.values()), duplicates
+
+    def render(self, entity: Dict) -> str:
+        header = f"- {entity.get('name') or 'Unknown'} ({entity['id']})"
+        details = [d for d in (entity.get("type"), entity.get("city")) if d]
+        if details:
+            header += f" [{', '.join(details)}]"
+        lines = [header]
+        tags = entity.get("tags")
+        if tags:
+            lines.append(f"  Tags: {', '.join(tags) if isinstance(tags, list) else tags}")
+        if entity["connections"]:
+            lines.append(f"  Connections: {'; '.join(entity['connections'][:MAX_CONNECTIONS])}")
+        if entity["description"]:
+            lines.append(f"  Description: {self.counter.truncate(entity['description'], self.description_tokens)}")
+        return "\n".join(lines)
+
+    def pack(self, query: str, matches: List[Dict], graph_facts: List[Dict], intent: Optional[Dict] = None,
+             scores: Optional[Dict[str, float]] = None) -> Tuple[List[Dict], Dict]:
+        """Returns (messages, stats) with stats = prompt_tokens, entities, dropped, duplicates, exact."""
+        entities, duplicates = self.entities(matches, graph_facts)
+        if scores:
+            # Fused score first; entities outside the fused list keep retrieval order after them
+            order = {e["id"]: i for i, e in enumerate(entities)}
+            entities.sort(key=lambda e: (-scores.get(e["id"], float("-inf")), order[e["id"]]))
+
+        tail = ""
+        if intent:
+            if intent.get("style"):
+                tail += f"Detected travel style: {intent['style']}\n"
+            if intent.get("duration"):
+                tail += f"Trip duration: {intent['duration']} days\n"
+        tail += f'User Query: "{query}"'
+
+        count = self.counter.count
+        header = "CONTEXT (most relevant first):\n"
+        remaining = self.budget - (count(self.system) + count(header) + count(tail) + 2 * MESSAGE_OVERHEAD_TOKENS)
+
+        blocks, dropped = [], 0
+        for entity in entities:
+            block = self.render(entity)
+            cost = count(block) + 1  # + newline separator
+            if cost <= remaining:
+                blocks.append(block)
+                remaining -= cost
+            else:
+                dropped += 1
+
+        context = "\n".join(blocks) if blocks else "No retrieved context available."
+        messages = [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": f"{header}{context}\n\n{tail}"}
+        ]
+        stats = {
+            "prompt_tokens": self.counter.messages(messages),
+            "entities": len(blocks),
+            "dropped": dropped,
+            "duplicates": duplicates,
+            "exact": self.counter.exact
+        }
+        return messages, stats
@@ -0,0 +1,304 @@
+# resilience.py
+import asyncio
+import contextvars
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The query (or stage) budget ran out before the call could be made or retried."""
+
+
+class CircuitOpenError(Exception):
+    """The dependency's circuit breaker is open; the call was not attempted."""
+
+
+# -----------------------------
+# Per-query deadline
+# -----------------------------
+class Deadline:
+    """
+    Time budget for one query, split across stages.
+
+    Each operation ("vector", "graph", "chat", ...) may use at most
+    `shares[op] * budget` seconds counted from its first call in this query,
+    and never more than what is left of the whole budget. Entered with `with`,
+    the deadline is visible to every call made from the same task and the tasks
+    it spawns (contextvars), so stages need no extra arguments.
+    """
+
+    def __init__(self, budget: float, shares: Optional[Dict[str, float]] = None):
+        self.budget = budget
+        self.shares = dict(shares or {})
+        self.start = time.monotonic()
+        self._stage_start: Dict[str, float] = {}
+        self._token = None
+        self.failed = set()  # operations that gave up (error, open circuit, out of time)
+        self.counts = {"retries": 0, "hedges": 0, "timeouts": 0, "short_circuits": 0}
+
+    def remaining(self) -> float:
+        return max(0.0, self.budget - (time.monotonic() - self.start))
+
+    def stage_remaining(self, operation: str) -> float:
+        now = time.monotonic()
+        stage_start = self._stage_start.setdefault(operation, now)
+        stage_budget = self.budget * self.shares.get(operation, 1.0)
+        return max(0.0, min(self.remaining(), stage_budget - (now - stage_start)))
+
+    def __enter__(self):
+        self._token = _current_deadline.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_deadline.reset(self._token)
+        return False
+
+    def report(self) -> Dict:
+        return {
+            "budget": self.budget,
+            "remaining": round(self.remaining(), 3),
+            "failed": sorted(self.failed),
+            **self.counts
+        }
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+# -----------------------------
+# Building blocks
+# -----------------------------
+class LatencyTracker:
+    """Recent successful-call latencies; quantiles are recomputed every `refresh` observations."""
+
+    def __init__(self, window: int = 256, min_samples: int = 20, refresh: int = 16):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.refresh = refresh
+        self._sorted = []
+        self._since_sort = 0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self._since_sort += 1
+        if self._since_sort >= self.refresh or len(self._sorted) < self.min_samples:
+            self._sorted = sorted(self.samples)
+            self._since_sort = 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """None until `min_samples` latencies have been seen."""
+        if len(self._sorted) < self.min_samples:
+            return None
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a fraction of requests: each request adds
+    `ratio` tokens (up to `max_tokens`), each retry spends one. A dependency
+    that fails every call therefore sees ~(1 + ratio) x its normal load, not 3x.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker. After `failure_threshold` failures in a row it
+    opens and calls fail fast for `reset_timeout` seconds; then it is half-open
+    and lets a single probe call through (success closes it, failure re-opens
+    it). Other callers keep failing fast while the probe runs; a probe that
+    never reports back frees the slot after another `reset_timeout`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state != self.HALF_OPEN:
+            return state == self.CLOSED
+        now = time.monotonic()
+        if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+            return False
+        self.probe_started = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_started = None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opens += 1
+            self.opened_at = time.monotonic()
+
+
+# -----------------------------
+# Policy: retries + hedging + breaker for one dependency
+# -----------------------------
+class ResiliencePolicy:
+    """
+    How calls to one dependency are made:
+
+    - every attempt is bounded by `timeout` and by the current Deadline's
+      remaining budget for this operation
+    - failed attempts are retried (at most `max_attempts` in total) after a
+      jittered exponential backoff, if the RetryBudget and the deadline allow;
+      with `retry_timeouts=False` an attempt that timed out is not retried
+      (non-streaming generation: a slow answer would just be paid for twice)
+    - with `hedge=True`, once `hedge_quantile` of recent latencies is known, an
+      attempt still running after that long gets a duplicate request; the first
+      success wins and the other is cancelled (at most `hedge_ratio` of calls)
+    - the CircuitBreaker fails calls fast (CircuitOpenError) while open
+
+    `on_event(event, operation)` is called for retries, hedges, timeouts,
+    short_circuits and deadline_exceeded (e.g. to count them in telemetry).
+    """
+
+    def __init__(self, name: str, max_attempts: int = 3, timeout: float = 10.0, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_ratio: float = 0.1, base_delay: float = 0.1,
+                 max_delay: float = 1.0, breaker: Optional[CircuitBreaker] = None,
+                 retry_budget: Optional[RetryBudget] = None,
+                 on_event: Optional[Callable[[str, str], None]] = None):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_ratio = hedge_ratio
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker(name)
+        self.retry_budget = retry_budget or RetryBudget()
+        self.latency = LatencyTracker()
+        self.on_event = on_event
+        self.calls = 0
+        self.hedges = 0
+
+    def _event(self, event: str, deadline: Optional[Deadline] = None):
+        if deadline is not None and event in deadline.counts:
+            deadline.counts[event] += 1
+        if self.on_event is not None:
+            self.on_event(event, self.name)
+
+    def _time_left(self, deadline: Optional[Deadline]) -> float:
+        if deadline is None:
+            return self.timeout
+        return min(self.timeout, deadline.stage_remaining(self.name))
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff: uniform in [0, min(max_delay, base * 2^attempt)]."""
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _attempt(self, attempt_fn: Callable[[int], Awaitable], attempt: int, timeout: float,
+                       deadline: Optional[Deadline]):
+        delay = self.latency.quantile(self.hedge_quantile) if self.hedge else None
+        if delay is None or delay >= timeout or self.hedges >= self.hedge_ratio * self.calls:
+            return await asyncio.wait_for(attempt_fn(attempt), timeout)
+
+        primary = asyncio.ensure_future(attempt_fn(attempt))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        self._event("hedges", deadline)
+        pending = {primary, asyncio.ensure_future(attempt_fn(attempt))}
+        ends_at = time.monotonic() + (timeout - delay)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, ends_at - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, attempt_fn: Callable[[int], Awaitable], max_attempts: Optional[int] = None,
+                   retry_timeouts: bool = True):
+        """Run `attempt_fn(attempt_number)` under this policy; raises the last error when it gives up."""
+        deadline = current_deadline()
+        if not self.breaker.allow():
+            self._event("short_circuits", deadline)
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        self.calls += 1
+        self.retry_budget.deposit()
+        attempts = max_attempts or self.max_attempts
+        last_error: Optional[BaseException] = None
+        for attempt in range(attempts):
+            timeout = self._time_left(deadline)
+            if timeout <= 0:
+                self._event("deadline_exceeded", deadline)
+                raise last_error or DeadlineExceeded(f"No time left for {self.name}")
+
+            start = time.monotonic()
+            try:
+                result = await self._attempt(attempt_fn, attempt, timeout, deadline)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                last_error = e
+                self.breaker.record_failure()
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                if timed_out:
+                    self._event("timeouts", deadline)
+                if attempt == attempts - 1 or (timed_out and not retry_timeouts) or not self.breaker.allow():
+                    break
+                delay = self.backoff(attempt)
+                if delay >= self._time_left(deadline) or not self.retry_budget.withdraw():
+                    break
+                self._event("retries", deadline)
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.latency.observe(time.monotonic() - start)
+            return result
+
+        raise last_error
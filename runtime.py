@@ -0,0 +1,128 @@
+# runtime.py
+import asyncio
+import inspect
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+_MISSING = object()
+
+
+# -----------------------------
+# Lazily created process resources
+# -----------------------------
+class Runtime:
+    """
+    Registry of the clients and indexes a module needs, created on first use.
+
+    Each resource has a `factory` (sync, may do network or file I/O), an optional
+    `close(resource)` and an optional `warm(resource)` (e.g. open a pooled
+    connection). Nothing is created at registration, so importing the module that
+    registers them costs no connect time:
+
+        runtime.register("driver", make_driver, close=lambda d: d.close())
+        runtime.driver                  # created here, on first access
+        await runtime.startup(warm=True)  # or up front, concurrently, + warm-up
+        await runtime.shutdown()
+
+    `override(**resources)` installs ready-made objects (tests, benchmarks) in
+    place of the factories. `stats()` reports how long import, startup, each
+    connect and each warm-up took.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._closers: Dict[str, Callable[[Any], Any]] = {}
+        self._warmers: Dict[str, Callable[[Any], Awaitable]] = {}
+        self._resources: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.connect_seconds: Dict[str, float] = {}
+        self.warm_seconds: Dict[str, float] = {}
+        self.import_seconds: Optional[float] = None
+        self.startup_seconds: Optional[float] = None
+        self.started = False
+
+    def register(self, name: str, factory: Callable[[], Any], close: Optional[Callable[[Any], Any]] = None,
+                 warm: Optional[Callable[[Any], Awaitable]] = None):
+        self._factories[name] = factory
+        if close is not None:
+            self._closers[name] = close
+        if warm is not None:
+            self._warmers[name] = warm
+
+    def __getattr__(self, name: str):
+        # Only called for names that are not regular attributes
+        factories = self.__dict__.get("_factories", {})
+        if name not in factories:
+            raise AttributeError(name)
+        return self.get(name)
+
+    def get(self, name: str):
+        resource = self._resources.get(name, _MISSING)
+        if resource is not _MISSING:
+            return resource
+        with self._lock:
+            resource = self._resources.get(name, _MISSING)
+            if resource is _MISSING:
+                start = time.perf_counter()
+                resource = self._factories[name]()
+                self.connect_seconds[name] = round(time.perf_counter() - start, 4)
+                self._resources[name] = resource
+        return resource
+
+    def loaded(self, name: str) -> bool:
+        return name in self._resources
+
+    def override(self, **resources):
+        """Use these objects instead of calling the factories (closed by shutdown like the real ones)."""
+        with self._lock:
+            self._resources.update(resources)
+
+    # ---- lifecycle ----
+    async def startup(self, warm: bool = False, names: Optional[list] = None):
+        """Create every (or the named) resource concurrently off the event loop, then optionally warm them."""
+        start = time.perf_counter()
+        names = [n for n in (names or self._factories) if n in self._factories]
+        await asyncio.gather(*(asyncio.to_thread(self.get, n) for n in names if not self.loaded(n)))
+        if warm:
+            await self.warm_up(names)
+        self.startup_seconds = round(time.perf_counter() - start, 4)
+        self.started = True
+
+    async def warm_up(self, names: Optional[list] = None):
+        """Run the warm hooks of created resources concurrently; a failed warm-up is reported, not raised."""
+        async def warm_one(name):
+            start = time.perf_counter()
+            try:
+                await self._warmers[name](self._resources[name])
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e}")
+            self.warm_seconds[name] = round(time.perf_counter() - start, 4)
+
+        names = names or list(self._factories)
+        await asyncio.gather(*(warm_one(n) for n in names if n in self._warmers and self.loaded(n)))
+
+    async def shutdown(self):
+        """Close created resources in reverse creation order; the next access creates them again."""
+        with self._lock:
+            resources, self._resources = self._resources, {}
+            self.started = False
+        for name, resource in reversed(list(resources.items())):
+            close = self._closers.get(name)
+            if close is None or resource is None:
+                continue
+            try:
+                result = close(resource)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Closing {name} failed: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "import_seconds": self.import_seconds,
+            "startup_seconds": self.startup_seconds,
+            "loaded": sorted(self._resources),
+            "connect_seconds": dict(self.connect_seconds),
+            "warm_seconds": dict(self.warm_seconds)
+        }
@@ -0,0 +1,235 @@
+# server.py
+import argparse
+import asyncio
+import json
+from typing import Optional
+
+from aiohttp import web
+
+import config
+import hybrid_chat
+
+# -----------------------------
+# Config
+# -----------------------------
+MAX_IN_FLIGHT = getattr(config, "SERVER_MAX_IN_FLIGHT", 64)     # queries running retrieval/generation
+MAX_QUEUE = getattr(config, "SERVER_MAX_QUEUE", 256)             # queries allowed to wait for a slot
+QUEUE_TIMEOUT = getattr(config, "SERVER_QUEUE_TIMEOUT", 2.0)     # seconds a query may wait before 429
+
+# -----------------------------
+# Admission control
+# -----------------------------
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted (queue full or wait timed out)."""
+
+
+class AdmissionController:
+    """
+    Cap concurrent in-flight queries at `max_in_flight`. Up to `max_queue`
+    further requests may wait (at most `queue_timeout` seconds) for a slot;
+    anything beyond that is shed immediately so latency stays bounded.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, max_queue: int = MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded("queue full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise Overloaded("queue wait timed out")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue
+        }
+
+
+# -----------------------------
+# Handlers
+# -----------------------------
+def sse_event(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def match_summary(matches):
+    return [
+        {"id": m["id"], "score": m.get("score"), "name": (m.get("metadata") or {}).get("name")}
+        for m in matches
+    ]
+
+
+async def handle_chat(request: web.Request) -> web.StreamResponse:
+    """
+    POST /chat {"query": "...", "stream": true}
+
+    stream=true  -> text/event-stream: `token` events, then one `done` event
+                    carrying the timing block (plus `generation` time).
+    stream=false -> JSON {"answer", "matches", "graph_facts_count", "timing"}.
+    """
+    try:
+        body = await request.json()
+    except Exception:
+        raise web.HTTPBadRequest(text="Expected a JSON body")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Expected a JSON object")
+    query = body.get("query")
+    if query is not None and not isinstance(query, str):
+        raise web.HTTPBadRequest(text="'query' must be a string")
+    query = (query or "").strip()
+    if not query:
+        raise web.HTTPBadRequest(text="Missing 'query'")
+    stream = body.get("stream", True)
+    if not isinstance(stream, bool):
+        raise web.HTTPBadRequest(text="'stream' must be a boolean")
+
+    admission: AdmissionController = request.app["admission"]
+    try:
+        await admission.acquire()
+    except Overloaded as e:
+        return web.json_response(
+            {"error": "overloaded", "detail": str(e)},
+            status=429,
+            headers={"Retry-After": str(max(1, int(admission.queue_timeout)))}
+        )
+
+    try:
+        result = await hybrid_chat.hybrid_retrieval_async(query, stream_response=stream)
+
+        if not stream or not result.get("stream"):
+            payload = {
+                "answer": result["answer"],
+                "matches": match_summary(result["matches"]),
+                "graph_facts_count": result["graph_facts_count"],
+                "cached": bool(result.get("cached")),
+                "timing": result["timing"]
+            }
+            if not stream:
+                return web.json_response(payload)
+            # Streaming requested but nothing to stream (error / no context): one-shot SSE
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+            await response.prepare(request)
+            if result["answer"]:
+                await response.write(sse_event("token", {"content": result["answer"]}))
+            await response.write(sse_event("done", payload))
+            await response.write_eof()
+            return response
+
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        })
+        await response.prepare(request)
+
+        try:
+            async for text in result["stream"]:
+                await response.write(sse_event("token", {"content": text}))
+        finally:
+            # Client gone (ConnectionResetError / cancellation): close the upstream request, stop generating
+            await result["stream"].aclose()
+
+        # first_token / generation were filled in by the stream
+        await response.write(sse_event("done", {
+            "matches": match_summary(result["matches"]),
+            "graph_facts_count": result["graph_facts_count"],
+            "cached": bool(result.get("cached")),
+            "timing": result["timing"]
+        }))
+        await response.write_eof()
+        return response
+    finally:
+        admission.release()
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """
+    GET /metrics: Prometheus text exposition. Cache/runtime gauges are always
+    present; counters and histograms are only recorded with config.TELEMETRY_ENABLED.
+    """
+    return web.Response(text=hybrid_chat.telemetry.render_prometheus(),
+                        content_type="text/plain", charset="utf-8")
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response({
+        "status": "ok",
+        "admission": request.app["admission"].stats(),
+        "embedding_cache": hybrid_chat.embedding_cache.stats(),
+        "answer_cache": hybrid_chat.answer_cache.stats(),
+        "embedding_batches": hybrid_chat.embed_batcher.stats(),
+        "runtime": hybrid_chat.runtime.stats()
+    })
+
+
+# -----------------------------
+# App lifecycle
+# -----------------------------
+async def on_startup(app: web.Application):
+    """Create clients and load indexes before the first request (warm-up per config.RUNTIME_WARM_UP)."""
+    await hybrid_chat.startup()
+
+
+async def on_cleanup(app: web.Application):
+    """Close the Neo4j driver and pooled HTTP clients on shutdown."""
+    await hybrid_chat.shutdown()
+
+
+def create_app(admission: Optional[AdmissionController] = None) -> web.Application:
+    app = web.Application()
+    app["admission"] = admission or AdmissionController()
+    app.router.add_post("/chat", handle_chat)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the hybrid travel assistant over HTTP (SSE streaming).")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    parser.add_argument("--queue-timeout", type=float, default=QUEUE_TIMEOUT)
+    args = parser.parse_args()
+
+    async def build():
+        # Semaphore must be created on the serving loop
+        return create_app(AdmissionController(args.max_in_flight, args.max_queue, args.queue_timeout))
+
+    web.run_app(build(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
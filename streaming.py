@@ -0,0 +1,188 @@
+# streaming.py
+import asyncio
+import inspect
+import time
+from typing import Callable, Dict, List, Optional
+
+MIN_CHUNK_CHARS = 24  # deltas are buffered until this many characters...
+MAX_CHUNK_DELAY_S = 0.05  # ...or until the oldest buffered delta is this old
+
+
+def chunk_text(chunk) -> str:
+    """Text of one OpenAI-style stream chunk (chunk.choices[0].delta.content), '' for role/stop chunks."""
+    if chunk.choices and chunk.choices[0].delta.content:
+        return chunk.choices[0].delta.content
+    return ""
+
+
+async def _close(upstream):
+    # openai.AsyncStream.close() (openai>=1.10) releases the HTTP connection; async generators have aclose().
+    # Older AsyncStreams have neither: close the httpx response they wrap, which aborts the request.
+    close = getattr(upstream, "close", None) or getattr(upstream, "aclose", None)
+    if close is None and hasattr(upstream, "response"):
+        close = getattr(upstream.response, "aclose", None)
+    if close is not None:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+
+
+# -----------------------------
+# Token stream
+# -----------------------------
+class TokenStream:
+    """
+    Async iterator of answer text over an OpenAI-style chat stream.
+
+    - The first delta is passed through at once (time to first token); after
+      that, deltas are coalesced into chunks of at least `min_chars`, flushed
+      early when a delta has waited `max_delay` seconds, so consumers write far
+      fewer, larger frames without visible stalls.
+    - `timing` (e.g. the result's timing dict) gets `first_token` and
+      `generation` (seconds since the stream was created) when it ends.
+    - `aclose()`, a consumer that stops iterating and then closes, or
+      `deadline` (seconds) passing closes the upstream request, so an abandoned
+      generation stops consuming tokens and its connection. `aborted` says why.
+    - `on_complete(text)` runs only when the upstream finished normally;
+      `on_close(stream)` runs once however it ended.
+    """
+
+    def __init__(self, upstream, timing: Optional[Dict] = None, deadline: Optional[float] = None,
+                 min_chars: int = MIN_CHUNK_CHARS, max_delay: float = MAX_CHUNK_DELAY_S,
+                 on_complete: Optional[Callable[[str], None]] = None,
+                 on_close: Optional[Callable[["TokenStream"], None]] = None):
+        self.upstream = upstream
+        self.timing = timing if timing is not None else {}
+        self.min_chars = min_chars
+        self.max_delay = max_delay
+        self.on_complete = on_complete
+        self.on_close = on_close
+        self.start = time.monotonic()
+        self.ends_at = self.start + deadline if deadline else None
+        self.first_token: Optional[float] = None
+        self.generation: Optional[float] = None
+        self.deltas = 0
+        self.chunks = 0
+        self.completed = False
+        self.aborted: Optional[str] = None  # "closed", "deadline" or "error"
+        self._parts: List[str] = []
+        self._iterator = None
+        self._pending: Optional[asyncio.Future] = None
+        self._done = False
+
+    @property
+    def text(self) -> str:
+        """Everything received so far."""
+        return "".join(self._parts)
+
+    def __aiter__(self):
+        return self
+
+    def _time_left(self) -> Optional[float]:
+        return None if self.ends_at is None else self.ends_at - time.monotonic()
+
+    async def _next_delta(self, timeout: Optional[float]):
+        """Next non-empty delta; None at the end of the stream; raises TimeoutError (the pull stays pending)."""
+        if self._iterator is None:
+            self._iterator = self.upstream.__aiter__()
+        while True:
+            if self._pending is None:
+                self._pending = asyncio.ensure_future(self._iterator.__anext__())
+            done, _ = await asyncio.wait({self._pending}, timeout=timeout)
+            if not done:
+                raise asyncio.TimeoutError()
+            pending, self._pending = self._pending, None
+            try:
+                text = chunk_text(pending.result())
+            except StopAsyncIteration:
+                return None
+            if text:
+                self.deltas += 1
+                self._parts.append(text)
+                return text
+
+    async def __anext__(self) -> str:
+        if self._done:
+            raise StopAsyncIteration
+        buffer: List[str] = []
+        size = 0
+        flush_at = None
+        try:
+            while True:
+                waits = [t for t in (self._time_left(), None if flush_at is None else flush_at - time.monotonic())
+                         if t is not None]
+                timeout = max(0.0, min(waits)) if waits else None
+                try:
+                    text = await self._next_delta(timeout)
+                except asyncio.TimeoutError:
+                    left = self._time_left()
+                    if left is not None and left <= 0:
+                        self.chunks += bool(buffer)  # counted before _finish records stream_chunks
+                        await self._finish(aborted="deadline")
+                        break
+                    break  # max_delay reached: flush what is buffered
+                if text is None:
+                    self.chunks += bool(buffer)
+                    await self._finish()
+                    break
+                if self.first_token is None:
+                    self.first_token = time.monotonic() - self.start
+                    self.chunks += 1
+                    return text
+                buffer.append(text)
+                size += len(text)
+                if flush_at is None:
+                    flush_at = time.monotonic() + self.max_delay
+                if size >= self.min_chars:
+                    break
+        except (asyncio.CancelledError, GeneratorExit):
+            await self._finish(aborted="closed")  # the consumer was cancelled mid-read
+            raise
+        except Exception:
+            await self._finish(aborted="error")
+            raise
+        if not buffer:
+            raise StopAsyncIteration
+        if not self._done:
+            self.chunks += 1
+        return "".join(buffer)
+
+    async def aclose(self):
+        """Stop the generation (idempotent): cancels the pending read and closes the upstream request."""
+        await self._finish(aborted="closed")
+
+    async def _finish(self, aborted: Optional[str] = None):
+        if self._done:
+            return
+        self._done = True
+        self.generation = time.monotonic() - self.start
+        if aborted is None:
+            self.completed = True
+        else:
+            self.aborted = aborted
+            if self._pending is not None:
+                self._pending.cancel()
+                self._pending = None
+            try:
+                await _close(self.upstream)
+            except Exception:
+                pass
+        self.timing["first_token"] = round(self.first_token or 0.0, 3)
+        self.timing["generation"] = round(self.generation, 3)
+        self.timing["stream_chunks"] = self.chunks
+        if aborted:
+            self.timing["stream_aborted"] = aborted
+        if self.completed and self.on_complete is not None:
+            self.on_complete(self.text)
+        if self.on_close is not None:
+            self.on_close(self)
+
+    def stats(self) -> Dict:
+        return {
+            "first_token": self.first_token,
+            "generation": self.generation,
+            "deltas": self.deltas,
+            "chunks": self.chunks,
+            "completed": self.completed,
+            "aborted": self.aborted
+        }
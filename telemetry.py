@@ -0,0 +1,333 @@
+# telemetry.py
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+# Latency buckets in seconds (Prometheus-style cumulative histogram)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+# -----------------------------
+# Spans
+# -----------------------------
+class _NoopSpan:
+    """Returned by Telemetry.span() when disabled: every operation is free."""
+
+    def set(self, **attrs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    One timed operation. Usable as `with` or `async with`; the enclosing span
+    (tracked per asyncio task via contextvars) becomes its parent, so stages run
+    as separate tasks still nest under the query that started them.
+    """
+
+    def __init__(self, telemetry: "Telemetry", name: str, attrs: Dict):
+        self.telemetry = telemetry
+        self.name = name
+        self.attrs = attrs
+        self.parent: Optional[Span] = _current_span.get()
+        self.trace_id = self.parent.trace_id if self.parent else os.urandom(8).hex()
+        self.span_id = next(telemetry._span_ids)
+        self.status = "ok"
+        self.start = 0.0
+        self.duration = 0.0
+        self._wall_start = 0.0
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self):
+        self._wall_start = time.time()
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = "cancelled" if exc_type.__name__ == "CancelledError" else "error"
+            if self.status == "error":
+                self.attrs.setdefault("error", f"{exc_type.__name__}: {exc}")
+        self.telemetry._finish(self)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace": self.trace_id,
+            "span": self.span_id,
+            "parent": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start": round(self._wall_start, 6),
+            "duration_ms": round(self.duration * 1000.0, 3),
+            "status": self.status,
+            "attrs": self.attrs
+        }
+
+
+# -----------------------------
+# Sinks
+# -----------------------------
+class JsonLogSink:
+    """Append one JSON object per finished span to a file (JSON lines)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1 << 16)
+
+    def emit(self, record: Dict):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# -----------------------------
+# Metrics registry
+# -----------------------------
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (coarse, for summaries)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            if running >= target:
+                return bound
+        return float("inf")
+
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _label_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _format_labels(key: Tuple, extra: Tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = ",".join(f'{k}="{_label_value(v)}"' for k, v in pairs)
+    return "{" + escaped + "}"
+
+
+class Telemetry:
+    """
+    Spans, counters, histograms and gauges for the query path.
+
+    Disabled (the default), span() returns a shared no-op object and inc() /
+    observe() return after one attribute check, so instrumented code costs
+    close to nothing. Enabled, every finished span feeds the
+    `span_duration_seconds` histogram and, when a sink is configured, is written
+    as one JSON line. `render_prometheus()` produces the text exposition format.
+    """
+
+    def __init__(self, enabled: bool = False, sink: Optional[JsonLogSink] = None, prefix: str = "hybrid_"):
+        self.enabled = enabled
+        self.sink = sink
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._span_ids = itertools.count(1)
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._help: Dict[str, str] = {}
+
+    # ---- spans ----
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def annotate(self, **attrs):
+        """Add attributes to the innermost open span (no-op when disabled or outside a span)."""
+        if not self.enabled:
+            return
+        span = _current_span.get()
+        if span is not None:
+            span.attrs.update(attrs)
+
+    def _finish(self, span: Span):
+        self.observe("span_duration_seconds", span.duration, span=span.name)
+        if span.status == "error":
+            self.inc("span_errors_total", span=span.name)
+        if self.sink is not None:
+            self.sink.emit(span.to_dict())
+
+    # ---- metrics ----
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    def gauge(self, name: str, fn: Callable[[], float], help_text: str = ""):
+        """Register a gauge read at export time (e.g. a cache hit ratio); costs nothing per query."""
+        self._gauges[name] = fn
+        if help_text:
+            self._help[name] = help_text
+
+    # ---- export ----
+    def snapshot(self) -> Dict:
+        """Counters, histogram summaries and gauges as a JSON-friendly dict."""
+        with self._lock:
+            counters = {
+                name: {_format_labels(k) or "total": v for k, v in series.items()}
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: {
+                    _format_labels(k) or "all": {
+                        "count": h.count,
+                        "sum": round(h.sum, 6),
+                        "p50_le": h.quantile(0.5),
+                        "p95_le": h.quantile(0.95),
+                        "p99_le": h.quantile(0.99)
+                    }
+                    for k, h in series.items()
+                }
+                for name, series in self._histograms.items()
+            }
+        gauges = {}
+        for name, fn in self._gauges.items():
+            try:
+                gauges[name] = fn()
+            except Exception:
+                continue
+        return {"enabled": self.enabled, "counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        lines = []
+
+        def header(name, kind):
+            full = self.prefix + name
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = header(name, "counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                full = header(name, "histogram")
+                for key, hist in sorted(series.items()):
+                    running = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        running += n
+                        lines.append(f"{full}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {running}")
+                    lines.append(f"{full}_bucket{_format_labels(key, (('le', '+Inf'),))} {hist.count}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {hist.sum:.6f}")
+                    lines.append(f"{full}_count{_format_labels(key)} {hist.count}")
+        for name, fn in sorted(self._gauges.items()):
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            full = header(name, "gauge")
+            lines.append(f"{full} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+
+# -----------------------------
+# Standalone /metrics endpoint
+# -----------------------------
+def start_metrics_server(telemetry: Telemetry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve `GET /metrics` (Prometheus text) from a daemon thread, for processes
+    that do not run server.py (e.g. the interactive chat).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = telemetry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="metrics-exporter", daemon=True).start()
+    return httpd
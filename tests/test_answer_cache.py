@@ -0,0 +1,33 @@
+# tests/test_answer_cache.py
+import numpy as np
+
+from answer_cache import SemanticAnswerCache
+
+INTENT = {"style": "romantic", "duration": 4, "cities": ["Hoi An"], "requested_types": [], "keywords": ["scenic"]}
+
+
+def test_intent_key_ignores_keywords_and_missing_intent():
+    assert SemanticAnswerCache.intent_key(INTENT) == ("romantic", 4, ("Hoi An",), ())
+    assert SemanticAnswerCache.intent_key(dict(INTENT, keywords=[])) == SemanticAnswerCache.intent_key(INTENT)
+    assert SemanticAnswerCache.intent_key(None) == SemanticAnswerCache.intent_key({}) == (None, None, (), ())
+
+
+def test_lookup_requires_same_intent_key_and_similarity():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=4)
+    cache.store("romantic 4-day Hoi An", [1.0, 0.0], INTENT, "answer", matches=[])
+    assert cache.lookup([0.99, 0.05], dict(INTENT, keywords=["other"]))["answer"] == "answer"
+    assert cache.lookup([0.99, 0.05], dict(INTENT, duration=7)) is None
+    assert cache.lookup([0.99, 0.05], dict(INTENT, cities=["Hanoi"])) is None
+    assert cache.lookup([0.0, 1.0], INTENT) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+
+def test_full_cache_overwrites_least_recently_used():
+    cache = SemanticAnswerCache(threshold=0.99, max_entries=2)
+    vectors = np.eye(3)
+    cache.store("a", vectors[0], None, "A")
+    cache.store("b", vectors[1], None, "B")
+    assert cache.lookup(vectors[0], None)["answer"] == "A"
+    cache.store("c", vectors[2], None, "C")
+    assert cache.lookup(vectors[1], None) is None  # "b" was least recently used
+    assert len(cache) == 2 and cache.evictions == 1
@@ -0,0 +1,50 @@
+# tests/test_fusion.py
+import numpy as np
+import pytest
+
+from fusion import RankedList, fuse, top_k
+
+
+def test_top_k_matches_stable_sort():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        scores = rng.integers(0, 5, size=30).astype(np.float64)  # many ties
+        for k in (1, 5, 29, 30, 40, None):
+            expected = np.argsort(-scores, kind="stable")[:k]
+            assert top_k(scores, k).tolist() == expected.tolist()
+
+
+def test_top_k_empty_for_non_positive_k():
+    assert top_k(np.array([1.0, 2.0]), 0).size == 0
+
+
+def test_rrf_scores_and_order():
+    result = fuse([RankedList("a", ["x", "y", "z"]), RankedList("b", ["y", "x"])], k=60)
+    assert result.ids == ["x", "y", "z"]  # x and y tie; x appears first
+    assert result.scores[0] == pytest.approx(1 / 61 + 1 / 62)
+    assert result.scores[2] == pytest.approx(1 / 63)
+    assert result.contributions == {"a": 3, "b": 2}
+
+
+def test_weights_and_limit():
+    result = fuse([RankedList("a", ["x", "y"]), RankedList("b", ["y"], weight=2.0)], limit=1)
+    assert result.ids == ["y"]
+    assert "y" in result and "x" not in result
+
+
+def test_duplicates_keep_first_position():
+    result = fuse([RankedList("a", ["x", "y", "x"], scores=[0.1, 0.9, 0.5], sort=True)], method="score")
+    assert result.ids == ["y", "x"]
+    assert result.scores.tolist() == [1.0, 0.0]
+
+
+def test_score_method_normalizes_per_list():
+    result = fuse([RankedList("a", ["x", "y"], scores=[10.0, 0.0]),
+                   RankedList("b", ["y", "x"], scores=[0.3, 0.2])], method="score")
+    assert result.items() == [("x", 1.0), ("y", 1.0)]
+
+
+def test_empty_lists_and_unknown_method():
+    assert len(fuse([RankedList("a", [])])) == 0
+    with pytest.raises(ValueError):
+        fuse([RankedList("a", ["x"])], method="max")
@@ -0,0 +1,47 @@
+# tests/test_ingest.py
+import io
+import json
+
+import pytest
+
+import ingest
+from ingest import _iter_json_array
+
+RECORDS = [{"id": f"n{i}", "name": "Hội An " * i, "tags": ["a", "b"], "ok": True, "x": None}
+           for i in range(12)]
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 7, 13, 64, 1 << 16])
+def test_records_split_across_chunks(monkeypatch, chunk):
+    monkeypatch.setattr(ingest, "READ_CHUNK", chunk)
+    text = json.dumps(RECORDS, ensure_ascii=False, indent=1)
+    assert list(_iter_json_array(io.StringIO(text))) == RECORDS
+
+
+def test_empty_array_and_empty_file():
+    assert list(_iter_json_array(io.StringIO(" [ ] "))) == []
+    assert list(_iter_json_array(io.StringIO(""))) == []
+
+
+def test_not_an_array():
+    with pytest.raises(ValueError, match="Expected a JSON array"):
+        list(_iter_json_array(io.StringIO('{"id": 1}')))
+
+
+def test_unterminated_array():
+    with pytest.raises(ValueError, match="Unterminated JSON array"):
+        list(_iter_json_array(io.StringIO('[{"id": 1},')))
+
+
+def test_malformed_element_reports_byte_offset(monkeypatch):
+    monkeypatch.setattr(ingest, "READ_CHUNK", 8)
+    text = '[{"id": "é"}, {"id": 2 "x": 3}, ' + '{"id": 4}, ' * 1000 + ']'
+    reads = []
+    f = io.StringIO(text)
+    read = f.read
+    monkeypatch.setattr(f, "read", lambda n: reads.append(n) or read(n))
+    with pytest.raises(ValueError) as excinfo:
+        list(_iter_json_array(f))
+    bad = text.index('"x"')
+    assert f"at byte {len(text[:bad].encode('utf-8'))}" in str(excinfo.value)
+    assert len(reads) < 10  # failed at the bad element, not at the end of the file
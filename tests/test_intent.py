@@ -0,0 +1,53 @@
+# tests/test_intent.py
+import re
+
+import pytest
+
+from intent import IntentMatcher, trie_pattern
+
+CITIES = {"Hanoi": "Northern Vietnam", "Hoi An": "Central Vietnam", "Ha Long Bay": "Northern Vietnam"}
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return IntentMatcher(tags=["floating_markets", "floating", "markets", "street food"], cities=CITIES,
+                         entity_types=["City", "Hotel", "Attraction", "Activity"])
+
+
+def test_trie_pattern_prefers_longest_term():
+    pattern = re.compile(trie_pattern(["market", "markets", "mar"]))
+    assert pattern.fullmatch("markets") and pattern.fullmatch("mar")
+    assert pattern.match("markets").group(0) == "markets"
+
+
+def test_terms_match_word_starts_and_cover_contained_terms(matcher):
+    terms = matcher.terms("Trekking past the floating markets")
+    assert {"trek", "floating markets", "floating", "markets"} <= terms
+    assert "trek" not in matcher.terms("a bustrekking sign")  # not at a word start
+
+
+def test_count_falls_back_to_substrings(matcher):
+    assert matcher.count("Romantic lanterns over the river", frozenset({"romantic", "lanterns", "river"})) == 3
+    assert matcher.count("", frozenset({"romantic"})) == 0
+
+
+def test_intent_styles_cities_types_and_duration(matcher):
+    intent = matcher.intent("2 week romantic food trip with hotels in Hanoi and Hoi An")
+    assert intent["styles"] == ["romantic", "food"]
+    assert intent["style"] == "food"  # last matched style wins
+    assert intent["duration"] == 14
+    assert intent["cities"] == ["Hanoi", "Hoi An"]
+    assert intent["requested_types"] == ["Hotel"]
+    assert "Restaurant" in intent["entity_types"] and "lanterns" in intent["keywords"]
+
+
+def test_aliases_and_plain_queries(matcher):
+    assert matcher.intent("cruise on halong")["cities"] == ["Ha Long Bay"]
+    assert matcher.intent("a week in north vietnam")["cities"] == ["Ha Long Bay", "Hanoi"]
+    intent = matcher.intent("what should I see")
+    assert intent["style"] is None and intent["cities"] == [] and intent["duration"] is None
+
+
+def test_style_profile(matcher):
+    assert matcher.style_profile("beach")["keywords"] == ["beach", "coast", "cruise", "island"]
+    assert matcher.style_profile("unknown")["keywords"] == []
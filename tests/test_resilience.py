@@ -0,0 +1,90 @@
+# tests/test_resilience.py
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, Deadline, RetryBudget, current_deadline
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker("x", failure_threshold=2, reset_timeout=10.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    assert breaker.opens == 1
+
+
+def test_breaker_admits_one_half_open_probe(clock):
+    breaker = CircuitBreaker("x", failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+    clock.now += 10.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # the probe is in flight
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_breaker_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("x", failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+    clock.now += 10.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opens == 2
+
+
+def test_breaker_lost_probe_frees_slot(clock):
+    breaker = CircuitBreaker("x", failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+    clock.now += 10.0
+    assert breaker.allow()
+    clock.now += 10.0
+    assert breaker.allow()
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, max_tokens=1.0)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()  # capped at max_tokens
+    assert budget.tokens == 1.0 and budget.withdraw()
+
+
+def test_deadline_stage_shares(clock):
+    deadline = Deadline(10.0, shares={"vector": 0.2})
+    assert deadline.stage_remaining("vector") == pytest.approx(2.0)
+    clock.now += 1.5
+    assert deadline.stage_remaining("vector") == pytest.approx(0.5)
+    assert deadline.stage_remaining("chat") == pytest.approx(8.5)  # starts now, capped by the total
+    clock.now += 20.0
+    assert deadline.remaining() == 0.0 and deadline.stage_remaining("chat") == 0.0
+
+
+def test_deadline_visible_to_spawned_tasks():
+    async def main():
+        with Deadline(5.0) as deadline:
+            assert await asyncio.create_task(asyncio.sleep(0, result=current_deadline())) is deadline
+        assert current_deadline() is None
+
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+# tests/test_streaming.py
+import asyncio
+from types import SimpleNamespace
+
+from streaming import TokenStream
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class Upstream:
+    """OpenAI-style chat stream over fixed deltas, `delay` seconds apart."""
+
+    def __init__(self, deltas, delay=0.0):
+        self.deltas = deltas
+        self.delay = delay
+        self.closed = False
+
+    async def __aiter__(self):
+        for text in self.deltas:
+            await asyncio.sleep(self.delay)
+            yield chunk(text)
+
+    async def close(self):
+        self.closed = True
+
+
+def collect(stream):
+    async def main():
+        return [part async for part in stream]
+    return asyncio.run(main())
+
+
+def test_first_delta_alone_then_coalesced():
+    completed = []
+    timing = {}
+    stream = TokenStream(Upstream(["Hi", None, "a", "b", "c", "d"]), timing=timing, min_chars=3,
+                         on_complete=completed.append)
+    assert collect(stream) == ["Hi", "abc", "d"]
+    assert completed == ["Hiabcd"] and stream.completed and stream.aborted is None
+    assert timing["stream_chunks"] == 3 and stream.deltas == 5
+
+
+def test_max_delay_flushes_small_buffers():
+    stream = TokenStream(Upstream(["a", "b", "c"], delay=0.03), min_chars=100, max_delay=0.01)
+    assert collect(stream) == ["a", "b", "c"]
+
+
+def test_deadline_aborts_and_closes_upstream():
+    upstream = Upstream(["a", "b", "c"], delay=0.05)
+    closed = []
+    stream = TokenStream(upstream, deadline=0.08, min_chars=100, on_close=closed.append)
+    parts = collect(stream)
+    assert parts[0] == "a" and "c" not in "".join(parts)
+    assert stream.aborted == "deadline" and upstream.closed and closed == [stream]
+
+
+def test_aclose_is_idempotent():
+    upstream = Upstream(["a", "b"])
+    completed = []
+    stream = TokenStream(upstream, on_complete=completed.append)
+
+    async def main():
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+        await stream.aclose()
+
+    asyncio.run(main())
+    assert stream.aborted == "closed" and upstream.closed and completed == []
@@ -0,0 +1,509 @@
+# vector_store.py
+import asyncio
+import json
+import os
+from typing import List, Dict, Optional, Sequence
+
+import httpx
+import numpy as np
+
+# -----------------------------
+# Backend interface
+# -----------------------------
+class VectorBackend:
+    """
+    Minimal vector search interface used by hybrid_chat.
+    Every backend returns matches shaped like Pinecone's: {"id", "score", "metadata"}.
+    `filter` is a Pinecone metadata filter ({"type": {"$in": [...]}, "$or": [...]})
+    applied before top-k selection.
+    """
+
+    def query(self, vector: Sequence[float], top_k: int = 5, filter: Optional[Dict] = None) -> List[Dict]:
+        return self.query_batch([vector], top_k=top_k, filter=filter)[0]
+
+    def query_batch(self, vectors: Sequence[Sequence[float]], top_k: int = 5,
+                    filter: Optional[Dict] = None) -> List[List[Dict]]:
+        raise NotImplementedError
+
+    async def aquery(self, vector: Sequence[float], top_k: int = 5, filter: Optional[Dict] = None) -> List[Dict]:
+        """Async query. In-process backends answer inline (no thread hop)."""
+        return self.query(vector, top_k=top_k, filter=filter)
+
+    async def warm(self):
+        """Pre-open whatever connection aquery() uses (no-op for in-process backends)."""
+
+    async def aclose(self):
+        pass
+
+
+class PineconeBackend(VectorBackend):
+    """
+    Managed Pinecone index (one network round trip per query).
+
+    The sync path uses the Pinecone SDK. The async path talks to the index's
+    data-plane REST endpoint with a pooled httpx.AsyncClient, so queries never
+    occupy a worker thread; without a `host` it falls back to the SDK.
+    """
+
+    API_VERSION = "2024-07"
+
+    def __init__(self, index, host: Optional[str] = None, api_key: Optional[str] = None, timeout: float = 10.0):
+        self.index = index
+        self.host = host
+        self.api_key = api_key
+        self.timeout = timeout
+        self._http = None
+
+    def query(self, vector, top_k=5, filter=None):
+        res = self.index.query(
+            vector=[float(x) for x in vector],
+            top_k=top_k,
+            include_metadata=True,
+            include_values=False,
+            **({"filter": filter} if filter else {})
+        )
+        return res["matches"]
+
+    def query_batch(self, vectors, top_k=5, filter=None):
+        return [self.query(v, top_k=top_k, filter=filter) for v in vectors]
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            base_url = self.host if self.host.startswith("http") else f"https://{self.host}"
+            self._http = httpx.AsyncClient(
+                base_url=base_url,
+                headers={"Api-Key": self.api_key or "", "X-Pinecone-API-Version": self.API_VERSION},
+                timeout=self.timeout
+            )
+        return self._http
+
+    async def warm(self):
+        """Open the pooled data-plane connection (TLS handshake) with a cheap stats call."""
+        if self.host:
+            resp = await self._client().post("/describe_index_stats", json={})
+            resp.raise_for_status()
+
+    async def aquery(self, vector, top_k=5, filter=None):
+        if not self.host:
+            return await asyncio.to_thread(self.query, vector, top_k, filter)
+        body = {
+            "vector": [float(x) for x in vector],
+            "topK": top_k,
+            "includeMetadata": True,
+            "includeValues": False
+        }
+        if filter:
+            body["filter"] = filter
+        resp = await self._client().post("/query", json=body)
+        resp.raise_for_status()
+        return [
+            {"id": m["id"], "score": m.get("score", 0.0), "metadata": m.get("metadata") or {}}
+            for m in resp.json().get("matches", [])
+        ]
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# -----------------------------
+# Local in-process index
+# -----------------------------
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize_int8(matrix: np.ndarray):
+    """Symmetric per-row int8 codes and float32 scales: row ~= codes * scale."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    peak = np.abs(matrix).max(axis=-1) if matrix.size else np.zeros(matrix.shape[:-1], np.float32)
+    scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[..., None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def dequantize_int8(codes: np.ndarray, scales) -> np.ndarray:
+    return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[..., None]
+
+
+class CompactVectors:
+    """
+    First-pass search copy of an index matrix: the leading `dim` columns,
+    re-normalized (text-embedding-3 vectors are trained so a prefix keeps most
+    of the ranking quality), optionally stored as int8 with one scale per row.
+    1536 -> 512 dims int8 is 12x smaller than the float32 matrix.
+
+    Scores are approximate; LocalVectorIndex rescores the best candidates
+    against the full-precision rows.
+    """
+
+    BUILD_ROWS = 32768  # rows read from the full matrix at a time while building
+    SCORE_BLOCK_BYTES = 1 << 20  # int8 rows are widened into a float32 buffer this size (stays in cache)
+
+    def __init__(self, rows: np.ndarray, scales: Optional[np.ndarray], dim: int):
+        self.rows = rows
+        self.scales = scales
+        self.dim = dim
+
+    @property
+    def quantize(self) -> Optional[str]:
+        return "int8" if self.scales is not None else None
+
+    @property
+    def tag(self) -> str:
+        return f"{self.quantize or 'f32'}-d{self.dim}"
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self):
+        return self.rows.shape[0]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, dim: Optional[int] = None, quantize: Optional[str] = None) -> "CompactVectors":
+        """Built block by block, so a memory-mapped matrix is never loaded whole."""
+        if quantize not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization '{quantize}' (use None or 'int8')")
+        n, full_dim = vectors.shape
+        dim = min(dim or full_dim, full_dim)
+        rows = np.empty((n, dim), dtype=np.int8 if quantize else np.float32)
+        scales = np.empty(n, dtype=np.float32) if quantize else None
+        for start in range(0, n, cls.BUILD_ROWS):
+            block = _normalize_rows(np.asarray(vectors[start:start + cls.BUILD_ROWS, :dim], dtype=np.float32))
+            if quantize:
+                rows[start:start + len(block)], scales[start:start + len(block)] = quantize_int8(block)
+            else:
+                rows[start:start + len(block)] = block
+        return cls(rows, scales, dim)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """(b, n) approximate cosine scores for full-dimension queries."""
+        queries = _normalize_rows(np.ascontiguousarray(queries[:, :self.dim], dtype=np.float32))
+        if self.scales is None:
+            return queries @ self.rows.T
+        n = len(self)
+        out = np.empty((queries.shape[0], n), dtype=np.float32)
+        block_rows = max(64, self.SCORE_BLOCK_BYTES // (4 * self.dim))
+        buffer = np.empty((block_rows, self.dim), dtype=np.float32)
+        for start in range(0, n, block_rows):
+            end = min(n, start + block_rows)
+            block = buffer[:end - start]
+            np.copyto(block, self.rows[start:end], casting="unsafe")
+            np.matmul(queries, block.T, out=out[:, start:end])
+        out *= self.scales
+        return out
+
+    # ---- persistence (a sidecar next to the index, rebuilt when the index changes) ----
+    def save(self, path: str):
+        tmp = f"{path}.tmp.npz"
+        arrays = {"rows": self.rows, "dim": np.array(self.dim)}
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CompactVectors":
+        with np.load(path) as data:
+            return cls(data["rows"], data["scales"] if "scales" in data else None, int(data["dim"]))
+
+
+def _top_k(scores: np.ndarray, k: int):
+    """Row-wise indices and scores of the k best columns, best first (partial selection, then sort k)."""
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class LocalVectorIndex(VectorBackend):
+    """
+    In-process cosine index over a contiguous float32 matrix.
+
+    On disk the index is two files sharing a prefix:
+      <path>.npy  - (n, dim) float32 matrix of L2-normalized vectors (memory-mappable)
+      <path>.json - {"dim", "ids", "metadata"} in row order
+
+    With a CompactVectors search copy (`with_compact()` / `load(search_dim=...,
+    quantize=...)`), queries score every row on the compact copy, then rescore
+    the best `rescore * top_k` candidates exactly; only those rows of the
+    (memory-mapped) float32 matrix are read.
+    """
+
+    FILTER_CACHE_SIZE = 256  # distinct filters whose row masks are kept
+    MIN_CANDIDATES = 32  # rescored at least this many rows per query
+
+    def __init__(self, ids: List[str], vectors: np.ndarray, metadata: List[Dict],
+                 compact: Optional[CompactVectors] = None, rescore: int = 8):
+        if len(ids) != len(metadata) or len(ids) != vectors.shape[0]:
+            raise ValueError("ids, vectors and metadata must have the same length")
+        if compact is not None and len(compact) != len(ids):
+            raise ValueError("compact vectors do not match the index rows")
+        self.ids = list(ids)
+        self.vectors = vectors
+        self.metadata = list(metadata)
+        self.dim = vectors.shape[1] if vectors.ndim == 2 else 0
+        self.compact = compact
+        self.rescore = rescore
+        self._columns: Dict[str, np.ndarray] = {}  # metadata field -> str array, built on first filter
+        self._masks: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---- construction ----
+    @classmethod
+    def from_items(cls, items: List[tuple], dim: Optional[int] = None) -> "LocalVectorIndex":
+        """Build an index from (id, vector, metadata) tuples."""
+        ids = [item[0] for item in items]
+        metas = [item[2] for item in items]
+        if items:
+            matrix = np.asarray([item[1] for item in items], dtype=np.float32)
+        else:
+            matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        return cls(ids, np.ascontiguousarray(_normalize_rows(matrix)), metas)
+
+    def upsert(self, items: List[tuple]) -> "LocalVectorIndex":
+        """Return a new index with (id, vector, metadata) items added or replaced in place."""
+        if not items:
+            return self
+        position = {node_id: i for i, node_id in enumerate(self.ids)}
+        ids, metas = list(self.ids), list(self.metadata)
+        rows = _normalize_rows(np.asarray([item[1] for item in items], dtype=np.float32))
+        vectors = np.array(self.vectors, dtype=np.float32) if len(self.ids) else np.zeros((0, rows.shape[1]), np.float32)
+
+        appended = []
+        for (node_id, _, meta), row in zip(items, rows):
+            if node_id in position:
+                vectors[position[node_id]] = row
+                metas[position[node_id]] = meta
+            else:
+                ids.append(node_id)
+                metas.append(meta)
+                appended.append(row)
+        if appended:
+            vectors = np.vstack([vectors, np.asarray(appended, dtype=np.float32)])
+        return LocalVectorIndex(ids, np.ascontiguousarray(vectors), metas)
+
+    def delete(self, ids: Sequence[str]) -> "LocalVectorIndex":
+        """Return a new index without the given ids."""
+        doomed = set(ids)
+        keep = [i for i, node_id in enumerate(self.ids) if node_id not in doomed]
+        if len(keep) == len(self.ids):
+            return self
+        return LocalVectorIndex(
+            [self.ids[i] for i in keep],
+            np.ascontiguousarray(np.asarray(self.vectors)[keep], dtype=np.float32),
+            [self.metadata[i] for i in keep]
+        )
+
+    def with_compact(self, search_dim: Optional[int] = None, quantize: Optional[str] = None,
+                     rescore: int = 8) -> "LocalVectorIndex":
+        """Same rows, searched through a compact copy (reduced dimension and/or int8) with exact rescoring."""
+        compact = CompactVectors.build(self.vectors, search_dim, quantize) if len(self.ids) else None
+        return LocalVectorIndex(self.ids, self.vectors, self.metadata, compact=compact, rescore=rescore)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, search_dim: Optional[int] = None,
+             quantize: Optional[str] = None, rescore: int = 8) -> "LocalVectorIndex":
+        """
+        Load an index written by save(); the matrix is memory-mapped by default.
+        With `search_dim` and/or `quantize` the compact search copy is read from
+        <path>.<tag>.npz, or built and written there when missing or older than
+        the index.
+        """
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            header = json.load(f)
+        vectors = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+        index = cls(header["ids"], vectors, header["metadata"])
+        if not (search_dim or quantize) or not len(index):
+            return index
+
+        dim = min(search_dim or index.dim, index.dim)
+        sidecar = f"{path}.{quantize or 'f32'}-d{dim}.npz"
+        compact = None
+        try:
+            if os.path.getmtime(sidecar) >= os.path.getmtime(f"{path}.npy"):
+                compact = CompactVectors.load(sidecar)
+        except (OSError, ValueError, KeyError):
+            compact = None
+        if compact is None or len(compact) != len(index) or compact.tag != f"{quantize or 'f32'}-d{dim}":
+            compact = CompactVectors.build(vectors, dim, quantize)
+            try:
+                compact.save(sidecar)
+            except OSError:
+                pass  # read-only index directory: rebuilt on every load
+        index.compact = compact
+        index.rescore = rescore
+        return index
+
+    def memory_bytes(self) -> Dict:
+        """Bytes scanned per query (the compact copy when there is one) vs the float32 matrix."""
+        full = len(self.ids) * self.dim * 4
+        search = self.compact.nbytes if self.compact is not None else full
+        return {"full": full, "search": search, "ratio": round(full / search, 2) if search else 1.0}
+
+    def save(self, path: str):
+        """Write the matrix and header atomically (tmp file + rename)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        tmp_npy = f"{path}.npy.tmp"
+        with open(tmp_npy, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        tmp_json = f"{path}.json.tmp"
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "ids": self.ids, "metadata": self.metadata}, f)
+
+        os.replace(tmp_npy, f"{path}.npy")
+        os.replace(tmp_json, f"{path}.json")
+
+    # ---- metadata filters ----
+    def _column(self, field: str) -> np.ndarray:
+        column = self._columns.get(field)
+        if column is None:
+            column = self._columns[field] = np.array(
+                ["" if m.get(field) is None else str(m.get(field)) for m in self.metadata]
+            )
+        return column
+
+    def _filter_mask(self, flt: Dict) -> np.ndarray:
+        """
+        Row mask for a Pinecone-style filter on scalar metadata fields:
+        {"field": value}, $eq, $ne, $in, $nin, combined with $and / $or.
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, cond in flt.items():
+            if field == "$and":
+                for sub in cond:
+                    mask &= self._filter_mask(sub)
+            elif field == "$or":
+                any_mask = np.zeros(len(self.ids), dtype=bool)
+                for sub in cond:
+                    any_mask |= self._filter_mask(sub)
+                mask &= any_mask
+            else:
+                column = self._column(field)
+                ops = cond if isinstance(cond, dict) else {"$eq": cond}
+                for op, value in ops.items():
+                    if op == "$eq":
+                        mask &= column == str(value)
+                    elif op == "$ne":
+                        mask &= column != str(value)
+                    elif op == "$in":
+                        mask &= np.isin(column, [str(v) for v in value])
+                    elif op == "$nin":
+                        mask &= ~np.isin(column, [str(v) for v in value])
+                    else:
+                        raise ValueError(f"Unsupported filter operator '{op}' for local index")
+        return mask
+
+    def filter_mask(self, flt: Optional[Dict]) -> Optional[np.ndarray]:
+        """Cached row mask for a filter (None = every row)."""
+        if not flt:
+            return None
+        key = json.dumps(flt, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            if len(self._masks) >= self.FILTER_CACHE_SIZE:
+                self._masks.clear()
+            mask = self._masks[key] = self._filter_mask(flt)
+        return mask
+
+    # ---- search ----
+    def query_batch(self, vectors, top_k=5, filter=None):
+        if not len(self.ids):
+            return [[] for _ in vectors]
+
+        queries = _normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match index dimension {self.dim}")
+
+        if self.compact is not None:
+            # Approximate pass over the compact copy
+            scores = self.compact.scores(queries)
+        else:
+            # (b, dim) @ (dim, n) -> (b, n) cosine scores in one BLAS call
+            scores = queries @ self.vectors.T
+        k = min(top_k, scores.shape[1])
+        allowed = scores.shape[1]
+
+        mask = self.filter_mask(filter)
+        if mask is not None:
+            # Filtered-out rows can never be selected
+            scores[:, ~mask] = -np.inf
+            allowed = int(mask.sum())
+            k = min(k, allowed)
+            if k == 0:
+                return [[] for _ in range(scores.shape[0])]
+
+        if self.compact is None:
+            top, top_scores = _top_k(scores, k)
+        else:
+            # Exact float32 rescore of the best candidates; only their rows are read
+            candidates, _ = _top_k(scores, min(allowed, max(k * self.rescore, self.MIN_CANDIDATES)))
+            exact = np.einsum("bd,bcd->bc", queries, np.asarray(self.vectors[candidates], dtype=np.float32))
+            best, top_scores = _top_k(exact, k)
+            top = np.take_along_axis(candidates, best, axis=1)
+
+        results = []
+        for row_idx, row_scores in zip(top, top_scores):
+            results.append([
+                {"id": self.ids[i], "score": float(s), "metadata": self.metadata[i]}
+                for i, s in zip(row_idx.tolist(), row_scores.tolist())
+            ])
+        return results
+
+
+class LocalIndexWriter:
+    """
+    Build a LocalVectorIndex file incrementally. Normalized rows are appended to
+    a raw scratch file as batches arrive, so peak memory stays at one batch of
+    vectors (plus ids/metadata); close() lays them out as the final .npy.
+    """
+
+    COPY_ROWS = 65536
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.ids: List[str] = []
+        self.metadata: List[Dict] = []
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._rows_path = f"{path}.rows.tmp"
+        self._rows = open(self._rows_path, "wb")
+
+    def add(self, ids: Sequence[str], vectors, metadata: Sequence[Dict]):
+        rows = _normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if rows.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {rows.shape[1]} does not match index dimension {self.dim}")
+        self._rows.write(np.ascontiguousarray(rows).tobytes())
+        self.ids.extend(ids)
+        self.metadata.extend(metadata)
+
+    def close(self) -> int:
+        """Write <path>.npy/.json atomically; returns the number of vectors."""
+        self._rows.close()
+        n = len(self.ids)
+        tmp_npy = f"{self.path}.npy.tmp"
+        out = np.lib.format.open_memmap(tmp_npy, mode="w+", dtype=np.float32, shape=(n, self.dim))
+        if n:
+            rows = np.memmap(self._rows_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+            for start in range(0, n, self.COPY_ROWS):
+                out[start:start + self.COPY_ROWS] = rows[start:start + self.COPY_ROWS]
+            del rows
+        out.flush()
+        del out
+        os.remove(self._rows_path)
+
+        tmp_json = f"{self.path}.json.tmp"
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "ids": self.ids, "metadata": self.metadata}, f)
+        os.replace(tmp_npy, f"{self.path}.npy")
+        os.replace(tmp_json, f"{self.path}.json")
+        return n
@@ -1,42 +1,486 @@
 # visualize_graph.py
-from neo4j import GraphDatabase
-from pyvis.network import Network
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import webbrowser
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
 import networkx as nx
-import config
+import numpy as np
+from pyvis.network import Network
 
-NEO_BATCH = 500  # number of relationships to fetch / visualize
+from graph_snapshot import DEFAULT_SNAPSHOT_PATH, RELATIONSHIP_WEIGHTS, GraphSnapshot, load_snapshot
 
-driver = GraphDatabase.driver(config.NEO4J_URI, auth=(config.NEO4J_USER, config.NEO4J_PASSWORD))
+PAGE_SIZE = 5000  # nodes per Neo4j read (keyset pagination on n.id); their outgoing relationships come with them
+OUTPUT_DIR = "graph_viz"
+CLUSTER_TYPES = ("City",)  # node types that anchor a cluster
+CLUSTER_RELATIONS = ("Located_In", "Available_In")  # member -> anchor relationships, preferred in this order
+MAX_DETAIL_NODES = 1500  # members drawn on a cluster page (highest degree first)
+MAX_DETAIL_EDGES = 5000
+MAX_OVERVIEW_EDGES = 5000  # strongest cluster-to-cluster links drawn on the overview
+SPRING_MAX_NODES = 300  # larger clusters use a spiral layout instead of a force-directed one
+LAYOUT_SCALE = 1500.0  # pixels between neighboring cluster centers
+TYPE_COLORS = {"City": "#e4572e", "Hotel": "#17bebb", "Attraction": "#ffc914", "Activity": "#76b041",
+               "Restaurant": "#a259ff"}
+DEFAULT_COLOR = "#9e9e9e"
 
-def fetch_subgraph(tx, limit=500):
-    # fetch nodes and relationships up to a limit
-    q = (
-        "MATCH (a:Entity)-[r]->(b:Entity) "
-        "RETURN a.id AS a_id, labels(a) AS a_labels, a.name AS a_name, "
-        "b.id AS b_id, labels(b) AS b_labels, b.name AS b_name, type(r) AS rel "
-        "LIMIT $limit"
-    )
-    return list(tx.run(q, limit=limit))
+# Double-click a node to open the page in its `url`; double-click the background for the overview
+_NAVIGATION = """
+<script type="text/javascript">
+  network.on("doubleClick", function (params) {
+    if (params.nodes.length) {
+      var url = nodes.get(params.nodes[0]).url;
+      if (url) { window.location.href = url; }
+    } else if (%(overview)s) {
+      window.location.href = %(overview)s;
+    }
+  });
+</script>
+"""
 
-def build_pyvis(rows, output_html="neo4j_viz.html"):
-    net = Network(height="900px", width="100%", notebook=False, directed=True)
-    for rec in rows:
-        a_id = rec["a_id"]; a_name = rec["a_name"] or a_id
-        b_id = rec["b_id"]; b_name = rec["b_name"] or b_id
-        a_labels = rec["a_labels"]; b_labels = rec["b_labels"]
-        rel = rec["rel"]
 
-        net.add_node(a_id, label=f"{a_name}\n({','.join(a_labels)})", title=f"{a_name}")
-        net.add_node(b_id, label=f"{b_name}\n({','.join(b_labels)})", title=f"{b_name}")
-        net.add_edge(a_id, b_id, title=rel)
+# -----------------------------
+# Paged export from Neo4j
+# -----------------------------
+def _unanchored_label(node_type: str) -> str:
+    return f"{node_type} (no {'/'.join(CLUSTER_TYPES).lower()})"
 
-    net.show(output_html, notebook=False)
-    print(f"Saved visualization to {output_html}")
 
-def main():
+def _anchor_rank() -> str:
+    # Cypher CASE ranking a relationship by its place in CLUSTER_RELATIONS (any other type after them)
+    cases = " ".join(f"WHEN '{rel}' THEN {i}" for i, rel in enumerate(CLUSTER_RELATIONS))
+    return f"CASE type(r) {cases} ELSE {len(CLUSTER_RELATIONS)} END"
+
+
+# One page of nodes with each node's cluster resolved in Neo4j: anchors are their own cluster,
+# other nodes take the adjacent anchor with the best-ranked relationship (None when there is none)
+NODE_PAGE_QUERY = (
+    "MATCH (n:Entity) WHERE n.id > $after WITH n ORDER BY n.id LIMIT $limit "
+    "OPTIONAL MATCH (n)-[r]-(c:Entity) WHERE NOT n.type IN $anchor_types AND c.type IN $anchor_types "
+    f"WITH n, c, {_anchor_rank()} AS rank ORDER BY n.id, rank "
+    "WITH n, head(collect(c.name)) AS anchor "
+    "RETURN n.id AS id, n.name AS name, n.type AS type, "
+    "CASE WHEN n.type IN $anchor_types THEN n.name ELSE anchor END AS cluster "
+    "ORDER BY n.id"
+)
+
+
+def iter_pages(driver, page_size: int = PAGE_SIZE) -> Iterator[Tuple[List[Dict], List[tuple]]]:
+    """
+    Yield (nodes, edges) one page at a time: `page_size` nodes ordered by id
+    (keyset pagination, so each page is an index range scan, not SKIP), each
+    with the name of its cluster anchor (`cluster`, None if it has none), and
+    the relationships going out of them.
+    """
+    after = ""
     with driver.session() as session:
-        rows = session.execute_read(fetch_subgraph, limit=NEO_BATCH)
-    build_pyvis(rows)
+        while True:
+            nodes = [
+                dict(record) for record in session.run(
+                    NODE_PAGE_QUERY, after=after, limit=page_size, anchor_types=list(CLUSTER_TYPES)
+                )
+            ]
+            if not nodes:
+                return
+            edges = [
+                (record["a"], record["rel"], record["b"]) for record in session.run(
+                    "UNWIND $ids AS id MATCH (a:Entity {id:id})-[r]->(b:Entity) "
+                    "RETURN a.id AS a, type(r) AS rel, b.id AS b",
+                    ids=[n["id"] for n in nodes]
+                )
+            ]
+            yield nodes, edges
+            after = nodes[-1]["id"]
+
+
+def fetch_graph(driver, page_size: int = PAGE_SIZE) -> Tuple[GraphSnapshot, List[str], np.ndarray]:
+    """
+    Read the graph page by page, folding each page into compact columns as it
+    arrives: a dense code per node id, a cluster code per node (clusters come
+    resolved by NODE_PAGE_QUERY) and int32 source / target / relationship
+    arrays, so only one page of driver records is alive at a time. Returns the
+    CSR snapshot, the cluster labels and the cluster code of every node.
+    """
+    index: Dict[str, int] = {}
+    ids: List[str] = []
+    names: List[str] = []
+    types: List[str] = []
+    node_clusters: List[int] = []
+    labels: List[str] = []
+    label_index: Dict[str, int] = {}
+    rel_lookup: Dict[str, int] = {}
+    src_parts, dst_parts, code_parts = [], [], []
+
+    def code(node_id):
+        # A target may be on a later page: it gets its code now and its columns when its page arrives
+        c = index.get(node_id)
+        if c is None:
+            c = index[node_id] = len(ids)
+            ids.append(node_id)
+            names.append(node_id)
+            types.append("Unknown")
+            node_clusters.append(-1)
+        return c
+
+    node_count = edge_count = 0
+    for page_nodes, page_edges in iter_pages(driver, page_size):
+        for node in page_nodes:
+            c = code(node["id"])
+            names[c] = node.get("name") or node["id"]
+            types[c] = node.get("type") or "Unknown"
+            label = node.get("cluster") or _unanchored_label(types[c])
+            if label not in label_index:
+                label_index[label] = len(labels)
+                labels.append(label)
+            node_clusters[c] = label_index[label]
+        n = len(page_edges)
+        src_parts.append(np.fromiter((code(a) for a, _, _ in page_edges), dtype=np.int32, count=n))
+        dst_parts.append(np.fromiter((code(b) for _, _, b in page_edges), dtype=np.int32, count=n))
+        code_parts.append(np.fromiter((rel_lookup.setdefault(rel, len(rel_lookup)) for _, rel, _ in page_edges),
+                                      dtype=np.int32, count=n))
+        node_count += len(page_nodes)
+        edge_count += n
+        print(f"  fetched {node_count} nodes, {edge_count} relationships")
+
+    src = np.concatenate(src_parts) if src_parts else np.empty(0, dtype=np.int32)
+    dst = np.concatenate(dst_parts) if dst_parts else np.empty(0, dtype=np.int32)
+    codes = np.concatenate(code_parts) if code_parts else np.empty(0, dtype=np.int32)
+    if len(src):
+        # Repeated (source, relationship, target) rows once, first occurrence kept
+        _, first = np.unique(np.stack([src, codes, dst], axis=1), axis=0, return_index=True)
+        first.sort()
+        src, dst, codes = src[first], dst[first], codes[first]
+
+    clusters = np.asarray(node_clusters, dtype=np.int32)
+    seen = clusters >= 0
+    if not seen.all():
+        # Ids only ever seen as relationship targets (deleted while paging): drop them and their edges
+        remap = np.cumsum(seen) - 1
+        keep = seen[src] & seen[dst]
+        src, dst, codes = remap[src[keep]], remap[dst[keep]], codes[keep]
+        kept = np.flatnonzero(seen).tolist()
+        ids, names, types = [ids[i] for i in kept], [names[i] for i in kept], [types[i] for i in kept]
+        clusters = clusters[seen]
+
+    snapshot = GraphSnapshot.from_arrays(ids, names, types, [""] * len(ids), list(rel_lookup), src, dst, codes)
+    return snapshot, labels, clusters
+
+
+# -----------------------------
+# Aggregation
+# -----------------------------
+def assign_clusters(snapshot: GraphSnapshot) -> Tuple[List[str], np.ndarray]:
+    """
+    Cluster label per node, for a snapshot read from disk (a Neo4j export gets
+    them from NODE_PAGE_QUERY instead): anchor nodes (cities) are their own
+    cluster; other nodes join the anchor they are Located_In / Available_In
+    (else any adjacent anchor); the rest are grouped by type. Returns (labels,
+    cluster index per node).
+    """
+    labels: List[str] = []
+    label_index: Dict[str, int] = {}
+
+    def cluster_id(label):
+        if label not in label_index:
+            label_index[label] = len(labels)
+            labels.append(label)
+        return label_index[label]
+
+    anchors = np.array([t in CLUSTER_TYPES for t in snapshot.types], dtype=bool)
+    rank = {rel: i for i, rel in enumerate(CLUSTER_RELATIONS)}
+    clusters = np.empty(len(snapshot), dtype=np.int32)
+    for i in range(len(snapshot)):
+        if anchors[i]:
+            clusters[i] = cluster_id(snapshot.names[i])
+            continue
+        nbrs, codes = snapshot.neighbors_of(i)
+        best, best_rank = None, None
+        for dst, code in zip(nbrs.tolist(), codes.tolist()):
+            if anchors[dst]:
+                r = rank.get(snapshot.rel_types[code], len(rank))
+                if best is None or r < best_rank:
+                    best, best_rank = dst, r
+        label = snapshot.names[best] if best is not None else _unanchored_label(snapshot.types[i])
+        clusters[i] = cluster_id(label)
+    return labels, clusters
+
+
+def edge_arrays(snapshot: GraphSnapshot) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Each undirected relationship once: (src, dst, rel_code) with src < dst."""
+    src = np.repeat(np.arange(len(snapshot), dtype=np.int64), np.diff(snapshot.offsets))
+    dst = snapshot.neighbors.astype(np.int64)
+    keep = src < dst
+    return src[keep], dst[keep], snapshot.rel_codes[keep]
+
+
+def cluster_graph(labels: List[str], clusters: np.ndarray, src: np.ndarray, dst: np.ndarray) -> nx.Graph:
+    """One node per cluster (`size` = members) and one edge per connected pair (`weight` = relationships)."""
+    graph = nx.Graph()
+    sizes = np.bincount(clusters, minlength=len(labels))
+    graph.add_nodes_from((c, {"size": int(sizes[c])}) for c in range(len(labels)))
+    a, b = clusters[src], clusters[dst]
+    cross = a != b
+    pairs = np.stack([np.minimum(a[cross], b[cross]), np.maximum(a[cross], b[cross])], axis=1)
+    if len(pairs):
+        pairs, counts = np.unique(pairs, axis=0, return_counts=True)
+        graph.add_weighted_edges_from((int(p), int(q), int(n)) for (p, q), n in zip(pairs, counts))
+    return graph
+
+
+# -----------------------------
+# Layout (computed once, cached)
+# -----------------------------
+def graph_fingerprint(snapshot: GraphSnapshot) -> str:
+    digest = hashlib.sha1()
+    digest.update("\0".join(snapshot.ids).encode("utf-8"))
+    for array in (snapshot.offsets, snapshot.neighbors, snapshot.rel_codes):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _spiral(n: int) -> np.ndarray:
+    """Sunflower (phyllotaxis) points in the unit disc: even density, O(n), no overlaps."""
+    i = np.arange(n, dtype=np.float64) + 0.5
+    r = np.sqrt(i / n)
+    theta = i * math.pi * (3.0 - math.sqrt(5.0))
+    return np.stack([r * np.cos(theta), r * np.sin(theta)], axis=1)
+
+
+def compute_layout(snapshot: GraphSnapshot, clusters: np.ndarray, cgraph: nx.Graph,
+                   src: np.ndarray, dst: np.ndarray, seed: int = 0) -> np.ndarray:
+    """
+    Two-level layout, (n, 2) positions in pixels: a force-directed layout of the
+    cluster graph places cluster centers; members are laid out inside a disc
+    around their center (force-directed for small clusters, a degree-ordered
+    spiral for large ones, hubs in the middle).
+    """
+    n_clusters = cgraph.number_of_nodes()
+    centers = nx.spring_layout(cgraph, weight="weight", seed=seed) if n_clusters > 1 else {0: np.zeros(2)}
+    scale = LAYOUT_SCALE * math.sqrt(max(n_clusters, 1))
+    sizes = np.bincount(clusters, minlength=n_clusters)
+    degree = np.diff(snapshot.offsets)
+    intra = clusters[src] == clusters[dst]
+    intra_src, intra_dst = src[intra], dst[intra]
+    intra_cluster = clusters[intra_src]
+    order = np.argsort(intra_cluster, kind="stable")
+    bounds = np.searchsorted(intra_cluster[order], np.arange(n_clusters + 1))
+
+    positions = np.zeros((len(snapshot), 2), dtype=np.float32)
+    members_by_cluster = np.split(np.argsort(clusters, kind="stable"), np.cumsum(sizes)[:-1])
+    for c, members in enumerate(members_by_cluster):
+        if not len(members):
+            continue
+        radius = 40.0 * math.sqrt(len(members))
+        if 1 < len(members) <= SPRING_MAX_NODES:
+            sub = nx.Graph()
+            sub.add_nodes_from(members.tolist())
+            span = order[bounds[c]:bounds[c + 1]]
+            sub.add_edges_from(zip(intra_src[span].tolist(), intra_dst[span].tolist()))
+            local = nx.spring_layout(sub, seed=seed)
+            offsets = np.array([local[m] for m in members.tolist()])
+        else:
+            members = members[np.argsort(-degree[members], kind="stable")]
+            offsets = _spiral(len(members))
+        positions[members] = np.asarray(centers[c]) * scale + offsets * radius
+    return positions
+
+
+def load_or_compute_layout(snapshot: GraphSnapshot, clusters: np.ndarray, cgraph: nx.Graph,
+                           src: np.ndarray, dst: np.ndarray, path: str, relayout: bool = False) -> np.ndarray:
+    """Positions from the cache at `path` when it was computed for the same graph, else computed and saved."""
+    fingerprint = graph_fingerprint(snapshot)
+    if not relayout and os.path.exists(path):
+        cached = np.load(path)
+        if str(cached["fingerprint"]) == fingerprint and np.array_equal(cached["clusters"], clusters):
+            print(f"Using cached layout {path}")
+            return cached["positions"]
+    positions = compute_layout(snapshot, clusters, cgraph, src, dst)
+    tmp = f"{path}.tmp.npz"
+    np.savez(tmp, positions=positions, clusters=clusters, fingerprint=np.array(fingerprint))
+    os.replace(tmp, path)
+    print(f"Computed layout for {len(snapshot)} nodes -> {path}")
+    return positions
+
+
+# -----------------------------
+# Level-of-detail HTML
+# -----------------------------
+def _slug(index: int, label: str) -> str:
+    return f"{index:04d}-{re.sub(r'[^a-z0-9]+', '-', label.lower()).strip('-') or 'cluster'}"
+
+
+def _page(title: str) -> Network:
+    net = Network(height="900px", width="100%", directed=False, heading=title, cdn_resources="remote")
+    net.toggle_physics(False)  # positions are precomputed; the browser only draws
+    return net
+
+
+def _write(net: Network, path: str, overview_url):
+    html = net.generate_html()
+    nav = _NAVIGATION % {"overview": json.dumps(overview_url) if overview_url else "false"}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html.replace("</body>", nav + "</body>", 1))
+
+
+class ClusterIndex:
+    """Per-cluster member lists, centers and incident relationships, grouped once so each page is O(its size)."""
+
+    def __init__(self, clusters: np.ndarray, positions: np.ndarray, src: np.ndarray, dst: np.ndarray,
+                 n_clusters: int):
+        self.sizes = np.bincount(clusters, minlength=n_clusters)
+        bounds = np.concatenate([[0], np.cumsum(self.sizes)])
+        by_cluster = np.argsort(clusters, kind="stable")
+        self.members = [by_cluster[bounds[c]:bounds[c + 1]] for c in range(n_clusters)]
+        self.centers = np.zeros((n_clusters, 2))
+        np.add.at(self.centers, clusters, positions)
+        self.centers /= np.maximum(self.sizes, 1)[:, None]
+
+        # Every relationship listed under the cluster of each endpoint (once if both are in it)
+        edge = np.arange(len(src))
+        a, b = clusters[src], clusters[dst]
+        owner = np.concatenate([a, b[a != b]])
+        edges = np.concatenate([edge, edge[a != b]])
+        order = np.argsort(owner, kind="stable")
+        owner, edges = owner[order], edges[order]
+        cuts = np.searchsorted(owner, np.arange(n_clusters + 1))
+        self.edges = [edges[cuts[c]:cuts[c + 1]] for c in range(n_clusters)]
+
+
+def write_overview(labels, cgraph: nx.Graph, index: ClusterIndex, clusters: np.ndarray,
+                   types: np.ndarray, type_names: List[str], path: str):
+    """Cluster-level view: one node per cluster (sized by members), edges weighted by relationship count."""
+    net = _page("Travel graph: clusters (double-click to open)")
+    type_counts = np.zeros((len(labels), len(type_names)), dtype=np.int64)
+    np.add.at(type_counts, (clusters, types), 1)
+    for c, label in enumerate(labels):
+        breakdown = ", ".join(f"{type_names[t]}: {n}" for t, n in enumerate(type_counts[c]) if n)
+        net.add_node(c, label=f"{label} ({index.sizes[c]})", title=breakdown, value=int(index.sizes[c]),
+                     x=float(index.centers[c, 0]), y=float(index.centers[c, 1]), color=DEFAULT_COLOR,
+                     url=f"clusters/{_slug(c, label)}.html")
+    # Edges are appended directly: Network.add_edge scans every existing edge for duplicates
+    strongest = sorted(cgraph.edges(data="weight"), key=lambda e: -e[2])[:MAX_OVERVIEW_EDGES]
+    net.edges.extend({"from": int(a), "to": int(b), "value": int(w), "title": f"{w} relationships"}
+                     for a, b, w in strongest)
+    _write(net, path, None)
+
+
+def write_cluster_page(c: int, labels, snapshot: GraphSnapshot, index: ClusterIndex, clusters: np.ndarray,
+                       positions: np.ndarray, src: np.ndarray, dst: np.ndarray, codes: np.ndarray, path: str,
+                       max_nodes: int = MAX_DETAIL_NODES, max_edges: int = MAX_DETAIL_EDGES):
+    """
+    Member-level view of one cluster: its highest-degree members and the
+    relationships among them (heaviest relationship types first), plus one node
+    per neighboring cluster carrying the aggregated links to it.
+    """
+    members = index.members[c]
+    degree = np.diff(snapshot.offsets)[members]
+    shown = members[np.argsort(-degree, kind="stable")[:max_nodes]]
+    hidden = len(members) - len(shown)
+    net = _page(f"{labels[c]}: {len(members)} nodes" + (f" ({hidden} lowest-degree hidden)" if hidden else ""))
+    for i in shown.tolist():
+        net.add_node(i, label=snapshot.names[i], title=f"{snapshot.types[i]} · {snapshot.ids[i]}",
+                     color=TYPE_COLORS.get(snapshot.types[i], DEFAULT_COLOR),
+                     x=float(positions[i, 0]), y=float(positions[i, 1]))
+
+    shown_set = set(shown.tolist())
+    edges = index.edges[c]
+    e_src, e_dst, e_codes = src[edges], dst[edges], codes[edges]
+    in_src = np.fromiter((i in shown_set for i in e_src.tolist()), dtype=bool, count=len(edges))
+    in_dst = np.fromiter((i in shown_set for i in e_dst.tolist()), dtype=bool, count=len(edges))
+
+    weights = np.array([RELATIONSHIP_WEIGHTS.get(r, 0.5) for r in snapshot.rel_types])
+    inside = np.flatnonzero(in_src & in_dst)
+    inside = inside[np.argsort(-weights[e_codes[inside]], kind="stable")[:max_edges]]
+    net.edges.extend({"from": int(e_src[e]), "to": int(e_dst[e]), "title": snapshot.rel_types[e_codes[e]]}
+                     for e in inside.tolist())
+
+    # Links leaving the cluster, aggregated per (member, other cluster)
+    outward = Counter()
+    for member_end, in_member, other_end in ((e_src, in_src, e_dst), (e_dst, in_dst, e_src)):
+        leaving = in_member & (clusters[other_end] != c)
+        outward.update(zip(member_end[leaving].tolist(), clusters[other_end[leaving]].tolist()))
+    center = index.centers[c]
+    for other in sorted({other for _, other in outward}):
+        direction = index.centers[other] - center
+        norm = float(np.linalg.norm(direction)) or 1.0
+        # Drawn on a ring outside the cluster, in the direction of the other cluster
+        spot = center + direction / norm * (40.0 * math.sqrt(len(members)) + 200.0)
+        net.add_node(f"cluster-{other}", label=f"→ {labels[other]}", shape="box", color=DEFAULT_COLOR,
+                     x=float(spot[0]), y=float(spot[1]), url=f"{_slug(other, labels[other])}.html")
+    net.edges.extend({"from": member, "to": f"cluster-{other}", "value": n, "dashes": True,
+                      "title": f"{n} relationships"} for (member, other), n in outward.items())
+    _write(net, path, "../index.html")
+
+
+def export(snapshot: GraphSnapshot, output_dir: str = OUTPUT_DIR, relayout: bool = False,
+           max_nodes: int = MAX_DETAIL_NODES, max_edges: int = MAX_DETAIL_EDGES,
+           clustering: Optional[Tuple[List[str], np.ndarray]] = None) -> str:
+    """
+    Write the overview (index.html) and one page per cluster under output_dir;
+    returns the overview path. `clustering` is (labels, cluster per node) when
+    already known (fetch_graph), else it is computed from the snapshot.
+    """
+    os.makedirs(os.path.join(output_dir, "clusters"), exist_ok=True)
+    labels, clusters = clustering if clustering is not None else assign_clusters(snapshot)
+    src, dst, codes = edge_arrays(snapshot)
+    cgraph = cluster_graph(labels, clusters, src, dst)
+    positions = load_or_compute_layout(snapshot, clusters, cgraph, src, dst,
+                                       os.path.join(output_dir, "layout.npz"), relayout)
+    index = ClusterIndex(clusters, positions, src, dst, len(labels))
+
+    type_names = sorted(set(snapshot.types))
+    type_index = {t: i for i, t in enumerate(type_names)}
+    types = np.array([type_index[t] for t in snapshot.types], dtype=np.int64)
+    overview = os.path.join(output_dir, "index.html")
+    write_overview(labels, cgraph, index, clusters, types, type_names, overview)
+    for c, label in enumerate(labels):
+        write_cluster_page(c, labels, snapshot, index, clusters, positions, src, dst, codes,
+                           os.path.join(output_dir, "clusters", f"{_slug(c, label)}.html"), max_nodes, max_edges)
+    print(f"Saved visualization: {len(snapshot)} nodes, {snapshot.edge_count} relationships in "
+          f"{len(labels)} clusters -> {overview}")
+    return overview
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Export the travel graph as a clustered, level-of-detail HTML view.")
+    parser.add_argument("--source", choices=["neo4j", "snapshot"], default="neo4j",
+                        help="Read the graph from Neo4j in pages, or from a graph_snapshot.py file")
+    parser.add_argument("--snapshot-path", default=DEFAULT_SNAPSHOT_PATH)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--max-detail-nodes", type=int, default=MAX_DETAIL_NODES)
+    parser.add_argument("--max-detail-edges", type=int, default=MAX_DETAIL_EDGES)
+    parser.add_argument("--relayout", action="store_true", help="Recompute positions even if the cached layout matches")
+    parser.add_argument("--open", action="store_true", help="Open the overview in a browser")
+    args = parser.parse_args()
+
+    clustering = None
+    if args.source == "snapshot":
+        snapshot = load_snapshot(args.snapshot_path)
+        if snapshot is None:
+            raise SystemExit(f"No snapshot at {args.snapshot_path}.npz/.json; run `python graph_snapshot.py` first")
+    else:
+        from neo4j import GraphDatabase
+        import config
+        driver = GraphDatabase.driver(config.NEO4J_URI, auth=(config.NEO4J_USER, config.NEO4J_PASSWORD))
+        try:
+            snapshot, labels, clusters = fetch_graph(driver, args.page_size)
+            clustering = (labels, clusters)
+        finally:
+            driver.close()
+
+    overview = export(snapshot, args.output_dir, args.relayout, args.max_detail_nodes, args.max_detail_edges,
+                      clustering)
+    if args.open:
+        webbrowser.open(f"file://{os.path.abspath(overview)}")
+
 
 if __name__ == "__main__":
     main()